@@ -0,0 +1,217 @@
+"""
+Admission control and load shedding.
+
+Every request is classified by route into ``pdf`` (inline rendering),
+``email`` (SMTP on the request path), ``auth`` (bcrypt hashing), ``write``
+or ``read``. Each class has its own concurrency limit and a bounded FIFO
+wait queue, so a burst of PDF downloads or logins can only occupy its own
+slots and the cheap JSON routes keep theirs.
+
+- Queue full, or no slot within ADMISSION_QUEUE_TIMEOUT_SECONDS: 503 with
+  ``Retry-After`` estimated from the class's recent service time.
+- Optional per-user token buckets (ADMISSION_USER_QUOTAS, per class): 429
+  with ``Retry-After`` when a user's bucket is empty. Users are keyed by
+  their bearer token, anonymous requests by client address.
+
+Limits are per worker process. Health probes, /metrics and the docs are
+never shed. Counters per class are read by the /metrics collector.
+"""
+import asyncio
+import json
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+PDF = "pdf"
+EMAIL = "email"
+AUTH = "auth"
+WRITE = "write"
+READ = "read"
+CLASSES = (PDF, EMAIL, AUTH, WRITE, READ)
+
+# (path, class) checked in order; anything else is read (GET/HEAD) or write
+ROUTE_CLASSES: Tuple[Tuple[str, str], ...] = (
+    ("/api/pdf/generate", PDF),
+    ("/api/pdf/send-email", EMAIL),
+    ("/api/auth/forgot-password", EMAIL),
+    ("/api/auth/login", AUTH),
+    ("/api/auth/register", AUTH),
+    ("/api/auth/reset-password", AUTH),
+)
+EXEMPT_PATHS = frozenset(("/", "/health", "/health/live", "/health/ready", "/metrics", "/docs", "/redoc", "/openapi.json"))
+
+QUEUE_FULL = "queue_full"
+TIMEOUT = "timeout"
+QUOTA = "quota"
+
+MAX_RETRY_AFTER = 30
+
+
+def classify(method: str, path: str) -> Optional[str]:
+    """Admission class of a request; None when it is never shed"""
+    if path in EXEMPT_PATHS or method == "OPTIONS":
+        return None
+    for prefix, admission_class in ROUTE_CLASSES:
+        if path == prefix:
+            return admission_class
+    return READ if method in ("GET", "HEAD") else WRITE
+
+
+class Limiter:
+    """Concurrency limit with a bounded FIFO queue of waiting requests"""
+
+    def __init__(self, name: str, concurrency: int, queue_size: int, queue_timeout: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Exponential moving average of the time a request holds a slot
+        self.service_time = 0.1
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {QUEUE_FULL: 0, TIMEOUT: 0, QUOTA: 0}
+        self.wait_seconds = 0.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> Optional[str]:
+        """Take a slot; returns the rejection reason, or None when admitted"""
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return None
+        if len(self._waiters) >= self.queue_size:
+            self.rejected[QUEUE_FULL] += 1
+            return QUEUE_FULL
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected[TIMEOUT] += 1
+            return TIMEOUT
+        except asyncio.CancelledError:
+            # Client went away after release() handed us the slot: pass it on
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            self.wait_seconds += time.perf_counter() - started
+        self.admitted += 1
+        return None
+
+    def release(self, elapsed: Optional[float] = None) -> None:
+        if elapsed is not None:
+            self.service_time = 0.8 * self.service_time + 0.2 * elapsed
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # the slot moves to the waiter
+                return
+        self.active -= 1
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue is likely drained"""
+        estimate = self.service_time * (self.queued + 1) / max(1, self.concurrency)
+        return max(1, min(MAX_RETRY_AFTER, math.ceil(estimate)))
+
+
+class TokenBuckets:
+    """Per (user, class) token buckets; LRU-bounded number of users"""
+
+    def __init__(self, quotas: Dict[str, List[float]], max_keys: int = 10000):
+        # class -> (tokens per second, burst)
+        self.quotas = {name: (float(rate), float(burst)) for name, (rate, burst) in quotas.items()}
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+
+    def take(self, key: str, admission_class: str) -> float:
+        """Consume one token; returns 0 when allowed, else seconds until the next token"""
+        quota = self.quotas.get(admission_class)
+        if quota is None:
+            return 0.0
+        rate, burst = quota
+        now = time.monotonic()
+        bucket = self._buckets.get((key, admission_class))
+        if bucket is None:
+            bucket = self._buckets[(key, admission_class)] = [burst, now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end((key, admission_class))
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / rate if rate > 0 else float(MAX_RETRY_AFTER)
+
+
+def _client_key(scope) -> str:
+    for key, value in scope.get("headers", []):
+        if key == b"authorization":
+            return value.decode("latin-1")
+    client = scope.get("client")
+    return client[0] if client else "anonymous"
+
+
+async def reject(send, status: int, retry_after: int, detail: str) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware applying the per-class limits and user quotas"""
+
+    def __init__(self, app, limiters: Dict[str, Limiter], quotas: Optional[TokenBuckets] = None):
+        self.app = app
+        self.limiters = limiters
+        self.quotas = quotas
+
+    async def __call__(self, scope, receive, send):
+        admission_class = classify(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        limiter = self.limiters.get(admission_class)
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        if self.quotas is not None:
+            wait = self.quotas.take(_client_key(scope), admission_class)
+            if wait > 0:
+                limiter.rejected[QUOTA] += 1
+                await reject(send, 429, max(1, math.ceil(wait)), "Limite de requisições atingido, tente novamente em instantes")
+                return
+
+        if await limiter.acquire() is not None:
+            await reject(send, 503, limiter.retry_after(), "Servidor ocupado, tente novamente em instantes")
+            return
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.perf_counter() - started)
+
+
+def build_limiters(concurrency: Dict[str, int], queue: Dict[str, int], queue_timeout: float,
+                   classes: Iterable[str] = CLASSES) -> Dict[str, Limiter]:
+    """One Limiter per class present in `concurrency`"""
+    return {
+        name: Limiter(name, concurrency[name], queue.get(name, 0), queue_timeout)
+        for name in classes if name in concurrency
+    }
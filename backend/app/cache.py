@@ -0,0 +1,356 @@
+"""
+Application cache.
+
+An async key/value interface so call sites do not depend on where entries
+live. Invalidation is by namespace version: keys built with ``versioned_key``
+embed the namespace's current version, and ``bump_version`` makes every
+older key unreachable in O(1); stale entries then age out via LRU/TTL.
+
+Two backends, selected with CACHE_BACKEND:
+
+- ``memory``: in-process LRU. Correct only with a single worker.
+- ``redis``: entries and versions live in Redis (any server speaking the
+  Redis protocol), shared by every worker. Each worker keeps a small
+  in-process near cache in front of it; deletes and version bumps are
+  published on a pub/sub channel so every worker evicts its local copy.
+  Requires the optional ``redis`` package.
+"""
+import asyncio
+import json
+import logging
+import pickle
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(ABC):
+    """Interface shared by the cache backends"""
+
+    hits = 0
+    misses = 0
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    async def get_version(self, namespace: str) -> int:
+        ...
+
+    @abstractmethod
+    async def bump_version(self, namespace: str) -> int:
+        ...
+
+    async def start(self) -> None:
+        """Open connections / background listeners (no-op by default)"""
+
+    async def stop(self) -> None:
+        """Release what start() opened (no-op by default)"""
+
+    def __len__(self) -> int:
+        """Entries held in this process"""
+        return 0
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU with per-entry TTL"""
+
+    def __init__(self, maxsize: int = 10000, default_ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[str, Tuple[Optional[float], Any]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    async def get_version(self, namespace: str) -> int:
+        return self._versions.get(namespace, 0)
+
+    async def bump_version(self, namespace: str) -> int:
+        version = self._versions.get(namespace, 0) + 1
+        self._versions[namespace] = version
+        return version
+
+    def known_version(self, namespace: str) -> Optional[int]:
+        return self._versions.get(namespace)
+
+    def set_version(self, namespace: str, version: int) -> None:
+        """Raise the local version (never lowers it: messages may arrive out of order)"""
+        current = self._versions.get(namespace)
+        if current is None or version > current:
+            self._versions[namespace] = version
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._versions.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisCache(CacheBackend):
+    """
+    Shared cache in Redis with a per-process near cache.
+
+    Values are pickled (the server is trusted infrastructure, not user
+    input). Versions are Redis counters; a worker learns about a bump from
+    the invalidation channel, so reading a version is a local lookup after
+    the first time. If the subscription drops, the near cache is cleared
+    because invalidations may have been missed.
+
+    A Redis outage never fails the caller: reads count as misses, writes
+    are skipped, and the error is logged once and clears the near cache.
+    Deletes and bumps that did not reach Redis are replayed when it
+    answers again, so no worker keeps serving what they invalidated.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        url: str = "",
+        prefix: str = "cache",
+        default_ttl: Optional[float] = None,
+        local_maxsize: int = 1000,
+        local_ttl: Optional[float] = 30,
+    ):
+        try:
+            import redis.asyncio as aioredis  # optional, imported only when used
+            from redis.exceptions import RedisError
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+        if client is None:
+            client = aioredis.from_url(url)
+        self.client = client
+        self._errors = (RedisError, OSError, asyncio.TimeoutError)
+        self.degraded = False
+        self.failures = 0
+        # Invalidations that could not reach Redis, replayed once it answers again
+        self._pending_deletes: set = set()
+        self._pending_bumps: set = set()
+        self.prefix = prefix
+        self.channel = f"{prefix}:invalidate"
+        self.default_ttl = default_ttl
+        self.local = MemoryCache(maxsize=local_maxsize, default_ttl=local_ttl)
+        self._listener: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:e:{key}"
+
+    def _version_key(self, namespace: str) -> str:
+        return f"{self.prefix}:v:{namespace}"
+
+    def _failed(self, operation: str, exc: Exception) -> None:
+        """Redis unreachable: carry on uncached, without trusting the near cache"""
+        self.failures += 1
+        self.local.clear()
+        if not self.degraded:
+            self.degraded = True
+            logger.warning("Redis cache unavailable (%s: %s); serving without cache", operation, exc)
+
+    async def _recovered(self) -> None:
+        """Replay the invalidations lost while Redis was down"""
+        if not self.degraded:
+            return
+        self.degraded = False
+        deletes, self._pending_deletes = self._pending_deletes, set()
+        bumps, self._pending_bumps = self._pending_bumps, set()
+        for key in deletes:
+            await self.delete(key)
+        for namespace in bumps:
+            await self.bump_version(namespace)
+        if not self.degraded:
+            logger.info("Redis cache available again")
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = await self.local.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        try:
+            raw = await self.client.get(self._key(key))
+        except self._errors as exc:
+            self._failed("get", exc)
+            self.misses += 1
+            return None
+        if self.degraded:
+            # The value may be one a pending delete or bump is about to retire
+            await self._recovered()
+            self.misses += 1
+            return None
+        if raw is None:
+            self.misses += 1
+            return None
+        value = pickle.loads(raw)
+        await self.local.set(key, value)
+        self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.default_ttl if ttl is None else ttl
+        px = int(ttl * 1000) if ttl else None
+        try:
+            await self.client.set(self._key(key), pickle.dumps(value), px=px)
+        except self._errors as exc:
+            self._failed("set", exc)
+            return
+        await self.local.set(key, value, ttl=min(ttl, self.local.default_ttl or ttl) if ttl else None)
+
+    async def delete(self, key: str) -> None:
+        await self.local.delete(key)
+        try:
+            await self.client.delete(self._key(key))
+            await self._publish({"delete": key})
+        except self._errors as exc:
+            self._failed("delete", exc)
+            self._pending_deletes.add(key)
+
+    async def get_version(self, namespace: str) -> int:
+        version = self.local.known_version(namespace)
+        if version is None:
+            try:
+                raw = await self.client.get(self._version_key(namespace))
+            except self._errors as exc:
+                self._failed("get_version", exc)
+                # Not remembered: the next call asks Redis again
+                return 0
+            version = int(raw) if raw is not None else 0
+            self.local.set_version(namespace, version)
+        return version
+
+    async def bump_version(self, namespace: str) -> int:
+        try:
+            version = await self.client.incr(self._version_key(namespace))
+        except self._errors as exc:
+            self._failed("bump_version", exc)
+            self._pending_bumps.add(namespace)
+            return 0
+        self.local.set_version(namespace, version)
+        try:
+            await self._publish({"bump": namespace, "version": version})
+        except self._errors as exc:
+            self._failed("publish", exc)
+        return version
+
+    async def _publish(self, message: Dict[str, Any]) -> None:
+        await self.client.publish(self.channel, json.dumps(message))
+
+    async def _apply(self, message: Dict[str, Any]) -> None:
+        if "delete" in message:
+            await self.local.delete(message["delete"])
+        elif "bump" in message:
+            self.local.set_version(message["bump"], int(message["version"]))
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self.client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                # Anything cached before (re)subscribing may have missed invalidations
+                self.local.clear()
+                await self._recovered()
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        await self._apply(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Cache invalidation channel lost; resubscribing")
+                self.local.clear()
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    async def start(self) -> None:
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        await self.client.aclose()
+
+    def __len__(self) -> int:
+        return len(self.local)
+
+
+_caches: List[CacheBackend] = []
+
+
+def build_cache(name: str, maxsize: int, default_ttl: Optional[float] = None) -> CacheBackend:
+    """Cache of the configured backend; `name` separates its keys in Redis"""
+    if settings.CACHE_BACKEND == "redis":
+        instance = RedisCache(
+            url=settings.REDIS_URL,
+            prefix=f"{settings.CACHE_KEY_PREFIX}:{name}",
+            default_ttl=default_ttl,
+            local_maxsize=maxsize,
+            local_ttl=settings.CACHE_LOCAL_TTL_SECONDS,
+        )
+    else:
+        instance = MemoryCache(maxsize=maxsize, default_ttl=default_ttl)
+    _caches.append(instance)
+    return instance
+
+
+async def start_caches() -> None:
+    for instance in _caches:
+        await instance.start()
+
+
+async def stop_caches() -> None:
+    for instance in _caches:
+        await instance.stop()
+
+
+async def versioned_key(namespace: str, key: str) -> str:
+    return f"{namespace}:v{await cache.get_version(namespace)}:{key}"
+
+
+def user_namespace(user_id: str) -> str:
+    """Namespace of everything cached for one user; bumped on each of their writes"""
+    return f"u:{user_id}"
+
+
+cache = build_cache("app", maxsize=settings.CACHE_MAX_ENTRIES)
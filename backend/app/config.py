@@ -1,12 +1,32 @@
 """
 Application configuration
 """
+import importlib.util
+import logging
+import os
+from typing import Dict, List
+
 from pydantic_settings import BaseSettings
 
+logger = logging.getLogger(__name__)
+
 class Settings(BaseSettings):
     # MongoDB
     MONGODB_URL: str
     DATABASE_NAME: str = "nutri_gestantes"
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 5000  # sem servidor disponível: erro em vez de espera de 30s
+    MONGO_CONNECT_TIMEOUT_MS: int = 5000
+    MONGO_SOCKET_TIMEOUT_MS: int = 20000  # teto por operação fora do prazo da requisição
+    # Pool de conexões (por worker; as opções aqui valem mais que as da URL)
+    MONGO_MAX_POOL_SIZE: int = 0  # 0 = padrão da URL/pymongo; acima das threads do Motor (MOTOR_MAX_WORKERS) sobram conexões
+    MONGO_MIN_POOL_SIZE: int = 0  # conexões mantidas abertas mesmo ociosas; 0 = padrão da URL/pymongo
+    MONGO_MAX_IDLE_TIME_MS: int = 0  # fecha conexões ociosas há mais que isso; 0 = nunca
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int = 0  # espera por conexão livre; 0 = só o prazo da requisição
+    MONGO_COMPRESSORS: str = ""  # ex.: "zstd,snappy,zlib" (zstd requer zstandard, snappy requer python-snappy)
+    # Leitura das listas (pacientes, busca, histórico de avaliações). Fora de
+    # primary as listas podem ficar atrasadas em relação às escritas recentes
+    MONGO_LIST_READ_PREFERENCE: str = "primary"  # primary | primaryPreferred | secondary | secondaryPreferred | nearest
+    MONGO_MAX_STALENESS_SECONDS: int = 0  # atraso máximo aceito de um secundário (mínimo 90); 0 = sem limite
     
     # API
     API_V1_PREFIX: str = "/api"
@@ -23,8 +43,89 @@ class Settings(BaseSettings):
     SMTP_PASSWORD: str = ""
     SMTP_FROM_EMAIL: str = ""
     SMTP_FROM_NAME: str = "NutriPré"
+    SMTP_TIMEOUT_SECONDS: float = 10.0  # conexão e cada leitura/escrita no socket
     FRONTEND_URL: str = "http://localhost:5173"  # URL do frontend para o link de reset
     
+    # PDF jobs (modo assíncrono)
+    PDF_JOB_STORE: str = "memory"  # memory | mongo (obrigatório com mais de um worker)
+    PDF_WORKERS: int = 2
+    PDF_EXECUTOR: str = "process"  # process | thread (threads disputam o GIL com o event loop)
+    PDF_WORKER_NICE: int = 10  # prioridade menor para os processos de PDF; 0 = igual ao worker
+    PDF_JOB_TTL_SECONDS: int = 900
+    PDF_JOB_CLEANUP_INTERVAL_SECONDS: int = 60
+
+    # Serialização rápida (listas e detalhes de pacientes/avaliações sem revalidar)
+    FAST_JSON_RESPONSES: bool = False
+    MSGPACK_RESPONSES: bool = False  # Accept: application/msgpack; requer o pacote msgpack
+
+    # Sincronização incremental (/api/sync)
+    SYNC_PAGE_SIZE: int = 500
+    SYNC_MAX_PAGE_SIZE: int = 5000
+    SYNC_SETTLE_SECONDS: float = 2.0  # escritas mais novas ficam para a próxima sincronização
+    SYNC_TOMBSTONE_TTL_DAYS: int = 0  # 0 = exclusões mantidas para sempre
+
+    # Exclusão em cascata das avaliações de pacientes removidas
+    CASCADE_DELETE_BATCH_SIZE: int = 500
+    CASCADE_DELETE_PAUSE_MS: int = 50  # pausa entre lotes
+
+    # Cache da aplicação
+    CACHE_BACKEND: str = "memory"  # memory | redis (obrigatório com mais de um worker)
+    REDIS_URL: str = "redis://localhost:6379/0"
+    CACHE_KEY_PREFIX: str = "nutri"
+    CACHE_LOCAL_TTL_SECONDS: int = 30  # cópia local de cada worker na frente do Redis
+    CACHE_MAX_ENTRIES: int = 10000
+    BOOTSTRAP_CACHE_TTL_SECONDS: int = 60  # invalidado antes disso por qualquer escrita do usuário
+    OWNERSHIP_CACHE_MAX_ENTRIES: int = 5000  # paciente_id -> dono, peso pré-gestacional e altura
+    OWNERSHIP_CACHE_TTL_SECONDS: int = 120
+    TIMELINE_CACHE_TTL_SECONDS: int = 300
+    TIMELINE_MAX_PONTOS: int = 60  # pontos da trajetória de ganho de peso
+
+    # Observabilidade
+    METRICS_ENABLED: bool = True
+    TRACING_ENABLED: bool = False  # Server-Timing, X-Request-ID e log estruturado por requisição
+    TRACE_EXPORT_PATH: str = ""  # arquivo OTLP/JSON (uma linha por requisição); vazio = desligado
+    PROFILER_ENABLED: bool = False  # liga o hook: X-Profile: 1 (ou ?_profile=1) com token de admin
+    PROFILER_SAMPLE_EVERY: int = 0  # perfila 1 a cada N requisições por rota; 0 = desligado
+    PROFILER_INTERVAL_MS: float = 5.0
+    PROFILER_TRACEMALLOC: bool = False  # snapshot de alocações nas rotas de PDF (só com PDF_EXECUTOR=thread)
+    PROFILER_DIR: str = "profiles"
+    PROFILER_MAX_PROFILES: int = 100
+
+    # Servidor de produção (gunicorn.conf.py) e aquecimento dos workers
+    WEB_CONCURRENCY: int = 0  # 0 = calculado pelos núcleos e pela memória disponíveis
+    WORKER_MEMORY_MB: int = 256  # memória reservada por worker no cálculo
+    PDF_PROCESS_MEMORY_MB: int = 96  # por processo do pool de PDF (PDF_WORKERS + forkserver, por worker)
+    WARMUP_ENABLED: bool = True
+    WARMUP_STEP_TIMEOUT_SECONDS: float = 10.0
+
+    # Snapshot dos caches de relatórios e recomendações FIGO (app/snapshot.py)
+    CACHE_SNAPSHOT_PATH: str = ""  # caminho absoluto; vazio = desligado
+    CACHE_SNAPSHOT_INTERVAL_SECONDS: int = 300  # 0 = só no shutdown
+
+    # Admissão por classe de rota (app/admission.py), limites por worker.
+    # Classes: pdf, email, auth, write, read
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_CONCURRENCY: Dict[str, int] = {"pdf": 2, "email": 2, "auth": 4, "write": 32, "read": 64}
+    ADMISSION_QUEUE: Dict[str, int] = {"pdf": 8, "email": 8, "auth": 32, "write": 128, "read": 256}
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 10.0
+    # Cotas por usuário: {"pdf": [0.2, 5]} = 1 PDF a cada 5s, rajada de 5; vazio = sem cotas
+    ADMISSION_USER_QUOTAS: Dict[str, List[float]] = {}
+
+    # Prazos por requisição e circuit breakers (app/resilience.py)
+    REQUEST_DEADLINE_SECONDS: float = 10.0  # vira maxTimeMS das operações no Mongo; 0 = sem prazo
+    BULK_REQUEST_DEADLINE_SECONDS: float = 120.0  # /api/sync, importação e avaliações em lote
+    CIRCUIT_FAILURE_THRESHOLD: int = 5  # falhas seguidas para abrir o circuito
+    CIRCUIT_RESET_SECONDS: float = 30.0  # tempo aberto antes da requisição de teste (half-open)
+
+    # Health checks (/health/ready lê o último resultado, atualizado em segundo plano)
+    HEALTH_CHECK_INTERVAL_SECONDS: float = 5.0
+    HEALTH_CHECK_TIMEOUT_SECONDS: float = 2.0
+    HEALTH_SMTP_INTERVAL_SECONDS: float = 60.0  # conexão TCP ao SMTP, quando configurado
+    HEALTH_MONGO_SLOW_MS: float = 200.0  # ping acima disso = degraded
+    HEALTH_PDF_QUEUE_DEGRADED: int = 8  # PDFs na fila acima disso = degraded
+    HEALTH_UPGRADE_QUEUE_DEGRADED: int = 1000  # upgrades de schema aguardando gravação
+    HEALTH_LOOP_LAG_DEGRADED_MS: float = 100.0
+
     # Environment
     ENVIRONMENT: str = "development"
     ALLOWED_ORIGINS: str = "http://localhost:5173"
@@ -45,3 +146,89 @@ class Settings(BaseSettings):
 
 settings = Settings()
 
+
+# Imported on first use (PDF, auth, e-mail, Redis), so a missing package
+# would only show up on the first request that needs it
+LAZY_DEPENDENCIES = {"reportlab": "PDF", "jose": "JWT", "passlib": "password hashing"}
+
+# pymongo only warns and falls back to no compression when these are missing
+COMPRESSOR_PACKAGES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+READ_PREFERENCE_MODES = ("primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest")
+
+
+def motor_threads() -> int:
+    """Size of Motor's executor: every operation runs on one of these threads"""
+    return int(os.environ.get("MOTOR_MAX_WORKERS") or (os.cpu_count() or 1) * 5)
+
+
+def in_memory_backends() -> List[str]:
+    """Settings whose state lives in one process and cannot be shared by workers"""
+    backends = []
+    if settings.CACHE_BACKEND == "memory":
+        backends.append("CACHE_BACKEND=memory")
+    if settings.PDF_JOB_STORE == "memory":
+        backends.append("PDF_JOB_STORE=memory")
+    return backends
+
+
+def check_workers(workers: int) -> None:
+    """In-process backends lose invalidations and jobs as soon as a second worker exists"""
+    if workers <= 1:
+        return
+    errors = [f"{backend} with {workers} workers" for backend in in_memory_backends()]
+    if errors:
+        raise RuntimeError("Invalid configuration: " + "; ".join(errors) +
+                           " (use CACHE_BACKEND=redis and PDF_JOB_STORE=mongo, or WEB_CONCURRENCY=1)")
+
+
+def check_settings() -> None:
+    """Fail at startup on invalid settings or missing lazily imported packages"""
+    errors = []
+    if settings.CACHE_BACKEND not in ("memory", "redis"):
+        errors.append(f"CACHE_BACKEND must be memory or redis, got {settings.CACHE_BACKEND!r}")
+    if settings.PDF_JOB_STORE not in ("memory", "mongo"):
+        errors.append(f"PDF_JOB_STORE must be memory or mongo, got {settings.PDF_JOB_STORE!r}")
+    for name in set(settings.ADMISSION_CONCURRENCY) | set(settings.ADMISSION_QUEUE) | set(settings.ADMISSION_USER_QUOTAS):
+        if name not in ("pdf", "email", "auth", "write", "read"):
+            errors.append(f"unknown admission class {name!r}")
+    if settings.PDF_EXECUTOR not in ("process", "thread"):
+        errors.append(f"PDF_EXECUTOR must be process or thread, got {settings.PDF_EXECUTOR!r}")
+    if settings.CACHE_SNAPSHOT_PATH and not os.path.isabs(settings.CACHE_SNAPSHOT_PATH):
+        errors.append(f"CACHE_SNAPSHOT_PATH must be an absolute path, got {settings.CACHE_SNAPSHOT_PATH!r}")
+    if settings.CIRCUIT_FAILURE_THRESHOLD < 1:
+        errors.append(f"CIRCUIT_FAILURE_THRESHOLD must be at least 1, got {settings.CIRCUIT_FAILURE_THRESHOLD}")
+    if settings.ALGORITHM not in ("HS256", "HS384", "HS512"):
+        errors.append(f"ALGORITHM must be an HMAC algorithm (HS256/HS384/HS512), got {settings.ALGORITHM!r}")
+    if settings.MONGO_LIST_READ_PREFERENCE not in READ_PREFERENCE_MODES:
+        errors.append(f"MONGO_LIST_READ_PREFERENCE must be one of {', '.join(READ_PREFERENCE_MODES)}, "
+                      f"got {settings.MONGO_LIST_READ_PREFERENCE!r}")
+    if settings.MONGO_MAX_STALENESS_SECONDS:
+        if settings.MONGO_MAX_STALENESS_SECONDS < 90:
+            errors.append(f"MONGO_MAX_STALENESS_SECONDS must be 0 or at least 90, got {settings.MONGO_MAX_STALENESS_SECONDS}")
+        if settings.MONGO_LIST_READ_PREFERENCE == "primary":
+            errors.append("MONGO_MAX_STALENESS_SECONDS cannot be used with MONGO_LIST_READ_PREFERENCE=primary")
+    if settings.MONGO_MAX_POOL_SIZE and settings.MONGO_MIN_POOL_SIZE > settings.MONGO_MAX_POOL_SIZE:
+        errors.append("MONGO_MIN_POOL_SIZE must not exceed MONGO_MAX_POOL_SIZE")
+    required = dict(LAZY_DEPENDENCIES)
+    if settings.MSGPACK_RESPONSES:
+        required["msgpack"] = "MSGPACK_RESPONSES"
+    for compressor in filter(None, (c.strip() for c in settings.MONGO_COMPRESSORS.split(","))):
+        if compressor not in COMPRESSOR_PACKAGES:
+            errors.append(f"unknown MONGO_COMPRESSORS entry {compressor!r}")
+        else:
+            required[COMPRESSOR_PACKAGES[compressor]] = f"MONGO_COMPRESSORS={compressor}"
+    if settings.CACHE_BACKEND == "redis":
+        required["redis"] = "CACHE_BACKEND=redis"
+    for module, used_by in required.items():
+        if importlib.util.find_spec(module) is None:
+            errors.append(f"package {module!r} ({used_by}) is not installed")
+    if errors:
+        raise RuntimeError("Invalid configuration: " + "; ".join(errors))
+    check_workers(settings.WEB_CONCURRENCY)
+    threads = motor_threads()
+    if settings.MONGO_MAX_POOL_SIZE > threads:
+        logger.warning("MONGO_MAX_POOL_SIZE=%d exceeds Motor's %d executor threads (MOTOR_MAX_WORKERS): "
+                       "at most %d connections are used at once", settings.MONGO_MAX_POOL_SIZE, threads, threads)
+    smtp = [settings.SMTP_HOST, settings.SMTP_USER, settings.SMTP_PASSWORD, settings.SMTP_FROM_EMAIL]
+    if any(smtp) and not all(smtp):
+        logger.warning("SMTP partially configured: e-mails will not be sent")
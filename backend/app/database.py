@@ -1,21 +1,187 @@
 """
 Database configuration and connection
 """
+import threading
+from collections import defaultdict
+from typing import Dict
+
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from pymongo.read_preferences import Nearest, PrimaryPreferred, ReadPreference, Secondary, SecondaryPreferred
 from app.config import settings
+from app.resilience import MongoBreakerListener
+from app.tracing import MongoCommandTracer
 
 class MongoDB:
     client: AsyncIOMotorClient = None
     database = None
+    # Same database with MONGO_LIST_READ_PREFERENCE, for list endpoints
+    list_database = None
 
 mongodb = MongoDB()
 
+READ_PREFERENCES = {
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def list_read_preference():
+    mode = settings.MONGO_LIST_READ_PREFERENCE
+    if mode == "primary":
+        return ReadPreference.PRIMARY
+    return READ_PREFERENCES[mode](max_staleness=settings.MONGO_MAX_STALENESS_SECONDS or -1)
+
+
+class PoolStats:
+    """Connection counts and checkout waits of one pool (one per server address)"""
+
+    def __init__(self):
+        self.open = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.checkouts = 0
+        self.checkout_wait_seconds = 0.0
+        self.checkout_failed: Dict[str, int] = defaultdict(int)
+        self.cleared = 0
+
+
+class MongoPoolMonitor(monitoring.ConnectionPoolListener):
+    """Pool events to per-server counters read by the /metrics collector"""
+
+    def __init__(self):
+        self.pools: Dict[str, PoolStats] = {}
+        self._lock = threading.Lock()
+
+    def _pool(self, event) -> PoolStats:
+        address = "%s:%s" % event.address
+        pool = self.pools.get(address)
+        if pool is None:
+            pool = self.pools[address] = PoolStats()
+        return pool
+
+    def pool_created(self, event):
+        with self._lock:
+            self._pool(event)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._pool(event).cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self._pool(event).open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self._pool(event).open -= 1
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self._pool(event).waiting += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            pool = self._pool(event)
+            pool.waiting -= 1
+            pool.in_use += 1
+            pool.checkouts += 1
+            pool.checkout_wait_seconds += event.duration or 0.0
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            pool = self._pool(event)
+            pool.waiting -= 1
+            pool.checkout_failed[event.reason] += 1
+            pool.checkout_wait_seconds += event.duration or 0.0
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._pool(event).in_use -= 1
+
+
+pool_monitor = MongoPoolMonitor()
+
+
+def client_options() -> dict:
+    """
+    Pool, compression and timeout options; take precedence over the URL.
+
+    Pool sizes are only passed when set, so maxPoolSize/minPoolSize in the
+    URL (or pymongo's defaults) apply otherwise.
+    """
+    options = {
+        "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": settings.MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": settings.MONGO_SOCKET_TIMEOUT_MS,
+    }
+    if settings.MONGO_MAX_POOL_SIZE:
+        options["maxPoolSize"] = settings.MONGO_MAX_POOL_SIZE
+    if settings.MONGO_MIN_POOL_SIZE:
+        options["minPoolSize"] = settings.MONGO_MIN_POOL_SIZE
+    if settings.MONGO_MAX_IDLE_TIME_MS:
+        options["maxIdleTimeMS"] = settings.MONGO_MAX_IDLE_TIME_MS
+    if settings.MONGO_WAIT_QUEUE_TIMEOUT_MS:
+        options["waitQueueTimeoutMS"] = settings.MONGO_WAIT_QUEUE_TIMEOUT_MS
+    if settings.MONGO_COMPRESSORS:
+        options["compressors"] = settings.MONGO_COMPRESSORS
+    return options
+
 async def init_db():
     """Initialize database connection"""
-    mongodb.client = AsyncIOMotorClient(settings.MONGODB_URL)
+    event_listeners = [MongoBreakerListener(), pool_monitor]
+    if settings.TRACING_ENABLED:
+        event_listeners.append(MongoCommandTracer())
+    # Per-request deadlines (maxTimeMS) come from DeadlineMiddleware; the
+    # client timeouts bound everything else, including work outside a request
+    mongodb.client = AsyncIOMotorClient(settings.MONGODB_URL, event_listeners=event_listeners, **client_options())
     mongodb.database = mongodb.client[settings.DATABASE_NAME]
+    mongodb.list_database = mongodb.database.with_options(read_preference=list_read_preference())
     print(f"Connected to MongoDB: {settings.DATABASE_NAME}")
 
+# Conditional GETs (If-None-Match) read the version from this index alone.
+# They must hint it: an _id equality is otherwise planned on _id_, which
+# fetches the document
+PATIENT_VERSION_INDEX = [("user_id", 1), ("_id", 1), ("versao", 1)]
+
+async def ensure_indexes():
+    """Create the indexes the API relies on (idempotent)"""
+    db = mongodb.database
+    try:
+        await db.pacientes.create_index(PATIENT_VERSION_INDEX)
+        # Nome único por usuário (sem acento/maiúsculas) e busca por prefixo.
+        # Parcial: documentos antigos ganham o campo no upgrade de schema
+        await db.pacientes.create_index(
+            [("user_id", 1), ("nome_normalizado", 1)],
+            unique=True,
+            partialFilterExpression={"nome_normalizado": {"$exists": True}}
+        )
+        # Listas do Dashboard/bootstrap e avaliação mais recente de cada paciente
+        await db.pacientes.create_index([("user_id", 1), ("created_at", -1)])
+        await db.avaliacoes.create_index([("paciente_id", 1), ("data_avaliacao", -1)])
+        # Buckets de pesagens (bucket aberto encontrado pelo n)
+        await db.pesos.create_index([("paciente_id", 1), ("user_id", 1), ("n", 1)])
+        # /api/sync: alterações de um usuário em ordem de seq
+        for colecao in ("pacientes", "avaliacoes", "exclusoes"):
+            await db[colecao].create_index([("user_id", 1), ("seq", 1)])
+        if settings.SYNC_TOMBSTONE_TTL_DAYS > 0:
+            await db.exclusoes.create_index(
+                "alterado_em", expireAfterSeconds=settings.SYNC_TOMBSTONE_TTL_DAYS * 86400
+            )
+    except Exception as e:
+        print(f"Could not create MongoDB indexes: {e}")
+
 async def close_db():
     """Close database connection"""
     if mongodb.client:
@@ -23,8 +189,13 @@ async def close_db():
         print("Disconnected from MongoDB")
         mongodb.client = None
         mongodb.database = None
+        mongodb.list_database = None
 
 def get_database():
     """Get database instance"""
     return mongodb.database
 
+def get_list_database():
+    """Database for list endpoints (MONGO_LIST_READ_PREFERENCE)"""
+    return mongodb.list_database
+
@@ -1,13 +1,12 @@
 """
 Email service for sending password reset and other notification emails.
 """
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from typing import Optional
 import logging
 
 from app.config import settings
+from app.resilience import CircuitOpenError, smtp_breaker
+from app.tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +21,38 @@ def is_email_configured() -> bool:
     )
 
 
+def _send(msg) -> None:
+    """
+    Deliver a message through the configured SMTP server.
+
+    Every socket operation is bounded by SMTP_TIMEOUT_SECONDS, and while the
+    SMTP circuit is open the call fails immediately with CircuitOpenError.
+    Only connection-level failures count against the circuit; a rejected
+    login or recipient means the server is up.
+    """
+    import smtplib
+
+    smtp_breaker.check()
+    try:
+        with span("smtp.send"), smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT,
+                                             timeout=settings.SMTP_TIMEOUT_SECONDS) as server:
+            server.starttls()
+            server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+            server.send_message(msg)
+    except (smtplib.SMTPConnectError, smtplib.SMTPServerDisconnected):
+        smtp_breaker.record_failure()
+        raise
+    except smtplib.SMTPException:
+        smtp_breaker.record_success()
+        raise
+    except OSError:
+        smtp_breaker.record_failure()
+        raise
+    finally:
+        smtp_breaker.probe_done()
+    smtp_breaker.record_success()
+
+
 def send_password_reset_email(to_email: str, reset_token: str) -> bool:
     """
     Send password reset email with the reset link.
@@ -150,6 +181,9 @@ def send_password_reset_email(to_email: str, reset_token: str) -> bool:
     """
     
     try:
+        from email.mime.multipart import MIMEMultipart
+        from email.mime.text import MIMEText
+
         msg = MIMEMultipart("alternative")
         msg["Subject"] = "NutriPré - Recuperação de Senha"
         msg["From"] = f"{settings.SMTP_FROM_NAME} <{settings.SMTP_FROM_EMAIL}>"
@@ -160,14 +194,14 @@ def send_password_reset_email(to_email: str, reset_token: str) -> bool:
         msg.attach(MIMEText(html_content, "html", "utf-8"))
         
         # Send email
-        with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as server:
-            server.starttls()
-            server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
-            server.send_message(msg)
+        _send(msg)
         
         logger.info(f"Password reset email sent successfully to {to_email}")
         return True
         
+    except CircuitOpenError:
+        logger.warning("SMTP circuit open. Password reset email not sent.")
+        return False
     except Exception as e:
         logger.error(f"Unexpected error sending email: {e}")
         return False
@@ -192,6 +226,9 @@ def send_email_with_pdf(to_email: str, subject: str, body: str, pdf_content: byt
         return False
         
     try:
+        from email.mime.multipart import MIMEMultipart
+        from email.mime.text import MIMEText
+
         msg = MIMEMultipart()
         msg["Subject"] = subject
         msg["From"] = f"{settings.SMTP_FROM_NAME} <{settings.SMTP_FROM_EMAIL}>"
@@ -207,14 +244,14 @@ def send_email_with_pdf(to_email: str, subject: str, body: str, pdf_content: byt
         msg.attach(attachment)
         
         # Send email
-        with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as server:
-            server.starttls()
-            server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
-            server.send_message(msg)
+        _send(msg)
         
         logger.info(f"PDF email sent successfully to {to_email}")
         return True
         
+    except CircuitOpenError:
+        logger.warning("SMTP circuit open. PDF email not sent.")
+        return False
     except Exception as e:
         logger.error(f"Failed to send PDF email: {e}")
         return False
@@ -0,0 +1,105 @@
+"""
+Fast serialization path for responses built from trusted database documents.
+
+FastAPI validates a route's return value against ``response_model`` and then
+serializes the validated copy. For documents this API wrote itself (and that
+``atualizar_na_leitura`` already brought to the current schema) the second
+validation is redundant. TrustedSerializer keeps the response_model contract
+(same top-level fields, same defaults for missing keys, extra keys such as
+user_id dropped) but goes straight to bytes: orjson when installed,
+pydantic-core's Rust encoder otherwise. Nested blocks (calculos, relatorio)
+are emitted as stored.
+
+Clients sending ``Accept: application/msgpack`` get MessagePack when
+MSGPACK_RESPONSES is on (requires the optional ``msgpack`` package). Both
+optional packages are pinned in requirements-optional.txt.
+"""
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Type, Union
+
+import pydantic_core
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+from app.config import settings
+
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def _msgpack_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+class TrustedSerializer:
+    """Precompiled projection of documents onto a response model's fields"""
+
+    def __init__(self, model: Type[BaseModel], many: bool = False):
+        self.model = model
+        self.many = many
+        self.fields = [
+            (name, field.get_default(call_default_factory=True))
+            for name, field in model.model_fields.items()
+        ]
+
+    def _project(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        return {name: doc.get(name, default) for name, default in self.fields}
+
+    def project(self, content: Union[Dict[str, Any], List[Dict[str, Any]]]):
+        if self.many:
+            return [self._project(doc) for doc in content]
+        return self._project(content)
+
+    def dump_json(self, content) -> bytes:
+        projected = self.project(content)
+        if orjson is not None:
+            return orjson.dumps(projected)
+        return pydantic_core.to_json(projected)
+
+    def dump_msgpack(self, content) -> bytes:
+        return msgpack.packb(self.project(content), default=_msgpack_default)
+
+
+def msgpack_enabled() -> bool:
+    return settings.MSGPACK_RESPONSES and msgpack is not None
+
+
+def accepts_msgpack(request: Request) -> bool:
+    accept = request.headers.get("accept", "")
+    return any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES)
+
+
+def representation(request: Request) -> str:
+    """Short name of the negotiated representation, used in ETags"""
+    return "msgpack" if msgpack_enabled() and accepts_msgpack(request) else "json"
+
+
+def fast_response(request: Request, serializer: TrustedSerializer, content, response: Optional[Response] = None):
+    """
+    Serialized Response when the fast path applies, otherwise ``content``
+    unchanged so FastAPI validates it against response_model as usual.
+
+    Headers already set on the route's injected ``response`` (validators,
+    cookies) are carried over to the Response built here.
+    """
+    headers = dict(response.headers) if response is not None else {}
+    headers.pop("content-length", None)
+    if msgpack_enabled():
+        headers["Vary"] = "Accept"
+    if representation(request) == "msgpack":
+        return Response(serializer.dump_msgpack(content), media_type=MSGPACK_MEDIA_TYPES[0], headers=headers)
+    if settings.FAST_JSON_RESPONSES:
+        return Response(serializer.dump_json(content), media_type=JSON_MEDIA_TYPE, headers=headers)
+    return content
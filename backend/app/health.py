@@ -0,0 +1,190 @@
+"""
+Liveness and readiness.
+
+``/health/live`` only says the process and its event loop answer.
+``/health/ready`` says whether this instance can serve traffic. Probes never
+touch a dependency themselves: a background task refreshes the checks every
+HEALTH_CHECK_INTERVAL_SECONDS (SMTP less often, HEALTH_SMTP_INTERVAL_SECONDS)
+and the endpoint returns the last snapshot, so probe frequency adds no load.
+
+Readiness fails (503) when Mongo does not answer the ping, the PDF pool is
+not running, warm-up has not finished or the snapshot is stale (the refresh
+task died or the loop is blocked). Slow Mongo, a saturated PDF pool, deep
+queues, event loop lag, an open circuit breaker and an unreachable SMTP
+server only mark the instance ``degraded``: it still serves, and the reasons are listed.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+READY = "ready"
+DEGRADED = "degraded"
+NOT_READY = "not_ready"
+
+
+async def check_mongo(db) -> Dict[str, Any]:
+    started = time.perf_counter()
+    await db.command("ping")
+    latency = (time.perf_counter() - started) * 1000
+    return {
+        "ok": True,
+        "latency_ms": round(latency, 1),
+        "degraded": latency > settings.HEALTH_MONGO_SLOW_MS,
+    }
+
+
+async def check_pdf_pool() -> Dict[str, Any]:
+    from app.services.pdf_jobs import pool_ping, pdf_job_queue
+    if pdf_job_queue.executor is None:
+        return {"ok": False, "error": "PDF pool not started"}
+    depth = pdf_job_queue.depth
+    # A no-op queued behind the renders: how long a new job waits for a worker
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(
+            asyncio.get_running_loop().run_in_executor(pdf_job_queue.executor, pool_ping),
+            timeout=settings.HEALTH_CHECK_TIMEOUT_SECONDS,
+        )
+        wait_ms: Optional[float] = round((time.perf_counter() - started) * 1000, 1)
+    except asyncio.TimeoutError:
+        wait_ms = None
+    return {
+        "ok": True,
+        "workers": settings.PDF_WORKERS,
+        "jobs_pending": depth,
+        "wait_ms": wait_ms,
+        "degraded": wait_ms is None or depth > settings.HEALTH_PDF_QUEUE_DEGRADED,
+    }
+
+
+async def check_smtp() -> Dict[str, Any]:
+    started = time.perf_counter()
+    _, writer = await asyncio.open_connection(settings.SMTP_HOST, settings.SMTP_PORT)
+    writer.close()
+    await writer.wait_closed()
+    return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+
+def check_queues() -> Dict[str, Any]:
+    from app.services.schema_service import gravacao_upgrades
+    pending_upgrades = gravacao_upgrades.pendentes
+    return {
+        "ok": True,
+        "schema_upgrades_pending": pending_upgrades,
+        "degraded": pending_upgrades > settings.HEALTH_UPGRADE_QUEUE_DEGRADED,
+    }
+
+
+def check_warmup() -> Dict[str, Any]:
+    from app.warmup import warmup_report
+    done = warmup_report["done"] or not settings.WARMUP_ENABLED
+    failed = [name for name, step in warmup_report["steps"].items() if not step["ok"]]
+    return {"ok": done, "failed_steps": failed, "degraded": bool(failed)}
+
+
+def check_circuits() -> Dict[str, Any]:
+    # An open circuit is already answered by the mongo/smtp checks; this
+    # only surfaces the breaker state next to them
+    from app.resilience import CLOSED, mongo_breaker, smtp_breaker
+    states = {breaker.name: breaker.state for breaker in (mongo_breaker, smtp_breaker)}
+    return {"ok": True, **states, "degraded": any(state != CLOSED for state in states.values())}
+
+
+class HealthMonitor:
+    """Refreshes the readiness checks in background and keeps the last results"""
+
+    def __init__(self):
+        self.database = None
+        self.checks: Dict[str, Dict[str, Any]] = {}
+        self.refreshed_at: Optional[float] = None
+        self.loop_lag_ms = 0.0
+        self._last_run: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, database) -> None:
+        self.database = database
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self, name: str, check: Callable[[], Awaitable[Dict[str, Any]]]) -> None:
+        try:
+            result = await asyncio.wait_for(check(), timeout=settings.HEALTH_CHECK_TIMEOUT_SECONDS)
+        except Exception as e:
+            result = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        if not result["ok"] and self.checks.get(name, {}).get("ok", True):
+            logger.warning("Health check %s failing: %s", name, result.get("error"))
+        self.checks[name] = result
+        self._last_run[name] = time.monotonic()
+
+    async def refresh(self) -> None:
+        await self._run("mongo", lambda: check_mongo(self.database))
+        await self._run("pdf_pool", check_pdf_pool)
+        from app.email_service import is_email_configured
+        if is_email_configured():
+            last = self._last_run.get("smtp", 0.0)
+            if time.monotonic() - last >= settings.HEALTH_SMTP_INTERVAL_SECONDS:
+                await self._run("smtp", check_smtp)
+        self.checks["queues"] = check_queues()
+        self.checks["warmup"] = check_warmup()
+        self.checks["circuits"] = check_circuits()
+        self.checks["event_loop"] = {
+            "ok": True,
+            "lag_ms": round(self.loop_lag_ms, 1),
+            "degraded": self.loop_lag_ms > settings.HEALTH_LOOP_LAG_DEGRADED_MS,
+        }
+        self.refreshed_at = time.monotonic()
+
+    async def _loop(self) -> None:
+        interval = settings.HEALTH_CHECK_INTERVAL_SECONDS
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Health refresh failed")
+            # How late the loop wakes up is the event loop lag
+            started = time.monotonic()
+            await asyncio.sleep(interval)
+            self.loop_lag_ms = max(0.0, (time.monotonic() - started - interval) * 1000)
+
+    def readiness(self) -> Dict[str, Any]:
+        """Last snapshot with the overall status; never runs a check"""
+        if self.refreshed_at is None:
+            return {"status": NOT_READY, "reason": "checks not run yet", "checks": {}}
+        age = time.monotonic() - self.refreshed_at
+        failing: List[str] = [
+            name for name, result in self.checks.items()
+            if not result["ok"] and name != "smtp"
+        ]
+        if age > 3 * settings.HEALTH_CHECK_INTERVAL_SECONDS:
+            failing.append("stale")
+        degraded = [
+            name for name, result in self.checks.items()
+            if result.get("degraded") or (name == "smtp" and not result["ok"])
+        ]
+        if failing:
+            status = NOT_READY
+        elif degraded:
+            status = DEGRADED
+        else:
+            status = READY
+        return {
+            "status": status,
+            "age_s": round(age, 1),
+            "failing": failing,
+            "degraded": degraded,
+            "checks": self.checks,
+        }
+
+
+health_monitor = HealthMonitor()
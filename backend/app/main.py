@@ -1,18 +1,51 @@
 """
 FastAPI application main file
 """
+import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import init_db, close_db
+from fastapi.responses import JSONResponse
+from pymongo.errors import ConnectionFailure, ExecutionTimeout, PyMongoError, ServerSelectionTimeoutError
+from app.database import init_db, ensure_indexes, close_db, get_database
 from app.routers import pacientes, avaliacoes, auth
+from app.services.pdf_jobs import pdf_job_queue, build_job_store
+from app.services.schema_service import gravacao_upgrades
+from app.services.exclusao_service import exclusao_cascata
+from app.cache import start_caches, stop_caches
+from app.warmup import warm_up
+from app.health import health_monitor
+from app.config import check_settings
+from app.snapshot import load_snapshot, snapshot_saver
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    check_settings()
     await init_db()
+    await start_caches()
+    # Em segundo plano: não atrasa o startup em coleções grandes
+    indexes_task = asyncio.create_task(ensure_indexes())
+    await pdf_job_queue.start(build_job_store(get_database()))
+    gravacao_upgrades.start(get_database())
+    exclusao_cascata.start(get_database())
+    health_monitor.start(get_database())
+    # Caches de relatórios/recomendações do último shutdown (se as regras não mudaram)
+    if settings.CACHE_SNAPSHOT_PATH:
+        load_snapshot(settings.CACHE_SNAPSHOT_PATH)
+        snapshot_saver.start(settings.CACHE_SNAPSHOT_PATH)
+    # Pool do Mongo, índices e um PDF descartável antes de aceitar requisições
+    if settings.WARMUP_ENABLED:
+        await warm_up(get_database(), indexes_task, pdf_job_queue.executor)
     yield
     # Shutdown
+    indexes_task.cancel()
+    await health_monitor.stop()
+    await snapshot_saver.stop()
+    await exclusao_cascata.stop()
+    await gravacao_upgrades.stop()
+    await pdf_job_queue.stop()
+    await stop_caches()
     await close_db()
 
 app = FastAPI(
@@ -49,6 +82,44 @@ if settings.frontend_url_parsed:
 if settings.ENVIRONMENT != "production" and not allowed_origins_env and not settings.frontend_url_parsed:
     cors_origins = ["*"]
 
+# Prazo por requisição nas operações do Mongo (maxTimeMS) e 503 imediato
+# com o circuito do Mongo aberto. Fica por dentro da admissão: o tempo na
+# fila não consome o prazo
+from app.resilience import CLOSED, DeadlineMiddleware, mongo_breaker
+app.add_middleware(DeadlineMiddleware)
+
+
+@app.exception_handler(ConnectionFailure)
+@app.exception_handler(ExecutionTimeout)
+async def mongo_unavailable(request: Request, exc: PyMongoError):
+    # Sem servidor selecionável não há evento de comando para o breaker
+    if isinstance(exc, ServerSelectionTimeoutError):
+        mongo_breaker.record_failure()
+    if exc.timeout:
+        return JSONResponse(status_code=504, content={"detail": "Tempo limite do banco de dados excedido"})
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Banco de dados indisponível, tente novamente em instantes"},
+        headers={"Retry-After": str(mongo_breaker.retry_after() if mongo_breaker.state != CLOSED else 1)},
+    )
+
+
+# Admissão por classe de rota (pdf, email, auth, write, read). Adicionado
+# antes do CORS para ficar por dentro dele: as respostas 503/429 levam os
+# cabeçalhos CORS e o navegador enxerga o Retry-After
+if settings.ADMISSION_ENABLED:
+    from app.admission import AdmissionMiddleware, TokenBuckets, build_limiters
+    admission_limiters = build_limiters(
+        settings.ADMISSION_CONCURRENCY,
+        settings.ADMISSION_QUEUE,
+        settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+    )
+    app.add_middleware(
+        AdmissionMiddleware,
+        limiters=admission_limiters,
+        quotas=TokenBuckets(settings.ADMISSION_USER_QUOTAS) if settings.ADMISSION_USER_QUOTAS else None,
+    )
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=cors_origins,
@@ -57,6 +128,104 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Métricas (latência por rota, requisições em andamento, status e tamanho)
+if settings.METRICS_ENABLED:
+    from app.metrics import MetricsMiddleware, registry, render_metrics, PROMETHEUS_CONTENT_TYPE
+    app.add_middleware(MetricsMiddleware)
+
+    pdf_jobs_pending = registry.gauge("pdf_jobs_pending", "PDF jobs submitted and not finished")
+    registry.add_collector(lambda: pdf_jobs_pending.set(pdf_job_queue.depth))
+
+    from app.cache import cache
+    from app.services.posse_service import cache_posse
+    cache_hits = registry.gauge("cache_hits", "Lookups served from the cache since start", ["cache"])
+    cache_misses = registry.gauge("cache_misses", "Lookups that missed the cache since start", ["cache"])
+    cache_hit_ratio = registry.gauge("cache_hit_ratio", "Hits / lookups since start", ["cache"])
+    cache_entries = registry.gauge("cache_entries", "Entries currently held", ["cache"])
+
+    def collect_cache_stats():
+        for name, instance in (("app", cache), ("ownership", cache_posse)):
+            lookups = instance.hits + instance.misses
+            cache_hits.set(instance.hits, (name,))
+            cache_misses.set(instance.misses, (name,))
+            cache_hit_ratio.set(instance.hits / lookups if lookups else 0, (name,))
+            cache_entries.set(len(instance), (name,))
+
+    registry.add_collector(collect_cache_stats)
+
+    if settings.ADMISSION_ENABLED:
+        admission_admitted = registry.gauge("admission_admitted", "Requests admitted since start", ["class"])
+        admission_rejected = registry.gauge("admission_rejected", "Requests shed since start", ["class", "reason"])
+        admission_in_flight = registry.gauge("admission_in_flight", "Requests holding a slot", ["class"])
+        admission_queued = registry.gauge("admission_queued", "Requests waiting for a slot", ["class"])
+        admission_wait_seconds = registry.gauge("admission_wait_seconds", "Total time spent queued since start", ["class"])
+
+        def collect_admission_stats():
+            for name, limiter in admission_limiters.items():
+                admission_admitted.set(limiter.admitted, (name,))
+                for reason, count in limiter.rejected.items():
+                    admission_rejected.set(count, (name, reason))
+                admission_in_flight.set(limiter.active, (name,))
+                admission_queued.set(limiter.queued, (name,))
+                admission_wait_seconds.set(limiter.wait_seconds, (name,))
+
+        registry.add_collector(collect_admission_stats)
+
+    from app.database import pool_monitor
+    mongo_pool_connections = registry.gauge("mongo_pool_connections", "Connections in the Motor pool", ["server", "state"])
+    mongo_pool_checkouts = registry.gauge("mongo_pool_checkouts", "Connections checked out since start", ["server"])
+    mongo_pool_checkout_wait_seconds = registry.gauge("mongo_pool_checkout_wait_seconds", "Total time waiting for a connection since start", ["server"])
+    mongo_pool_checkout_failed = registry.gauge("mongo_pool_checkout_failed", "Checkouts that failed since start", ["server", "reason"])
+    mongo_pool_cleared = registry.gauge("mongo_pool_cleared", "Times the pool was cleared after a server error", ["server"])
+
+    def collect_pool_stats():
+        for server, pool in list(pool_monitor.pools.items()):
+            mongo_pool_connections.set(pool.open, (server, "open"))
+            mongo_pool_connections.set(pool.in_use, (server, "in_use"))
+            mongo_pool_connections.set(pool.waiting, (server, "waiting"))
+            mongo_pool_checkouts.set(pool.checkouts, (server,))
+            mongo_pool_checkout_wait_seconds.set(pool.checkout_wait_seconds, (server,))
+            for reason, count in list(pool.checkout_failed.items()):
+                mongo_pool_checkout_failed.set(count, (server, reason))
+            mongo_pool_cleared.set(pool.cleared, (server,))
+
+    registry.add_collector(collect_pool_stats)
+
+    from app.resilience import HALF_OPEN, OPEN, smtp_breaker
+    circuit_state = registry.gauge("circuit_state", "Circuit breaker state: 0 closed, 1 half-open, 2 open", ["dependency"])
+    circuit_opened = registry.gauge("circuit_opened", "Times the circuit opened since start", ["dependency"])
+    circuit_rejected = registry.gauge("circuit_rejected", "Calls failed fast by an open circuit since start", ["dependency"])
+    circuit_levels = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def collect_circuit_stats():
+        for breaker in (mongo_breaker, smtp_breaker):
+            circuit_state.set(circuit_levels[breaker.state], (breaker.name,))
+            circuit_opened.set(breaker.times_opened, (breaker.name,))
+            circuit_rejected.set(breaker.rejected, (breaker.name,))
+
+    registry.add_collector(collect_circuit_stats)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return Response(content=render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+# Profiler sob demanda (admins) e por amostragem
+if settings.PROFILER_ENABLED:
+    from app.profiler import ProfilerMiddleware
+    app.add_middleware(
+        ProfilerMiddleware,
+        routes=app.router.routes,
+        sample_every=settings.PROFILER_SAMPLE_EVERY,
+        interval_ms=settings.PROFILER_INTERVAL_MS,
+        trace_allocations=settings.PROFILER_TRACEMALLOC,
+    )
+
+# Tracing (Server-Timing por categoria: db, rules, pdf, smtp)
+if settings.TRACING_ENABLED:
+    from app.tracing import TracingMiddleware, OTLPFileExporter
+    exporter = OTLPFileExporter(settings.TRACE_EXPORT_PATH) if settings.TRACE_EXPORT_PATH else None
+    app.add_middleware(TracingMiddleware, exporter=exporter)
+
 # Incluir rotas
 app.include_router(pacientes.router, prefix="/api", tags=["Pacientes"])
 app.include_router(avaliacoes.router, prefix="/api", tags=["Avaliações"])
@@ -65,6 +234,12 @@ from app.routers import calculos
 app.include_router(calculos.router, prefix="/api/calculos", tags=["Cálculos"])
 from app.routers import pdf
 app.include_router(pdf.router, prefix="/api", tags=["PDF"])
+from app.routers import admin
+app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
+from app.routers import sync
+app.include_router(sync.router, prefix="/api", tags=["Sincronização"])
+from app.routers import bootstrap
+app.include_router(bootstrap.router, prefix="/api", tags=["Dashboard"])
 
 @app.get("/")
 async def root():
@@ -74,3 +249,15 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/health/live")
+async def health_live():
+    # Só o processo: dependências fora do ar não devem reiniciar o worker
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def health_ready(response: Response):
+    report = health_monitor.readiness()
+    if report["status"] == "not_ready":
+        response.status_code = 503
+    return report
+
@@ -5,6 +5,7 @@ from pydantic import BaseModel, Field, ConfigDict, EmailStr
 from typing import Optional, Dict, Any, List
 from datetime import datetime, date
 from enum import Enum
+from app.models.user import UserResponse
 
 class RiskLevel(str, Enum):
     BAIXO = "Baixo"
@@ -67,6 +68,24 @@ class PacienteResponse(BaseModel):
     
     model_config = ConfigDict(from_attributes=True)
 
+class BuscaPacientesResponse(BaseModel):
+    itens: List[PacienteResponse]
+    next_cursor: Optional[str] = Field(None, description="Enviar como ?cursor= para a próxima página")
+
+class ImportacaoErro(BaseModel):
+    linha: int
+    nome: Optional[str] = None
+    erro: str
+
+class ImportacaoResponse(BaseModel):
+    """Relatório da importação em massa de pacientes"""
+    total: int
+    inseridos: int
+    duplicados: int
+    invalidos: int
+    erros: List[ImportacaoErro] = []
+    erros_truncados: bool = False
+
 # --- ATUALIZADO: Avaliação Schemas ---
 class RespostasChecklist(BaseModel):
     # Campos do formulário
@@ -135,6 +154,23 @@ class AvaliacaoRequest(BaseModel):
     respostas: Dict[str, Any]
     observacoes: Optional[str] = None
 
+class AvaliacaoLoteItem(AvaliacaoRequest):
+    """Avaliação histórica na ingestão em lote (data original opcional)"""
+    data_avaliacao: Optional[datetime] = None
+
+class AvaliacaoLoteRequest(BaseModel):
+    avaliacoes: List[AvaliacaoLoteItem] = Field(..., min_length=1)
+
+class AvaliacaoLoteErro(BaseModel):
+    indice: int
+    paciente_id: Optional[str] = None
+    erro: str
+
+class AvaliacaoLoteResponse(BaseModel):
+    total: int
+    inseridas: int
+    erros: List[AvaliacaoLoteErro] = []
+
 class AvaliacaoResponse(AvaliacaoBase):
     id: str
     data_avaliacao: datetime
@@ -145,6 +181,83 @@ class AvaliacaoResponse(AvaliacaoBase):
     
     model_config = ConfigDict(from_attributes=True)
 
+class SyncExclusao(BaseModel):
+    colecao: str
+    id: str
+    seq: int
+
+class SyncResponse(BaseModel):
+    """Alterações desde o token informado (uma página)"""
+    pacientes: List[PacienteResponse]
+    avaliacoes: List[AvaliacaoResponse]
+    exclusoes: List[SyncExclusao]
+    token: str = Field(..., description="Enviar como ?since= na próxima sincronização")
+    has_more: bool
+
+class UltimaAvaliacaoResumo(BaseModel):
+    id: str
+    data_avaliacao: datetime
+    semana_gestacional: int
+    peso_atual: float
+    trimestre: str
+    imc_classification: str
+    alertas_criticos: int = 0
+
+class PacienteResumo(PacienteResponse):
+    ultima_avaliacao: Optional[UltimaAvaliacaoResumo] = None
+
+class PacienteAlerta(BaseModel):
+    id: str
+    nome: str
+    alertas_criticos: int
+
+class EstatisticasDashboard(BaseModel):
+    """Contagens pela avaliação mais recente de cada paciente"""
+    por_trimestre: Dict[str, int] = {}
+    por_imc: Dict[str, int] = {}
+    com_alertas_criticos: int = 0
+    pacientes_com_alertas: List[PacienteAlerta] = []
+
+class BootstrapResponse(BaseModel):
+    """Tudo que o Dashboard precisa na primeira tela"""
+    usuario: UserResponse
+    pacientes: List[PacienteResumo]
+    total_pacientes: int
+    estatisticas: EstatisticasDashboard
+
+class AvaliacaoTimeline(BaseModel):
+    id: str
+    data_avaliacao: datetime
+    semana_gestacional: int
+    peso_atual: float
+    ganho_peso_atual: Optional[float] = None
+    imc_classification: Optional[str] = None
+    trimestre: Optional[str] = None
+    alertas_criticos: int = 0
+
+class PontoTrajetoria(BaseModel):
+    semana: int
+    data_avaliacao: Optional[datetime] = None
+    ganho: float
+    esperado_min: float
+    esperado_max: float
+
+class TimelineResponse(BaseModel):
+    """Perfil da paciente com histórico e trajetória de ganho de peso (faixa FIGO)"""
+    paciente: PacienteResponse
+    classificacao_imc: Optional[str] = None
+    avaliacoes: List[AvaliacaoTimeline]
+    trajetoria: List[PontoTrajetoria]
+    amostrada: bool = Field(False, description="True quando a trajetória foi reduzida")
+
+class SeriePesosResponse(BaseModel):
+    """Pesagens em colunas; a posição i de cada lista é a mesma avaliação"""
+    paciente_id: str
+    datas: List[datetime]
+    semanas: List[int]
+    pesos: List[float]
+    ganhos: List[Optional[float]]
+
 class IMCCalculationRequest(BaseModel):
     weight: float
     height: float
@@ -40,7 +40,10 @@ class UserBase(BaseModel):
     full_name: Optional[str] = None
     role: str = "healthcare_professional" # healthcare_professional, admin
 
-class UserCreate(UserBase):
+class UserCreate(BaseModel):
+    # Sem "role": o papel não é escolhido por quem se cadastra
+    email: EmailStr
+    full_name: Optional[str] = None
     password: str
 
 class UserInDB(UserBase):
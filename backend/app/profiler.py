@@ -0,0 +1,258 @@
+"""
+On-demand sampling profiler.
+
+A request is profiled when an admin asks for it (``X-Profile: 1`` header or
+``?_profile=1``; the bearer token must resolve to a user with role
+``admin``) or, when PROFILER_SAMPLE_EVERY is N > 0, for 1 in N requests of
+each route.
+
+While the request runs, a background thread samples the stack of the
+serving thread via ``sys._current_frames()`` and aggregates it in collapsed
+stack format (``frame;frame;frame count``), which flamegraph.pl, speedscope
+and inferno read directly. For PDF routes a tracemalloc snapshot of the top
+allocation sites can be saved as well. Only one request is profiled at a
+time; the event loop thread is shared, so concurrent requests show up in
+the samples too.
+
+The render itself runs on the PDF executor, outside the sampled thread.
+With PDF_EXECUTOR=process it also runs in another process, where
+tracemalloc cannot see it, so the snapshot is only taken with
+PDF_EXECUTOR=thread.
+"""
+import asyncio
+import json
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app.config import settings
+
+PROFILE_ID_RE = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$")
+PROFILE_HEADER = b"x-profile"
+PROFILE_QUERY_FLAG = "_profile=1"
+PDF_ROUTE_PREFIX = "/api/pdf"
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's stack at a fixed interval"""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name="profiler-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_qualname}")
+                frame = frame.f_back
+            stack.reverse()
+            self.stacks[";".join(stack)] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileStore:
+    """Profiles on disk: {id}.json (metadata), {id}.folded, {id}.alloc.txt"""
+
+    def __init__(self, directory: str, max_profiles: int):
+        self.directory = directory
+        self.max_profiles = max_profiles
+
+    def new_id(self) -> str:
+        return f"{datetime.utcnow():%Y%m%dT%H%M%S}-{secrets.token_hex(4)}"
+
+    def path(self, profile_id: str, suffix: str) -> Optional[str]:
+        if not PROFILE_ID_RE.match(profile_id):
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.{suffix}")
+        return path if os.path.exists(path) else None
+
+    def save(self, profile_id: str, metadata: Dict, folded: str, allocations: Optional[str]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, f"{profile_id}.folded"), "w") as f:
+            f.write(folded)
+        if allocations is not None:
+            with open(os.path.join(self.directory, f"{profile_id}.alloc.txt"), "w") as f:
+                f.write(allocations)
+        # metadata last: a profile is listed only once its files are complete
+        with open(os.path.join(self.directory, f"{profile_id}.json"), "w") as f:
+            json.dump(metadata, f)
+        self._prune()
+
+    def list(self) -> List[Dict]:
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        profiles.sort(key=lambda p: p.get("created_at", ""), reverse=True)
+        return profiles
+
+    def _prune(self) -> None:
+        ids = sorted(name[:-5] for name in os.listdir(self.directory) if name.endswith(".json"))
+        for profile_id in ids[:max(0, len(ids) - self.max_profiles)]:
+            for suffix in ("json", "folded", "alloc.txt"):
+                try:
+                    os.remove(os.path.join(self.directory, f"{profile_id}.{suffix}"))
+                except FileNotFoundError:
+                    pass
+
+
+profile_store = ProfileStore(settings.PROFILER_DIR, settings.PROFILER_MAX_PROFILES)
+
+
+def _format_allocations(snapshot: tracemalloc.Snapshot, limit: int = 50) -> str:
+    stats = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    )).statistics("lineno")
+    total = sum(stat.size for stat in stats)
+    lines = [f"Total allocated (live at end of request): {total / 1024:.1f} KiB", ""]
+    for stat in stats[:limit]:
+        frame = stat.traceback[0]
+        lines.append(f"{stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  {frame.filename}:{frame.lineno}")
+    return "\n".join(lines) + "\n"
+
+
+class ProfilerMiddleware:
+    """Pure ASGI middleware; decides per request whether to profile it"""
+
+    def __init__(self, app, routes=None, sample_every: int = 0, interval_ms: float = 5.0,
+                 trace_allocations: bool = False, store: ProfileStore = profile_store):
+        self.app = app
+        self.routes = routes or []
+        self.sample_every = sample_every
+        self.interval = interval_ms / 1000
+        self.trace_allocations = trace_allocations
+        self.store = store
+        self._route_counts: Dict[str, int] = {}
+        self._busy = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self._busy:
+            await self.app(scope, receive, send)
+            return
+
+        reason = None
+        if self._requested(scope):
+            if await self._is_admin(scope):
+                reason = "admin"
+        elif self.sample_every > 0 and self._sampled(scope):
+            reason = "sampling"
+
+        if reason is None:
+            await self.app(scope, receive, send)
+            return
+        await self._profile(scope, receive, send, reason)
+
+    def _requested(self, scope) -> bool:
+        if PROFILE_QUERY_FLAG in scope.get("query_string", b"").decode("latin-1").split("&"):
+            return True
+        return any(key == PROFILE_HEADER and value == b"1" for key, value in scope.get("headers", []))
+
+    async def _is_admin(self, scope) -> bool:
+        from app.auth import get_user_from_token
+
+        for key, value in scope.get("headers", []):
+            if key == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() != "bearer" or not token:
+                    return False
+                user = await get_user_from_token(token)
+                return user is not None and user.role == "admin"
+        return False
+
+    def _route_path(self, scope) -> str:
+        from starlette.routing import Match
+
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return "<unmatched>"
+
+    def _sampled(self, scope) -> bool:
+        route = self._route_path(scope)
+        count = self._route_counts.get(route, 0) + 1
+        self._route_counts[route] = count
+        return count % self.sample_every == 0
+
+    async def _profile(self, scope, receive, send, reason: str):
+        self._busy = True
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        alloc = (self.trace_allocations and settings.PDF_EXECUTOR == "thread"
+                 and scope["path"].startswith(PDF_ROUTE_PREFIX))
+        started_tracemalloc = alloc and not tracemalloc.is_tracing()
+        if started_tracemalloc:
+            tracemalloc.start(10)
+
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            sampler.stop()
+            allocations = None
+            if alloc:
+                allocations = _format_allocations(tracemalloc.take_snapshot())
+                if started_tracemalloc:
+                    tracemalloc.stop()
+            self._busy = False
+
+            from app.tracing import correlation_id
+            profile_id = self.store.new_id()
+            metadata = {
+                "id": profile_id,
+                "created_at": datetime.utcnow().isoformat(),
+                "reason": reason,
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(scope.get("route"), "path", None) or scope["path"],
+                "status": status_code,
+                "duration_ms": round(elapsed * 1000, 2),
+                "samples": sampler.samples,
+                "interval_ms": self.interval * 1000,
+                "correlation_id": correlation_id(),
+                "allocations": allocations is not None,
+                "pdf_executor": settings.PDF_EXECUTOR,
+            }
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.store.save, profile_id, metadata, sampler.collapsed(), allocations
+            )
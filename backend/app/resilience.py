@@ -0,0 +1,202 @@
+"""
+Deadlines and circuit breakers for Mongo and SMTP.
+
+Deadlines: DeadlineMiddleware runs every request inside
+``pymongo.timeout(REQUEST_DEADLINE_SECONDS)`` (BULK_REQUEST_DEADLINE_SECONDS
+for sync/import/batch routes). pymongo turns the remaining budget into
+``maxTimeMS`` and socket timeouts for each operation of the request, so a
+slow database fails the request at its deadline instead of holding it until
+the platform kills it. Motor runs operations with a copy of the request
+context, which is how the deadline reaches its executor threads. Tasks that
+outlive the request must not inherit it (see PDFJobQueue.submit).
+
+Circuit breakers: after CIRCUIT_FAILURE_THRESHOLD consecutive failures a
+dependency is "open" and calls fail fast (503 with Retry-After for Mongo
+routes, ``False`` from the e-mail senders) for CIRCUIT_RESET_SECONDS. Then
+it goes "half-open": one probe is let through, and its outcome closes or
+reopens the circuit. Mongo outcomes come from a pymongo CommandListener
+(every command, including the readiness ping) and from server selection
+errors; SMTP outcomes from email_service.
+"""
+import math
+import threading
+import time
+from typing import Iterable, Optional
+from urllib.parse import parse_qs
+
+import pymongo
+from pymongo import monitoring
+
+from app.admission import reject
+from app.config import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Server error code for an operation that ran past its maxTimeMS
+MAX_TIME_MS_EXPIRED = 50
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, breaker: "CircuitBreaker"):
+        super().__init__(f"circuit {breaker.name} is open")
+        self.breaker = breaker
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker; thread-safe (Mongo events arrive from Motor's threads)"""
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float, half_open_probes: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+        self.times_opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if self._state == OPEN and now - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probes = 0
+            self._opened_at = now
+        elif self._state == HALF_OPEN and now - self._opened_at >= self.reset_timeout:
+            # A probe that never reported back must not wedge the circuit
+            self._probes = 0
+            self._opened_at = now
+
+    def _open(self) -> None:
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self.times_opened += 1
+
+    def allow(self) -> bool:
+        """Whether a call may go through; in half-open it takes a probe slot"""
+        with self._lock:
+            self._refresh()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def check(self) -> None:
+        if not self.allow():
+            raise CircuitOpenError(self)
+
+    def probe_done(self) -> None:
+        """Return a half-open probe slot that ended without an outcome"""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._refresh()
+            if self._state != OPEN:
+                self._state = CLOSED
+                self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._refresh()
+            if self._state == HALF_OPEN:
+                self._open()
+            elif self._state == CLOSED:
+                self._failures += 1
+                if self._failures >= self.failure_threshold:
+                    self._open()
+
+    def retry_after(self) -> int:
+        with self._lock:
+            remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+        return max(1, math.ceil(remaining))
+
+
+mongo_breaker = CircuitBreaker("mongo", settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_RESET_SECONDS)
+smtp_breaker = CircuitBreaker("smtp", settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_RESET_SECONDS)
+
+
+class MongoBreakerListener(monitoring.CommandListener):
+    """Feeds command outcomes to the Mongo breaker"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_breaker.record_success()
+
+    def failed(self, event):
+        failure = event.failure if isinstance(event.failure, dict) else {}
+        # Client-side failures (network, timeouts) carry "errtype"; server
+        # replies carry a code. Only unavailability counts, not e.g. duplicate keys
+        if "errtype" in failure or failure.get("code") == MAX_TIME_MS_EXPIRED:
+            mongo_breaker.record_failure()
+
+
+# Routes that run long on purpose (NDJSON export, bulk import/ingest)
+BULK_PATHS = ("/api/sync", "/api/pacientes/import", "/api/avaliacoes/batch")
+# /api routes that never touch Mongo are not gated by its breaker
+MONGO_FREE_PREFIXES = ("/api/calculos",)
+PDF_PREFIX = "/api/pdf"
+# Inline renders; job creation (async_mode) and the /jobs routes use the job store
+PDF_INLINE_PATHS = ("/api/pdf/generate", "/api/pdf/send-email")
+TRUE_VALUES = ("1", "true", "yes", "on")
+
+
+def request_deadline(path: str) -> float:
+    if path in BULK_PATHS:
+        return settings.BULK_REQUEST_DEADLINE_SECONDS
+    return settings.REQUEST_DEADLINE_SECONDS
+
+
+def uses_mongo(path: str, query_string: bytes = b"",
+               mongo_free_prefixes: Iterable[str] = MONGO_FREE_PREFIXES) -> bool:
+    if not path.startswith("/api/") or path.startswith(tuple(mongo_free_prefixes)):
+        return False
+    if path.startswith(PDF_PREFIX):
+        if settings.PDF_JOB_STORE != "mongo":
+            return False
+        if path in PDF_INLINE_PATHS:
+            async_mode = parse_qs(query_string.decode("latin-1")).get("async_mode", [""])[-1]
+            return async_mode.lower() in TRUE_VALUES
+    return True
+
+
+class DeadlineMiddleware:
+    """Pure ASGI middleware: per-request Mongo deadline and fail-fast while the circuit is open"""
+
+    def __init__(self, app, breaker: Optional[CircuitBreaker] = None):
+        self.app = app
+        self.breaker = breaker or mongo_breaker
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not uses_mongo(scope["path"], scope.get("query_string", b"")):
+            await self.app(scope, receive, send)
+            return
+        if not self.breaker.allow():
+            await reject(send, 503, self.breaker.retry_after(), "Banco de dados indisponível, tente novamente em instantes")
+            return
+        deadline = request_deadline(scope["path"])
+        try:
+            if deadline > 0:
+                with pymongo.timeout(deadline):
+                    await self.app(scope, receive, send)
+            else:
+                await self.app(scope, receive, send)
+        finally:
+            self.breaker.probe_done()
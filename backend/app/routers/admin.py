@@ -0,0 +1,69 @@
+"""
+Rotas administrativas (restritas ao papel admin)
+"""
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+from app.database import get_database
+from app.auth import get_current_admin
+from app.models.user import UserResponse
+from app.services.schema_service import contar_por_versao, versao_atual, gravacao_upgrades
+from app.profiler import profile_store
+
+router = APIRouter()
+
+@router.get("/schema-versions")
+async def versoes_schema(
+    db=Depends(get_database),
+    current_user: UserResponse = Depends(get_current_admin)
+):
+    """
+    Quantidade de documentos em cada versão de schema por coleção
+    
+    Mostra o que ainda falta para a migração offline tratar
+    """
+    colecoes = {}
+    for colecao in ("pacientes", "avaliacoes"):
+        colecoes[colecao] = {
+            "versao_atual": versao_atual(colecao),
+            "por_versao": await contar_por_versao(db, colecao),
+        }
+    return {
+        "colecoes": colecoes,
+        "upgrades_na_leitura": gravacao_upgrades.lidos_desatualizados,
+        "upgrades_gravados": gravacao_upgrades.gravados,
+    }
+
+
+@router.get("/profiles")
+async def listar_profiles(current_user: UserResponse = Depends(get_current_admin)):
+    """Perfis gravados pelo profiler, do mais recente para o mais antigo"""
+    return await run_in_threadpool(profile_store.list)
+
+
+@router.get("/profiles/{profile_id}/flamegraph")
+async def baixar_flamegraph(
+    profile_id: str,
+    current_user: UserResponse = Depends(get_current_admin)
+):
+    """
+    Pilhas amostradas no formato collapsed (uma pilha por linha + contagem)
+    
+    Abra em speedscope.app ou gere o SVG com flamegraph.pl
+    """
+    path = profile_store.path(profile_id, "folded")
+    if not path:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
+
+
+@router.get("/profiles/{profile_id}/allocations")
+async def baixar_alocacoes(
+    profile_id: str,
+    current_user: UserResponse = Depends(get_current_admin)
+):
+    """Maiores pontos de alocação (tracemalloc) das rotas de PDF"""
+    path = profile_store.path(profile_id, "alloc.txt")
+    if not path:
+        raise HTTPException(status_code=404, detail="Perfil sem snapshot de alocações")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.alloc.txt")
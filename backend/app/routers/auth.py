@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from starlette.concurrency import run_in_threadpool
 from datetime import timedelta
 from pydantic import BaseModel, EmailStr
 import logging
@@ -45,9 +46,11 @@ async def register(user: UserCreate):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
+    # bcrypt fora do event loop
+    hashed_password = await run_in_threadpool(get_password_hash, user.password)
     user_in_db = UserInDB(
-        **user.model_dump(),
+        **user.model_dump(exclude={"password"}),
+        role="healthcare_professional",  # administradores são promovidos direto no banco
         hashed_password=hashed_password
     )
     
@@ -59,7 +62,7 @@ async def register(user: UserCreate):
 @router.post("/login")
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     user = await get_database().users.find_one({"email": form_data.username})
-    if not user or not verify_password(form_data.password, user["hashed_password"]):
+    if not user or not await run_in_threadpool(verify_password, form_data.password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -106,7 +109,7 @@ async def forgot_password(request: ForgotPasswordRequest):
     if user:
         # Generate reset token and send via email
         reset_token = create_password_reset_token(request.email)
-        email_sent = send_password_reset_email(request.email, reset_token)
+        email_sent = await run_in_threadpool(send_password_reset_email, request.email, reset_token)
         
         if not email_sent:
             logger.error(f"Failed to send password reset email to {request.email}")
@@ -158,7 +161,7 @@ async def reset_password(request: ResetPasswordRequest):
         )
     
     # Update password
-    hashed_password = get_password_hash(request.new_password)
+    hashed_password = await run_in_threadpool(get_password_hash, request.new_password)
     await get_database().users.update_one(
         {"email": email},
         {"$set": {"hashed_password": hashed_password}}
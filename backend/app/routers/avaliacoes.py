@@ -1,18 +1,20 @@
 """
 Rotas para gerenciamento de avaliações
 """
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from typing import List, Optional
 from bson import ObjectId
 from datetime import datetime
 from pymongo import DESCENDING
-from app.database import get_database
+from app.database import get_database, get_list_database
 from app.models.schemas import (
     AvaliacaoRequest,
     AvaliacaoResponse,
     CalculosResponse,
     RelatorioResponse,
-    RespostasChecklist
+    RespostasChecklist,
+    AvaliacaoLoteRequest,
+    AvaliacaoLoteResponse
 )
 from app.auth import get_current_user
 from app.models.user import UserResponse
@@ -24,14 +26,32 @@ from app.services.calculos_service import (
     determinar_trimestre
 )
 from app.services.relatorio_service import gerar_relatorio_completo
+from app.services.avaliacao_lote_service import criar_avaliacoes_em_lote
+from app.services.schema_service import atualizar_na_leitura, versao_atual
+from app.fast_json import TrustedSerializer, fast_response, representation
+from app.http_cache import weak_etag, is_not_modified, not_modified_response, set_validators
+from app.services.alteracoes_service import (
+    registrar_alteracao,
+    confirmar_alteracao,
+    estado_alteracoes,
+    carimbar,
+    marca,
+    registrar_exclusao
+)
+from app.services.pesos_service import registrar_medidas, remover_medida
+from app.services.exclusao_service import descartar_orfas
+from app.services.posse_service import paciente_do_usuario, invalidar_posse
 
 router = APIRouter()
 
+AVALIACAO_JSON = TrustedSerializer(AvaliacaoResponse)
+AVALIACOES_JSON = TrustedSerializer(AvaliacaoResponse, many=True)
+
 def avaliacao_helper(avaliacao) -> dict:
     """Helper para converter documento MongoDB para dict"""
     if not avaliacao:
         return None
-    avaliacao_dict = dict(avaliacao)
+    avaliacao_dict = dict(atualizar_na_leitura("avaliacoes", avaliacao))
     avaliacao_dict["id"] = str(avaliacao_dict["_id"])
     avaliacao_dict.pop("_id", None)
     return avaliacao_dict
@@ -57,10 +77,7 @@ async def criar_avaliacao(
         raise HTTPException(status_code=400, detail="ID inválido")
     
     # Busca Paciente para pegar o Peso Pré-Gestacional (AGORA FIXO NO PACIENTE)
-    paciente = await db.pacientes.find_one({
-        "_id": ObjectId(req.paciente_id),
-        "user_id": str(current_user.id)
-    })
+    paciente = await paciente_do_usuario(db, req.paciente_id, str(current_user.id))
     if not paciente:
         raise HTTPException(status_code=404, detail="Paciente não encontrada")
     
@@ -74,8 +91,17 @@ async def criar_avaliacao(
             # Atualiza o cadastro do paciente com o peso pré-gestacional
             await db.pacientes.update_one(
                 {"_id": ObjectId(req.paciente_id)},
-                {"$set": {"peso_pre_gestacional": peso_pre}}
+                {
+                    "$set": {
+                        "peso_pre_gestacional": peso_pre,
+                        "updated_at": datetime.utcnow(),
+                        **marca(await registrar_alteracao(db, str(current_user.id)))
+                    },
+                    "$inc": {"versao": 1}
+                }
             )
+            await confirmar_alteracao(db, str(current_user.id))
+            await invalidar_posse(req.paciente_id)
         else:
             raise HTTPException(
                 status_code=400, 
@@ -111,6 +137,7 @@ async def criar_avaliacao(
     # Salvar
     avaliacao_doc = {
         "paciente_id": req.paciente_id,
+        "user_id": str(current_user.id),
         "semana_gestacional": req.semana_gestacional,
         "peso_atual": req.peso_atual,
         "peso_pre_gestacional": peso_pre, # Salva cópia histórica
@@ -118,41 +145,78 @@ async def criar_avaliacao(
         "observacoes": req.observacoes,
         "data_avaliacao": datetime.utcnow(),
         "calculos": calculos.model_dump(),
-        "relatorio": relatorio.model_dump()
+        "relatorio": relatorio.model_dump(),
+        "schema_version": versao_atual("avaliacoes"),
+        "versao": 1
     }
     
+    await carimbar(db, str(current_user.id), [avaliacao_doc])
     res = await db.avaliacoes.insert_one(avaliacao_doc)
+    await registrar_medidas(db, str(current_user.id), [avaliacao_doc])
+    await db.pacientes.update_one(
+        {"_id": ObjectId(req.paciente_id)},
+        {
+            "$inc": {"total_avaliacoes": 1},
+            "$max": {"ultima_avaliacao_em": avaliacao_doc["data_avaliacao"]}
+        }
+    )
+    await confirmar_alteracao(db, str(current_user.id))
+    if await descartar_orfas(db, str(current_user.id), [req.paciente_id]):
+        raise HTTPException(status_code=404, detail="Paciente não encontrada")
     created = await db.avaliacoes.find_one({"_id": res.inserted_id})
     
     return avaliacao_helper(created)
 
+@router.post("/avaliacoes/batch", response_model=AvaliacaoLoteResponse, status_code=201)
+async def criar_avaliacoes_lote(
+    req: AvaliacaoLoteRequest,
+    db=Depends(get_database),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Cria avaliações em lote (importação de históricos)
+    
+    Itens inválidos não interrompem o lote: são listados em `erros` com o
+    índice correspondente na requisição
+    """
+    return await criar_avaliacoes_em_lote(db, req.avaliacoes, str(current_user.id))
+
 @router.get("/pacientes/{paciente_id}/avaliacoes", response_model=List[AvaliacaoResponse])
 async def listar_avaliacoes_paciente(
     paciente_id: str,
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     db=Depends(get_database),
+    db_lista=Depends(get_list_database),
     current_user: UserResponse = Depends(get_current_user)
 ):
     """
     Lista o histórico de avaliações de uma paciente
     
-    Usado para a aba "Histórico" no perfil da paciente
+    Usado para a aba "Histórico" no perfil da paciente. O ETag vem do
+    contador de alterações do usuário. A posse é conferida no primário
+    (uma paciente recém-criada pode ainda não estar no secundário); o
+    contador e a lista usam a preferência de leitura das listas
     """
     if not ObjectId.is_valid(paciente_id):
         raise HTTPException(status_code=400, detail="ID de paciente inválido")
     
-    # Verificar se paciente existe e pertence ao usuário
-    paciente = await db.pacientes.find_one({
-        "_id": ObjectId(paciente_id),
-        "user_id": str(current_user.id)
-    })
+    # Verificar se paciente existe e pertence ao usuário (cache de posse)
+    paciente = await paciente_do_usuario(db, paciente_id, str(current_user.id))
     if not paciente:
         raise HTTPException(status_code=404, detail="Paciente não encontrada")
     
+    versao, alterado_em = await estado_alteracoes(db_lista, str(current_user.id))
+    etag = weak_etag("al", paciente_id, versao, skip, limit, representation(request))
+    if is_not_modified(request, etag, alterado_em):
+        return not_modified_response(etag, alterado_em)
+    set_validators(response, etag, alterado_em)
+    
     avaliacoes = []
     cursor = (
-        db.avaliacoes
+        db_lista.avaliacoes
         .find({"paciente_id": paciente_id})
         .skip(skip)
         .limit(limit)
@@ -162,36 +226,49 @@ async def listar_avaliacoes_paciente(
     async for avaliacao in cursor:
         avaliacoes.append(avaliacao_helper(avaliacao))
     
-    return avaliacoes
+    return fast_response(request, AVALIACOES_JSON, avaliacoes, response)
 
 @router.get("/avaliacoes/{avaliacao_id}", response_model=AvaliacaoResponse)
 async def obter_avaliacao(
     avaliacao_id: str, 
+    request: Request,
+    response: Response,
     db=Depends(get_database),
     current_user: UserResponse = Depends(get_current_user)
 ):
     """
     Obtém os detalhes de uma avaliação específica
+    
+    Avaliações não são editadas: o ETag usa a versão do documento e o
+    Last-Modified o instante de criação do ObjectId. Com If-None-Match só
+    paciente_id/versao são lidos antes de decidir pelo 304
     """
     if not ObjectId.is_valid(avaliacao_id):
         raise HTTPException(status_code=400, detail="ID inválido")
     
-    avaliacao = await db.avaliacoes.find_one({"_id": ObjectId(avaliacao_id)})
+    condicional = request.headers.get("if-none-match") is not None
+    projecao = {"paciente_id": 1, "versao": 1} if condicional else None
+    avaliacao = await db.avaliacoes.find_one({"_id": ObjectId(avaliacao_id)}, projecao)
     
     if not avaliacao:
         raise HTTPException(status_code=404, detail="Avaliação não encontrada")
     
-    # Verificar se a paciente pertence ao usuário atual
+    # Verificar se a paciente pertence ao usuário atual (cache de posse)
     paciente_id = avaliacao.get("paciente_id")
-    paciente = await db.pacientes.find_one({
-        "_id": ObjectId(paciente_id),
-        "user_id": str(current_user.id)
-    })
+    paciente = await paciente_do_usuario(db, paciente_id, str(current_user.id))
     
     if not paciente:
         raise HTTPException(status_code=403, detail="Acesso negado a esta avaliação")
     
-    return avaliacao_helper(avaliacao)
+    etag = weak_etag("a", avaliacao_id, avaliacao.get("versao", 0), representation(request))
+    criada_em = ObjectId(avaliacao_id).generation_time
+    if is_not_modified(request, etag, criada_em):
+        return not_modified_response(etag, criada_em)
+    if condicional:
+        avaliacao = await db.avaliacoes.find_one({"_id": ObjectId(avaliacao_id)})
+    set_validators(response, etag, criada_em)
+    
+    return fast_response(request, AVALIACAO_JSON, avaliacao_helper(avaliacao), response)
 
 @router.delete("/avaliacoes/{avaliacao_id}", status_code=204)
 async def deletar_avaliacao(
@@ -211,15 +288,18 @@ async def deletar_avaliacao(
 
     # Verificar se a paciente pertence ao usuário atual
     paciente_id = avaliacao.get("paciente_id")
-    paciente = await db.pacientes.find_one({
-        "_id": ObjectId(paciente_id),
-        "user_id": str(current_user.id)
-    })
+    paciente = await paciente_do_usuario(db, paciente_id, str(current_user.id))
     
     if not paciente:
         raise HTTPException(status_code=403, detail="Acesso negado")
 
     await db.avaliacoes.delete_one({"_id": ObjectId(avaliacao_id)})
+    await remover_medida(db, paciente_id, avaliacao_id)
+    await db.pacientes.update_one(
+        {"_id": ObjectId(paciente_id), "total_avaliacoes": {"$gt": 0}},
+        {"$inc": {"total_avaliacoes": -1}}
+    )
+    await registrar_exclusao(db, str(current_user.id), "avaliacoes", [avaliacao_id])
     
     return None
     
\ No newline at end of file
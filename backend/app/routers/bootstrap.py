@@ -0,0 +1,42 @@
+"""
+Rota de carga inicial do Dashboard
+"""
+from fastapi import APIRouter, Depends, Request, Query
+from app.database import get_database
+from app.auth import get_current_user
+from app.models.user import UserResponse
+from app.models.schemas import BootstrapResponse, PacienteResumo
+from app.fast_json import TrustedSerializer, fast_response
+from app.routers.pacientes import paciente_helper
+from app.services.bootstrap_service import carregar_bootstrap
+
+router = APIRouter()
+
+BOOTSTRAP_JSON = TrustedSerializer(BootstrapResponse)
+PACIENTE_RESUMO_JSON = TrustedSerializer(PacienteResumo)
+
+
+def paciente_resumo(doc) -> dict:
+    return PACIENTE_RESUMO_JSON.project(paciente_helper(doc))
+
+
+@router.get("/bootstrap", response_model=BootstrapResponse)
+async def bootstrap(
+    request: Request,
+    limit: int = Query(20, ge=1, le=100),
+    db=Depends(get_database),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Usuário, primeira página de pacientes (com a avaliação mais recente de
+    cada uma) e estatísticas do Dashboard em uma única requisição
+
+    Os dados vêm de uma agregação só e ficam em cache até a próxima escrita
+    do usuário
+    """
+    dados = await carregar_bootstrap(db, str(current_user.id), limit, paciente_resumo)
+    conteudo = {
+        "usuario": current_user.model_dump(mode="json", by_alias=True),
+        **dados,
+    }
+    return fast_response(request, BOOTSTRAP_JSON, conteudo)
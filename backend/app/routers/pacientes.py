@@ -1,27 +1,65 @@
 """
 Rotas para gerenciamento de pacientes
 """
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Request, Query, Response
+from typing import List, Optional
 from bson import ObjectId
 from datetime import datetime
 from pymongo import DESCENDING
-from app.database import get_database
+from pymongo.errors import DuplicateKeyError
+from app.database import PATIENT_VERSION_INDEX, get_database, get_list_database
 from app.models.schemas import (
     PacienteCreate, 
     PacienteUpdate, 
-    PacienteResponse
+    PacienteResponse,
+    ImportacaoResponse,
+    TimelineResponse,
+    BuscaPacientesResponse,
+    SeriePesosResponse
 )
 from app.auth import get_current_user
 from app.models.user import UserResponse
+from app.services.schema_service import atualizar_na_leitura
+from app.fast_json import TrustedSerializer, fast_response, representation
+from app.http_cache import weak_etag, is_not_modified, not_modified_response, set_validators
+from app.services.alteracoes_service import (
+    registrar_alteracao,
+    confirmar_alteracao,
+    estado_alteracoes,
+    carimbar,
+    marca,
+    registrar_exclusao
+)
+from app.services.timeline_service import carregar_timeline
+from app.services.busca_service import buscar_pacientes, normalizar_nome
+from app.services.pesos_service import ler_medidas
+from app.services.exclusao_service import exclusao_cascata
+from app.services.posse_service import invalidar_posse
+from app.services.importacao_service import (
+    CONTENT_TYPES,
+    importar_pacientes as importar_pacientes_stream,
+    preparar_documento_paciente
+)
 
 router = APIRouter()
 
+NOME_DUPLICADO = "Já existe uma paciente com este nome"
+
+PACIENTE_JSON = TrustedSerializer(PacienteResponse)
+PACIENTES_JSON = TrustedSerializer(PacienteResponse, many=True)
+TIMELINE_JSON = TrustedSerializer(TimelineResponse)
+BUSCA_JSON = TrustedSerializer(BuscaPacientesResponse)
+PESOS_JSON = TrustedSerializer(SeriePesosResponse)
+
+def etag_paciente(paciente_id: str, versao: int, request: Request) -> str:
+    """ETag fraco pela versão do documento (0 para documentos anteriores ao contador)"""
+    return weak_etag("p", paciente_id, versao, representation(request))
+
 def paciente_helper(paciente) -> dict:
     """Helper para converter documento MongoDB para dict"""
     if not paciente:
         return None
-    paciente_dict = dict(paciente)
+    paciente_dict = dict(atualizar_na_leitura("pacientes", paciente))
     paciente_dict["id"] = str(paciente_dict["_id"])
     paciente_dict.pop("_id", None)
     return paciente_dict
@@ -37,82 +75,209 @@ async def criar_paciente(
     
     Valida os dados de entrada e salva no banco de dados
     """
-    # Verificar se já existe paciente com mesmo nome (opcional)
-    existing = await db.pacientes.find_one({"nome": paciente.nome})
-    if existing:
-        raise HTTPException(
-            status_code=400,
-            detail="Já existe uma paciente com este nome"
-        )
-    
     # Criar documento
-    paciente_dict = paciente.model_dump()
-    paciente_dict["user_id"] = str(current_user.id)
-    paciente_dict["created_at"] = datetime.utcnow()
-    paciente_dict["updated_at"] = None
-    
-    # Converter data_nascimento para string ISO (MongoDB não serializa datetime.date nativamente)
-    if paciente_dict.get("data_nascimento"):
-        paciente_dict["data_nascimento"] = paciente_dict["data_nascimento"].isoformat()
-    if paciente_dict.get("dum"):
-        paciente_dict["dum"] = paciente_dict["dum"].isoformat()
-    if paciente_dict.get("dpp"):
-        paciente_dict["dpp"] = paciente_dict["dpp"].isoformat()
+    paciente_dict = preparar_documento_paciente(paciente, str(current_user.id))
     
     try:
-        # Inserir no banco
+        # Inserir no banco (nome repetido do mesmo usuário viola o índice único)
+        await carimbar(db, str(current_user.id), [paciente_dict])
         result = await db.pacientes.insert_one(paciente_dict)
+        await confirmar_alteracao(db, str(current_user.id))
         
         # Buscar o documento criado
         new_paciente = await db.pacientes.find_one({"_id": result.inserted_id})
         
         return paciente_helper(new_paciente)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail=NOME_DUPLICADO)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao criar paciente: {str(e)}")
 
+@router.post("/pacientes/import", response_model=ImportacaoResponse)
+async def importar_pacientes(
+    request: Request,
+    dry_run: bool = Query(False, description="Valida o arquivo sem gravar"),
+    db=Depends(get_database),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Importa pacientes em massa a partir de um upload CSV ou NDJSON
+    
+    O corpo é lido como stream (Content-Type text/csv ou application/x-ndjson)
+    e a resposta traz o relatório de erros por linha
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    formato = CONTENT_TYPES.get(content_type)
+    if not formato:
+        raise HTTPException(
+            status_code=415,
+            detail="Formato não suportado. Use text/csv ou application/x-ndjson"
+        )
+    
+    relatorio = await importar_pacientes_stream(
+        request.stream(),
+        formato,
+        db,
+        str(current_user.id),
+        dry_run=dry_run
+    )
+    return relatorio.to_dict()
+
 @router.get("/pacientes", response_model=List[PacienteResponse])
 async def listar_pacientes(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db=Depends(get_database),
+    db=Depends(get_list_database),
     current_user: UserResponse = Depends(get_current_user)
 ):
     """
     Lista todas as pacientes
     
-    Usado para popular a lista no Dashboard
+    Usado para popular a lista no Dashboard. O ETag vem do contador de
+    alterações do usuário, então um 304 custa só a leitura desse contador
     """
+    versao, alterado_em = await estado_alteracoes(db, str(current_user.id))
+    etag = weak_etag("pl", versao, skip, limit, representation(request))
+    if is_not_modified(request, etag, alterado_em):
+        return not_modified_response(etag, alterado_em)
+    set_validators(response, etag, alterado_em)
+    
     pacientes = []
     cursor = db.pacientes.find({"user_id": str(current_user.id)}).skip(skip).limit(limit).sort("created_at", DESCENDING)
     
     async for paciente in cursor:
         pacientes.append(paciente_helper(paciente))
     
-    return pacientes
+    return fast_response(request, PACIENTES_JSON, pacientes, response)
+
+@router.get("/pacientes/search", response_model=BuscaPacientesResponse)
+async def buscar_pacientes_por_nome(
+    request: Request,
+    q: str = Query("", max_length=100, description="Início do nome (sem diferenciar acentos e maiúsculas)"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor da página anterior"),
+    db=Depends(get_list_database),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Busca pacientes pelo início do nome, em ordem alfabética
+
+    Usado pelo filtro do Dashboard. A consulta usa o índice
+    (user_id, nome_normalizado), então não é preciso carregar a lista inteira
+    """
+    try:
+        pacientes, proximo = await buscar_pacientes(db, str(current_user.id), q, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    conteudo = {
+        "itens": [PACIENTE_JSON.project(paciente_helper(p)) for p in pacientes],
+        "next_cursor": proximo,
+    }
+    return fast_response(request, BUSCA_JSON, conteudo)
 
 @router.get("/pacientes/{paciente_id}", response_model=PacienteResponse)
 async def obter_paciente(
     paciente_id: str, 
+    request: Request,
+    response: Response,
     db=Depends(get_database),
     current_user: UserResponse = Depends(get_current_user)
 ):
     """
     Obtém os detalhes de uma paciente específica
     
-    Usado para carregar o perfil da paciente
+    Usado para carregar o perfil da paciente. Com If-None-Match a versão é
+    conferida por uma consulta coberta pelo índice (user_id, _id, versao),
+    forçado com hint, antes de buscar o documento
     """
     if not ObjectId.is_valid(paciente_id):
         raise HTTPException(status_code=400, detail="ID inválido")
     
-    paciente = await db.pacientes.find_one({
-        "_id": ObjectId(paciente_id),
-        "user_id": str(current_user.id)
-    })
+    filtro = {"_id": ObjectId(paciente_id), "user_id": str(current_user.id)}
+    if request.headers.get("if-none-match"):
+        versao = await db.pacientes.find_one(filtro, {"_id": 0, "versao": 1}, hint=PATIENT_VERSION_INDEX)
+        if versao is not None:
+            # Documentos sem o campo aparecem como null no índice
+            etag = etag_paciente(paciente_id, versao.get("versao") or 0, request)
+            if is_not_modified(request, etag):
+                return not_modified_response(etag)
+    
+    paciente = await db.pacientes.find_one(filtro)
     
     if not paciente:
         raise HTTPException(status_code=404, detail="Paciente não encontrada")
     
-    return paciente_helper(paciente)
+    etag = etag_paciente(paciente_id, paciente.get("versao") or 0, request)
+    ultima_alteracao = paciente.get("updated_at") or paciente.get("created_at")
+    if is_not_modified(request, etag, ultima_alteracao):
+        return not_modified_response(etag, ultima_alteracao)
+    set_validators(response, etag, ultima_alteracao)
+    
+    return fast_response(request, PACIENTE_JSON, paciente_helper(paciente), response)
+
+@router.get("/pacientes/{paciente_id}/timeline", response_model=TimelineResponse)
+async def obter_timeline(
+    paciente_id: str,
+    request: Request,
+    db=Depends(get_database),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Paciente, histórico de avaliações e trajetória de ganho de peso
+
+    Usado pelo perfil da paciente no lugar de buscar paciente e avaliações
+    separadamente. A trajetória já traz a faixa FIGO esperada em cada semana
+    """
+    if not ObjectId.is_valid(paciente_id):
+        raise HTTPException(status_code=400, detail="ID inválido")
+
+    dados = await carregar_timeline(
+        db,
+        paciente_id,
+        str(current_user.id),
+        lambda doc: PACIENTE_JSON.project(paciente_helper(doc))
+    )
+    if dados is None:
+        raise HTTPException(status_code=404, detail="Paciente não encontrada")
+    return fast_response(request, TIMELINE_JSON, dados)
+
+@router.get("/pacientes/{paciente_id}/pesos", response_model=SeriePesosResponse)
+async def obter_serie_pesos(
+    paciente_id: str,
+    request: Request,
+    db=Depends(get_database),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Série de pesagens da paciente para o gráfico de ganho de peso
+
+    Lida do documento compacto da coleção pesos, em colunas (uma posição por
+    avaliação, em ordem cronológica)
+    """
+    if not ObjectId.is_valid(paciente_id):
+        raise HTTPException(status_code=400, detail="ID inválido")
+
+    medidas = await ler_medidas(db, str(current_user.id), paciente_id)
+    if medidas is None:
+        # Sem bucket: paciente sem avaliações ou de outro usuário
+        existe = await db.pacientes.find_one(
+            {"_id": ObjectId(paciente_id), "user_id": str(current_user.id)},
+            {"_id": 1}
+        )
+        if not existe:
+            raise HTTPException(status_code=404, detail="Paciente não encontrada")
+        medidas = []
+
+    conteudo = {
+        "paciente_id": paciente_id,
+        "datas": [m["d"] for m in medidas],
+        "semanas": [m["s"] for m in medidas],
+        "pesos": [m["p"] for m in medidas],
+        "ganhos": [m.get("g") for m in medidas],
+    }
+    return fast_response(request, PESOS_JSON, conteudo)
 
 @router.put("/pacientes/{paciente_id}", response_model=PacienteResponse)
 async def atualizar_paciente(
@@ -146,12 +311,20 @@ async def atualizar_paciente(
         update_data["dum"] = update_data["dum"].isoformat()
     if update_data.get("dpp"):
         update_data["dpp"] = update_data["dpp"].isoformat()
+    if update_data.get("nome"):
+        update_data["nome_normalizado"] = normalizar_nome(update_data["nome"])
     
     # Atualizar
-    await db.pacientes.update_one(
-        {"_id": ObjectId(paciente_id), "user_id": str(current_user.id)},
-        {"$set": update_data}
-    )
+    seq = await registrar_alteracao(db, str(current_user.id))
+    try:
+        await db.pacientes.update_one(
+            {"_id": ObjectId(paciente_id), "user_id": str(current_user.id)},
+            {"$set": {**update_data, **marca(seq)}, "$inc": {"versao": 1}}
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail=NOME_DUPLICADO)
+    await confirmar_alteracao(db, str(current_user.id))
+    await invalidar_posse(paciente_id)
     
     # Buscar atualizado
     updated_paciente = await db.pacientes.find_one({"_id": ObjectId(paciente_id)})
@@ -166,6 +339,8 @@ async def deletar_paciente(
 ):
     """
     Deleta uma paciente
+    
+    As avaliações dela são excluídas depois, em background
     """
     if not ObjectId.is_valid(paciente_id):
         raise HTTPException(status_code=400, detail="ID inválido")
@@ -177,6 +352,9 @@ async def deletar_paciente(
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Paciente não encontrada")
+    await invalidar_posse(paciente_id)
+    await exclusao_cascata.agendar(db, paciente_id, str(current_user.id))
+    await registrar_exclusao(db, str(current_user.id), "pacientes", [paciente_id])
     
     return None
 
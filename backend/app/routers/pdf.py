@@ -1,8 +1,11 @@
-from fastapi import APIRouter, HTTPException, Body
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Body, Depends, Header, Query, Response
+from fastapi.responses import JSONResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List, Optional
-from app.services.pdf_service import PDFService
+import re
+from typing import List, Optional, Tuple
+from app.services.pdf_jobs import PDFJobQueue, get_pdf_job_queue, JOB_DONE
 
 router = APIRouter(
     prefix="/pdf",
@@ -60,17 +63,49 @@ class PDFRequest(BaseModel):
         extra = "ignore"
         coerce_numbers_to_str = True
 
+def _pdf_filename(data: PDFRequest) -> str:
+    return f"Relatorio_{data.patient.name.replace(' ', '_')}.pdf"
+
+def _job_status(job: dict) -> dict:
+    status = {
+        "job_id": job["_id"],
+        "status": job["status"],
+        "created_at": job.get("created_at"),
+        "finished_at": job.get("finished_at"),
+        "expires_at": job.get("expires_at"),
+        "size": job.get("size"),
+        "error": job.get("error"),
+    }
+    if job["status"] == JOB_DONE:
+        status["download_url"] = f"/api/pdf/jobs/{job['_id']}/download"
+    return status
+
 @router.post("/generate")
-async def generate_pdf(data: PDFRequest):
+async def generate_pdf(
+    data: PDFRequest,
+    async_mode: bool = Query(False, description="Return a job id instead of rendering inline"),
+    queue: PDFJobQueue = Depends(get_pdf_job_queue)
+):
+    if async_mode:
+        job = await queue.submit(data.model_dump(), _pdf_filename(data))
+        return JSONResponse(
+            status_code=202,
+            content={
+                "job_id": job["_id"],
+                "status": job["status"],
+                "status_url": f"/api/pdf/jobs/{job['_id']}",
+            },
+            headers={"Location": f"/api/pdf/jobs/{job['_id']}"}
+        )
+
     try:
-        service = PDFService()
-        # Convert pydantic models to dict for the service
-        pdf_buffer = service.generate_pdf(data.model_dump())
+        # Render no pool de PDF: o event loop continua atendendo as outras rotas
+        pdf = await queue.render(data.model_dump())
         
-        filename = f"Relatorio_{data.patient.name.replace(' ', '_')}.pdf"
+        filename = _pdf_filename(data)
         
-        return StreamingResponse(
-            pdf_buffer,
+        return Response(
+            content=pdf,
             media_type="application/pdf",
             headers={
                 "Content-Disposition": f"attachment; filename={filename}"
@@ -81,20 +116,105 @@ async def generate_pdf(data: PDFRequest):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/jobs/{job_id}")
+async def get_pdf_job(job_id: str, queue: PDFJobQueue = Depends(get_pdf_job_queue)):
+    job = await queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return _job_status(job)
+
+RANGE_RE = re.compile(r"^bytes=([0-9]*)-([0-9]*)$")
+
+def _parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single 'bytes=start-end' range. Returns None when the header
+    must be ignored (malformed, other units, multiple ranges: RFC 9110
+    allows serving the full body) and raises 416 when it is valid but
+    unsatisfiable.
+    """
+    match = RANGE_RE.match(range_header.strip())
+    if not match:
+        return None
+    start_s, end_s = match.groups()
+    if not start_s:
+        if not end_s:
+            return None
+        # Suffix range: last N bytes
+        length = int(end_s)
+        if length == 0:
+            raise _range_not_satisfiable(size)
+        return max(0, size - length), size - 1
+    start = int(start_s)
+    end = int(end_s) if end_s else size - 1
+    if end_s and end < start:
+        return None
+    if start >= size:
+        raise _range_not_satisfiable(size)
+    return start, min(end, size - 1)
+
+def _range_not_satisfiable(size: int) -> HTTPException:
+    return HTTPException(
+        status_code=416,
+        detail="Range not satisfiable",
+        headers={"Content-Range": f"bytes */{size}"}
+    )
+
+@router.get("/jobs/{job_id}/download")
+async def download_pdf_job(
+    job_id: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    queue: PDFJobQueue = Depends(get_pdf_job_queue)
+):
+    """
+    Download the rendered PDF. The artifact is removed after a full (200)
+    download has been sent. Range requests never remove it: viewers and
+    segmented downloaders fetch the tail first and the rest afterwards,
+    in any order, so a partially downloaded job is left to the TTL.
+    """
+    job = await queue.get(job_id, with_pdf=True)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    if job["status"] != JOB_DONE:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+
+    pdf: bytes = job["pdf"]
+    size = len(pdf)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"attachment; filename={job['filename']}",
+    }
+
+    byte_range = _parse_range(range_header, size) if range_header else None
+    if byte_range is not None:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        return Response(
+            content=pdf[start:end + 1],
+            status_code=206,
+            media_type="application/pdf",
+            headers=headers
+        )
+
+    # Removed only once the whole body has gone out
+    return Response(
+        content=pdf,
+        media_type="application/pdf",
+        headers=headers,
+        background=BackgroundTask(queue.consume, job_id)
+    )
+
 class PDFEmailRequest(PDFRequest):
     email: str
     subject: Optional[str] = "Seu Relatório Nutricional - NutriPré"
     message: Optional[str] = None
 
 @router.post("/send-email")
-async def send_pdf_email(data: PDFEmailRequest):
+async def send_pdf_email(data: PDFEmailRequest, queue: PDFJobQueue = Depends(get_pdf_job_queue)):
     try:
-        service = PDFService()
         # Generate PDF
-        pdf_buffer = service.generate_pdf(data.model_dump(exclude={'email', 'subject', 'message'}))
-        pdf_bytes = pdf_buffer.getvalue()
+        pdf_bytes = await queue.render(data.model_dump(exclude={'email', 'subject', 'message'}))
         
-        filename = f"Relatorio_{data.patient.name.replace(' ', '_')}.pdf"
+        filename = _pdf_filename(data)
         
         # Prepare email content
         from app.email_service import send_email_with_pdf
@@ -111,7 +231,8 @@ async def send_pdf_email(data: PDFEmailRequest):
         </html>
         """
         
-        success = send_email_with_pdf(
+        success = await run_in_threadpool(
+            send_email_with_pdf,
             to_email=data.email,
             subject=data.subject,
             body=message_body,
@@ -0,0 +1,86 @@
+"""
+Rotas de sincronização incremental para clientes offline
+"""
+import json
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Request, Query
+from fastapi.responses import StreamingResponse
+from app.config import settings
+from app.database import get_database
+from app.auth import get_current_user
+from app.models.user import UserResponse
+from app.models.schemas import SyncResponse
+from app.fast_json import TrustedSerializer, fast_response
+from app.routers.pacientes import paciente_helper, PACIENTE_JSON
+from app.routers.avaliacoes import avaliacao_helper, AVALIACAO_JSON
+from app.services.sync_service import (
+    TokenExpirado,
+    alteracoes_desde,
+    gerar_token,
+    ler_token,
+    pagina_desde
+)
+
+router = APIRouter()
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SYNC_JSON = TrustedSerializer(SyncResponse)
+
+
+def _exclusao(doc) -> dict:
+    return {"colecao": doc["colecao"], "id": doc["doc_id"], "seq": doc["seq"]}
+
+
+async def _stream_ndjson(db, user_id: str, desde: int):
+    """Uma linha por alteração e, no fim, a linha com o próximo token"""
+    ultimo_seq = desde
+    async for colecao, doc in alteracoes_desde(db, user_id, desde):
+        ultimo_seq = doc["seq"]
+        if colecao == "pacientes":
+            yield b'{"tipo":"paciente","dado":' + PACIENTE_JSON.dump_json(paciente_helper(doc)) + b"}\n"
+        elif colecao == "avaliacoes":
+            yield b'{"tipo":"avaliacao","dado":' + AVALIACAO_JSON.dump_json(avaliacao_helper(doc)) + b"}\n"
+        else:
+            yield (json.dumps({"tipo": "exclusao", "dado": _exclusao(doc)}) + "\n").encode()
+    yield (json.dumps({"tipo": "fim", "token": gerar_token(ultimo_seq)}) + "\n").encode()
+
+
+@router.get("/sync", response_model=SyncResponse)
+async def sincronizar(
+    request: Request,
+    since: Optional[str] = Query(None, description="Token da última sincronização (vazio = completa)"),
+    limit: int = Query(settings.SYNC_PAGE_SIZE, ge=1, le=settings.SYNC_MAX_PAGE_SIZE),
+    db=Depends(get_database),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Pacientes e avaliações criadas, alteradas ou excluídas desde o token
+
+    A resposta é paginada (has_more + token) ou, com Accept:
+    application/x-ndjson, um stream com todas as alterações de uma vez.
+    Quando uma paciente é excluída o cliente também descarta as avaliações dela
+    """
+    try:
+        desde = ler_token(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Token de sincronização inválido")
+    except TokenExpirado:
+        raise HTTPException(
+            status_code=410,
+            detail="Token expirado. Faça uma sincronização completa (sem since)"
+        )
+
+    user_id = str(current_user.id)
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        return StreamingResponse(_stream_ndjson(db, user_id, desde), media_type=NDJSON_MEDIA_TYPE)
+
+    pagina = await pagina_desde(db, user_id, desde, limit)
+    itens = pagina["itens"]
+    conteudo = {
+        "pacientes": [PACIENTE_JSON.project(paciente_helper(doc)) for doc in itens["pacientes"]],
+        "avaliacoes": [AVALIACAO_JSON.project(avaliacao_helper(doc)) for doc in itens["avaliacoes"]],
+        "exclusoes": [_exclusao(doc) for doc in itens["exclusoes"]],
+        "token": pagina["token"],
+        "has_more": pagina["has_more"],
+    }
+    return fast_response(request, SYNC_JSON, conteudo)
@@ -0,0 +1,94 @@
+"""
+Contador de alterações por usuário
+
+Cada escrita em pacientes/avaliações de um usuário incrementa `seq` no
+documento {_id: user_id} da coleção alteracoes_usuario. O par
+(seq, atualizado_em) identifica o estado das listas do usuário e serve de
+ETag/Last-Modified sem precisar consultar as coleções.
+
+O mesmo documento guarda dois contadores:
+
+- `seq` é reservado antes da escrita (registrar_alteracao/carimbar) e
+  gravado nos próprios documentos (`seq`, `alterado_em`) e nas exclusões
+  (coleção exclusoes), o que permite ao /api/sync devolver só o que mudou
+  depois de um token: cada documento alterado recebe um número único e
+  crescente.
+- `versao` só avança depois que a escrita terminou (confirmar_alteracao),
+  junto com `atualizado_em` e a versão do namespace do usuário em app.cache.
+  É dele que saem o ETag/Last-Modified das listas e a invalidação do cache.
+
+Com o ETag vindo do `seq`, uma leitura entre a reserva e a gravação
+devolveria a lista antiga com o ETag novo, e os If-None-Match seguintes
+receberiam 304 até a próxima escrita. Com `versao` avançando depois da
+gravação, uma leitura concorrente no máximo devolve a lista nova com o ETag
+antigo, o que só custa um download a mais.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from pymongo import ReturnDocument
+from app.cache import cache, user_namespace
+
+COLECAO = "alteracoes_usuario"
+COLECAO_EXCLUSOES = "exclusoes"
+
+
+async def registrar_alteracao(db, user_id: str, quantidade: int = 1) -> int:
+    """Reserva `quantidade` números de sequência e retorna o último"""
+    doc = await db[COLECAO].find_one_and_update(
+        {"_id": user_id},
+        {"$inc": {"seq": quantidade}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return doc["seq"]
+
+
+async def confirmar_alteracao(db, user_id: str) -> None:
+    """Avança a versão das listas e invalida o cache; chamar depois da escrita"""
+    # Documentos anteriores ao campo começam do seq, acima de qualquer ETag
+    # emitido quando o ETag vinha dele
+    await db[COLECAO].update_one(
+        {"_id": user_id},
+        [{"$set": {
+            "versao": {"$add": [{"$ifNull": ["$versao", {"$ifNull": ["$seq", 0]}]}, 1]},
+            "atualizado_em": datetime.utcnow(),
+        }}],
+        upsert=True,
+    )
+    await cache.bump_version(user_namespace(user_id))
+
+
+async def estado_alteracoes(db, user_id: str) -> Tuple[int, Optional[datetime]]:
+    """(versao, atualizado_em) atuais; (0, None) para quem nunca escreveu"""
+    doc = await db[COLECAO].find_one({"_id": user_id})
+    if not doc:
+        return 0, None
+    return doc.get("versao", doc.get("seq", 0)), doc.get("atualizado_em")
+
+
+def marca(seq: int) -> Dict[str, Any]:
+    """Campos de sincronização para um $set"""
+    return {"seq": seq, "alterado_em": datetime.utcnow()}
+
+
+async def carimbar(db, user_id: str, documentos: List[Dict[str, Any]]) -> None:
+    """Atribui números de sequência consecutivos aos documentos antes da inserção"""
+    if not documentos:
+        return
+    ultimo = await registrar_alteracao(db, user_id, len(documentos))
+    agora = datetime.utcnow()
+    for seq, doc in enumerate(documentos, start=ultimo - len(documentos) + 1):
+        doc["seq"] = seq
+        doc["alterado_em"] = agora
+
+
+async def registrar_exclusao(db, user_id: str, colecao: str, doc_ids: List[str]) -> None:
+    """Grava as lápides (tombstones) lidas pelo /api/sync e confirma a exclusão"""
+    if not doc_ids:
+        return
+    lapides = [{"user_id": user_id, "colecao": colecao, "doc_id": doc_id} for doc_id in doc_ids]
+    await carimbar(db, user_id, lapides)
+    try:
+        await db[COLECAO_EXCLUSOES].insert_many(lapides, ordered=False)
+    finally:
+        await confirmar_alteracao(db, user_id)
@@ -0,0 +1,185 @@
+"""
+Serviço de ingestão de avaliações em lote
+
+Usado na migração de históricos (papel ou outros sistemas): as pacientes são
+buscadas com uma única consulta $in, os cálculos são feitos para o lote
+inteiro de uma vez e os relatórios passam pelo cache compartilhado.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from bson import ObjectId
+from pydantic import ValidationError
+from pymongo import UpdateOne
+
+from app.models.schemas import AvaliacaoLoteItem, RespostasChecklist
+from app.services.calculos_service import calcular_lote
+from app.services.relatorio_service import cache_relatorios
+from app.services.schema_service import versao_atual
+from app.services.pesos_service import registrar_medidas
+from app.services.posse_service import invalidar_posse
+from app.services.exclusao_service import descartar_orfas
+from app.services.alteracoes_service import carimbar, confirmar_alteracao, marca, registrar_alteracao
+
+TAMANHO_INSERCAO = 1000
+
+
+async def buscar_pacientes(db, itens: List[AvaliacaoLoteItem], user_id: str) -> Dict[str, Dict[str, Any]]:
+    """Busca todas as pacientes referenciadas no lote com uma consulta $in"""
+    ids = {item.paciente_id for item in itens if ObjectId.is_valid(item.paciente_id)}
+    if not ids:
+        return {}
+    cursor = db.pacientes.find(
+        {"_id": {"$in": [ObjectId(i) for i in ids]}, "user_id": user_id},
+        {"peso_pre_gestacional": 1, "altura": 1}
+    )
+    return {str(p["_id"]): p async for p in cursor}
+
+
+def preparar_lote(
+    itens: List[AvaliacaoLoteItem],
+    pacientes: Dict[str, Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], Dict[str, float]]:
+    """
+    Valida o lote e monta os documentos de avaliação.
+
+    Retorna (documentos, erros, pesos pré-gestacionais a gravar nas
+    pacientes que ainda não tinham o dado).
+    """
+    erros: List[Dict[str, Any]] = []
+    validos: List[Tuple[AvaliacaoLoteItem, float, float, Dict[str, Any]]] = []
+    pesos_pre_novos: Dict[str, float] = {}
+
+    for indice, item in enumerate(itens):
+        def erro(mensagem: str):
+            erros.append({"indice": indice, "paciente_id": item.paciente_id, "erro": mensagem})
+
+        paciente = pacientes.get(item.paciente_id)
+        if not paciente:
+            erro("Paciente não encontrada")
+            continue
+        if not 1 <= item.semana_gestacional <= 42:
+            erro("Semana gestacional deve estar entre 1 e 42")
+            continue
+        if not 30 < item.peso_atual <= 200:
+            erro("Peso atual deve estar entre 30 e 200 kg")
+            continue
+
+        peso_pre = paciente.get("peso_pre_gestacional") or pesos_pre_novos.get(item.paciente_id)
+        if not peso_pre:
+            if not item.peso_pre_gestacional:
+                erro("Peso pré-gestacional não cadastrado")
+                continue
+            peso_pre = item.peso_pre_gestacional
+            pesos_pre_novos[item.paciente_id] = peso_pre
+
+        altura = paciente.get("altura")
+        if not altura:
+            erro("Altura não cadastrada para esta paciente")
+            continue
+
+        try:
+            respostas = RespostasChecklist(**item.respostas).model_dump()
+        except ValidationError as e:
+            erro(f"Respostas inválidas: {e.errors()[0]['msg']}")
+            continue
+
+        validos.append((item, peso_pre, altura, respostas))
+
+    calculos = calcular_lote(
+        [peso_pre for _, peso_pre, _, _ in validos],
+        [altura for _, _, altura, _ in validos],
+        [item.peso_atual for item, _, _, _ in validos],
+        [item.semana_gestacional for item, _, _, _ in validos],
+    )
+
+    agora = datetime.utcnow()
+    versao = versao_atual("avaliacoes")
+    documentos = []
+    for (item, peso_pre, _, respostas), calc in zip(validos, calculos):
+        documentos.append({
+            "paciente_id": item.paciente_id,
+            "semana_gestacional": item.semana_gestacional,
+            "peso_atual": item.peso_atual,
+            "peso_pre_gestacional": peso_pre,
+            "respostas_checklist": respostas,
+            "observacoes": item.observacoes,
+            "data_avaliacao": item.data_avaliacao or agora,
+            "calculos": calc,
+            "relatorio": cache_relatorios.obter(
+                item.respostas, calc["imc_classification"], item.semana_gestacional
+            ),
+            "schema_version": versao,
+            "versao": 1,
+        })
+
+    return documentos, erros, pesos_pre_novos
+
+
+async def gravar_lote(
+    db,
+    documentos: List[Dict[str, Any]],
+    pesos_pre_novos: Dict[str, float],
+    user_id: str
+) -> int:
+    """Grava as avaliações e atualiza os contadores das pacientes
+
+    A versão das listas do usuário é confirmada no fim, mesmo se o lote
+    falhar no meio (o que já foi gravado precisa aparecer)
+    """
+    for doc in documentos:
+        doc["user_id"] = user_id
+    await carimbar(db, user_id, documentos)
+    try:
+        inseridas = 0
+        for inicio in range(0, len(documentos), TAMANHO_INSERCAO):
+            bloco = documentos[inicio:inicio + TAMANHO_INSERCAO]
+            result = await db.avaliacoes.insert_many(bloco, ordered=False)
+            inseridas += len(result.inserted_ids)
+        await registrar_medidas(db, user_id, documentos)
+
+        por_paciente: Dict[str, Dict[str, Any]] = {}
+        for doc in documentos:
+            resumo = por_paciente.setdefault(doc["paciente_id"], {"total": 0, "ultima": doc["data_avaliacao"]})
+            resumo["total"] += 1
+            resumo["ultima"] = max(resumo["ultima"], doc["data_avaliacao"])
+
+        # Pacientes que ganharam peso pré-gestacional mudam de representação
+        seq = 0
+        if pesos_pre_novos:
+            seq = await registrar_alteracao(db, user_id, len(pesos_pre_novos)) - len(pesos_pre_novos)
+        operacoes = []
+        for paciente_id, resumo in por_paciente.items():
+            update: Dict[str, Any] = {
+                "$inc": {"total_avaliacoes": resumo["total"]},
+                "$max": {"ultima_avaliacao_em": resumo["ultima"]},
+            }
+            if paciente_id in pesos_pre_novos:
+                seq += 1
+                update["$set"] = {
+                    "peso_pre_gestacional": pesos_pre_novos[paciente_id],
+                    "updated_at": datetime.utcnow(),
+                    **marca(seq),
+                }
+                update["$inc"]["versao"] = 1
+            operacoes.append(UpdateOne({"_id": ObjectId(paciente_id)}, update))
+
+        if operacoes:
+            await db.pacientes.bulk_write(operacoes, ordered=False)
+        for paciente_id in pesos_pre_novos:
+            await invalidar_posse(paciente_id)
+
+        # Pacientes excluídas durante a gravação perdem as avaliações do lote
+        excluidas = await descartar_orfas(db, user_id, por_paciente)
+        inseridas -= sum(por_paciente[paciente_id]["total"] for paciente_id in excluidas)
+    finally:
+        await confirmar_alteracao(db, user_id)
+
+    return inseridas
+
+
+async def criar_avaliacoes_em_lote(db, itens: List[AvaliacaoLoteItem], user_id: str) -> Dict[str, Any]:
+    pacientes = await buscar_pacientes(db, itens, user_id)
+    documentos, erros, pesos_pre_novos = preparar_lote(itens, pacientes)
+    inseridas = await gravar_lote(db, documentos, pesos_pre_novos, user_id) if documentos else 0
+    return {"total": len(itens), "inseridas": inseridas, "erros": erros}
@@ -0,0 +1,101 @@
+"""
+Serviço do bootstrap do Dashboard
+
+Uma única agregação em pacientes: $lookup da avaliação mais recente de cada
+paciente e um $facet com a primeira página, o total e as estatísticas dos
+cards (por trimestre, por classificação de IMC e pacientes com alertas
+críticos). O resultado fica no cache por usuário, no namespace que
+alteracoes_service invalida a cada escrita.
+"""
+from typing import Any, Dict, List
+
+from app.cache import cache, user_namespace, versioned_key
+from app.config import settings
+
+SEM_AVALIACAO = "Sem avaliação"
+LIMITE_ALERTAS = 20
+
+
+def pipeline_bootstrap(user_id: str, limite: int) -> List[Dict[str, Any]]:
+    return [
+        {"$match": {"user_id": user_id}},
+        {"$lookup": {
+            "from": "avaliacoes",
+            "let": {"pid": {"$toString": "$_id"}},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$paciente_id", "$$pid"]}}},
+                {"$sort": {"data_avaliacao": -1}},
+                {"$limit": 1},
+                {"$project": {
+                    "_id": 0,
+                    "id": {"$toString": "$_id"},
+                    "data_avaliacao": 1,
+                    "semana_gestacional": 1,
+                    "peso_atual": 1,
+                    # Mesmos valores padrão do upgrade de schema para documentos antigos
+                    "trimestre": {"$ifNull": ["$calculos.trimestre", "Não informado"]},
+                    "imc_classification": {"$ifNull": ["$calculos.imc_classification", "Não calculado"]},
+                    "alertas_criticos": {"$size": {"$ifNull": ["$relatorio.alertas_criticos", []]}},
+                }},
+            ],
+            "as": "ultima",
+        }},
+        {"$set": {"ultima_avaliacao": {"$arrayElemAt": ["$ultima", 0]}}},
+        {"$unset": "ultima"},
+        {"$facet": {
+            "pacientes": [{"$sort": {"created_at": -1}}, {"$limit": limite}],
+            "total": [{"$count": "n"}],
+            "por_trimestre": [
+                {"$group": {"_id": {"$ifNull": ["$ultima_avaliacao.trimestre", SEM_AVALIACAO]}, "n": {"$sum": 1}}}
+            ],
+            "por_imc": [
+                {"$group": {"_id": {"$ifNull": ["$ultima_avaliacao.imc_classification", SEM_AVALIACAO]}, "n": {"$sum": 1}}}
+            ],
+            "com_alertas_total": [
+                {"$match": {"ultima_avaliacao.alertas_criticos": {"$gt": 0}}},
+                {"$count": "n"},
+            ],
+            "com_alertas": [
+                {"$match": {"ultima_avaliacao.alertas_criticos": {"$gt": 0}}},
+                {"$sort": {"ultima_avaliacao.data_avaliacao": -1}},
+                {"$limit": LIMITE_ALERTAS},
+                {"$project": {
+                    "_id": 0,
+                    "id": {"$toString": "$_id"},
+                    "nome": 1,
+                    "alertas_criticos": "$ultima_avaliacao.alertas_criticos",
+                }},
+            ],
+        }},
+    ]
+
+
+def _contagem(facet: List[Dict[str, Any]]) -> int:
+    return facet[0]["n"] if facet else 0
+
+
+async def carregar_bootstrap(db, user_id: str, limite: int, converter_paciente) -> Dict[str, Any]:
+    """
+    Página inicial + estatísticas do usuário, do cache quando possível
+
+    `converter_paciente` transforma o documento bruto no formato da resposta
+    """
+    chave = await versioned_key(user_namespace(user_id), f"bootstrap:{limite}")
+    dados = await cache.get(chave)
+    if dados is not None:
+        return dados
+
+    resultado = await db.pacientes.aggregate(pipeline_bootstrap(user_id, limite)).to_list(1)
+    facet = resultado[0] if resultado else {}
+    dados = {
+        "pacientes": [converter_paciente(doc) for doc in facet.get("pacientes", [])],
+        "total_pacientes": _contagem(facet.get("total", [])),
+        "estatisticas": {
+            "por_trimestre": {item["_id"]: item["n"] for item in facet.get("por_trimestre", [])},
+            "por_imc": {item["_id"]: item["n"] for item in facet.get("por_imc", [])},
+            "com_alertas_criticos": _contagem(facet.get("com_alertas_total", [])),
+            "pacientes_com_alertas": facet.get("com_alertas", []),
+        },
+    }
+    await cache.set(chave, dados, ttl=settings.BOOTSTRAP_CACHE_TTL_SECONDS)
+    return dados
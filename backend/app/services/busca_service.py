@@ -0,0 +1,63 @@
+"""
+Busca de pacientes por nome
+
+Cada paciente guarda `nome_normalizado` (sem acentos, minúsculo, espaços
+simples). O índice único (user_id, nome_normalizado) impede nomes repetidos
+para o mesmo usuário e atende a busca por prefixo (regex ancorada), paginada
+por cursor no próprio nome normalizado.
+"""
+import base64
+import binascii
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def normalizar_nome(nome: str) -> str:
+    """'  Maria  José ' e 'MARIA JOSE' viram 'maria jose'"""
+    decomposto = unicodedata.normalize("NFKD", nome or "")
+    sem_acentos = "".join(c for c in decomposto if not unicodedata.combining(c))
+    return " ".join(sem_acentos.casefold().split())
+
+
+def gerar_cursor(nome_normalizado: str) -> str:
+    return base64.urlsafe_b64encode(nome_normalizado.encode()).decode()
+
+
+def ler_cursor(cursor: Optional[str]) -> Optional[str]:
+    """Nome normalizado do último item entregue; ValueError se inválido"""
+    if not cursor:
+        return None
+    try:
+        return base64.urlsafe_b64decode(cursor.encode()).decode()
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError("cursor inválido") from e
+
+
+def filtro_busca(user_id: str, termo: str, apos: Optional[str] = None) -> Dict[str, Any]:
+    # $exists acompanha o partialFilterExpression do índice para que ele seja usado
+    condicao: Dict[str, Any] = {"$exists": True}
+    prefixo = normalizar_nome(termo)
+    if prefixo:
+        condicao["$regex"] = "^" + re.escape(prefixo)
+    if apos is not None:
+        condicao["$gt"] = apos
+    return {"user_id": user_id, "nome_normalizado": condicao}
+
+
+async def buscar_pacientes(
+    db,
+    user_id: str,
+    termo: str,
+    limite: int,
+    cursor: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Pacientes cujo nome começa com `termo`, em ordem alfabética, e o próximo cursor"""
+    apos = ler_cursor(cursor)
+    resultado = db.pacientes.find(filtro_busca(user_id, termo, apos)).sort("nome_normalizado", 1).limit(limite + 1)
+    pacientes = await resultado.to_list(limite + 1)
+    proximo = None
+    if len(pacientes) > limite:
+        pacientes = pacientes[:limite]
+        proximo = gerar_cursor(pacientes[-1]["nome_normalizado"])
+    return pacientes, proximo
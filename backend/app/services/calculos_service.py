@@ -2,7 +2,9 @@
 Serviço de cálculos antropométricos e recomendações
 ATUALIZADO: Lógica FIGO/Kac et al./MS 2022 com textos dinâmicos do PDF
 """
-from typing import Optional, Tuple, Dict, Any
+from collections import OrderedDict
+from typing import Optional, Tuple, Dict, Any, List, Sequence
+from app.tracing import traced
 
 def arredondar_semana_figo(semanas: int, dias: int) -> int:
     """
@@ -85,6 +87,35 @@ LIMITES_CATEGORIA = {
     }
 }
 
+# Ganho esperado (kg) nos marcos de cada trimestre; entre marcos a faixa é
+# interpolada linearmente (mesmos valores do gráfico do frontend)
+MARCOS_FAIXA_GANHO = {
+    "Baixo peso": {0: (0.0, 0.0), 13: (0.2, 1.2), 27: (5.6, 7.2), 40: (9.7, 12.2)},
+    "Eutrofia": {0: (0.0, 0.0), 13: (-1.8, 0.7), 27: (3.1, 6.3), 40: (8.0, 12.0)},
+    "Sobrepeso": {0: (0.0, 0.0), 13: (-1.6, 0.0), 27: (2.3, 3.7), 40: (7.0, 9.0)},
+    "Obesidade": {0: (0.0, 0.0), 13: (-1.6, 0.0), 27: (1.1, 2.7), 40: (5.0, 7.2)},
+}
+
+def calcular_faixa_ganho_esperado(classificacao: str, semana_gestacional: int) -> Tuple[float, float]:
+    """Faixa (mínimo, máximo) de ganho esperado até a semana, em kg"""
+    marcos = MARCOS_FAIXA_GANHO.get(classificacao)
+    if not marcos or semana_gestacional < 1:
+        return 0.0, 0.0
+    if semana_gestacional > 40:
+        return marcos[40]
+    if semana_gestacional <= 13:
+        inicio, fim = 0, 13
+    elif semana_gestacional <= 27:
+        inicio, fim = 13, 27
+    else:
+        inicio, fim = 27, 40
+    razao = (semana_gestacional - inicio) / (fim - inicio)
+    (min_ini, max_ini), (min_fim, max_fim) = marcos[inicio], marcos[fim]
+    return (
+        round(min_ini + (min_fim - min_ini) * razao, 1),
+        round(max_ini + (max_fim - max_ini) * razao, 1),
+    )
+
 MENSAGENS_FIGO = {
     "Baixo peso": {
         "trim1": {
@@ -183,6 +214,7 @@ def fmt_num(num: float) -> str:
     """Formata número para string com vírgula"""
     return str(num).replace('.', ',')
 
+@traced("rules.ganho_peso")
 def obter_recomendacao_ganho_peso(imc_pre: float, semana_gestacional: int, ganho: float) -> str:
     classificacao = classificar_imc(imc_pre)
     trimestre = determinar_trimestre_numero(semana_gestacional)
@@ -260,3 +292,88 @@ def obter_recomendacao_ganho_peso(imc_pre: float, semana_gestacional: int, ganho
         total_max=fmt_num(limites["totalMax"]),
         taxa_semanal=limites["weeklyRateGrams"]
     )
+
+
+# === CÁLCULO EM LOTE ===
+
+class CacheRecomendacoes:
+    """
+    LRU das recomendações FIGO por (imc, semana, ganho). Entradas chegam
+    arredondadas (IMC e ganho com 1 casa, semana inteira), então a mesma
+    combinação se repete muito em lotes grandes. Exportável para o snapshot
+    de caches (app.snapshot).
+    """
+
+    def __init__(self, maxsize: int = 8192):
+        self.maxsize = maxsize
+        self._dados: "OrderedDict[Tuple[float, int, float], str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, imc_pre: float, semana_gestacional: int, ganho: float) -> str:
+        chave = (imc_pre, semana_gestacional, ganho)
+        texto = self._dados.get(chave)
+        if texto is not None:
+            self.hits += 1
+            self._dados.move_to_end(chave)
+            return texto
+        self.misses += 1
+        texto = obter_recomendacao_ganho_peso(imc_pre, semana_gestacional, ganho)
+        self._guardar(chave, texto)
+        return texto
+
+    def _guardar(self, chave: Tuple[float, int, float], texto: str) -> None:
+        self._dados[chave] = texto
+        self._dados.move_to_end(chave)
+        if len(self._dados) > self.maxsize:
+            self._dados.popitem(last=False)
+
+    def exportar(self) -> List[list]:
+        """Entradas da menos para a mais usada"""
+        return [[*chave, texto] for chave, texto in self._dados.items()]
+
+    def importar(self, itens: List[list]) -> int:
+        for imc_pre, semana, ganho, texto in itens:
+            self._guardar((imc_pre, semana, ganho), texto)
+        return len(itens)
+
+    def __len__(self) -> int:
+        return len(self._dados)
+
+
+obter_recomendacao_ganho_peso_cache = CacheRecomendacoes()
+
+def calcular_lote(
+    pesos_pre: Sequence[float],
+    alturas: Sequence[float],
+    pesos_atuais: Sequence[float],
+    semanas: Sequence[int]
+) -> List[Dict[str, Any]]:
+    """
+    Calcula IMC, classificação, ganho, trimestre e recomendação para um lote
+    inteiro, coluna a coluna. Equivalente a chamar as funções individuais
+    para cada avaliação.
+    """
+    if any(altura <= 0 for altura in alturas):
+        raise ValueError("Altura deve ser maior que zero")
+    imcs = [round(peso / (altura * altura), 1) for peso, altura in zip(pesos_pre, alturas)]
+    classificacoes = [classificar_imc(imc) for imc in imcs]
+    ganhos = [round(atual - pre, 1) for atual, pre in zip(pesos_atuais, pesos_pre)]
+    trimestres = [determinar_trimestre(semana) for semana in semanas]
+    recomendacoes = [
+        obter_recomendacao_ganho_peso_cache(imc, semana, ganho)
+        for imc, semana, ganho in zip(imcs, semanas, ganhos)
+    ]
+    return [
+        {
+            "imc_pre_gestacional": imc,
+            "imc_classification": classificacao,
+            "peso_atual": peso_atual,
+            "ganho_peso_atual": ganho,
+            "trimestre": trimestre,
+            "weight_gain_recommendation": recomendacao,
+        }
+        for imc, classificacao, peso_atual, ganho, trimestre, recomendacao in zip(
+            imcs, classificacoes, pesos_atuais, ganhos, trimestres, recomendacoes
+        )
+    ]
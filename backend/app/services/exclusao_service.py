@@ -0,0 +1,157 @@
+"""
+Exclusão em cascata das avaliações de pacientes removidas
+
+Ao excluir uma paciente a rota remove o documento dela, registra a paciente
+em exclusoes_em_andamento e responde na hora. Esta tarefa em background
+apaga as avaliações (e os buckets de pesos) em lotes, gravando as lápides
+lidas pelo /api/sync, com uma pausa entre lotes para não competir com o tráfego da API,
+e por fim remove o registro. Registros que sobraram de uma execução
+interrompida são retomados no próximo startup.
+
+scripts/limpar_orfas.py usa excluir_avaliacoes para limpar órfãs antigas.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+from bson import ObjectId
+
+from app.config import settings
+from app.services.alteracoes_service import registrar_exclusao
+from app.services.posse_service import invalidar_posse
+from app.services.pesos_service import remover_paciente as remover_pesos
+
+logger = logging.getLogger(__name__)
+
+COLECAO_PENDENTES = "exclusoes_em_andamento"
+
+
+async def excluir_avaliacoes(db, paciente_id: str, tamanho_lote: int, pausa: float,
+                             user_id: Optional[str] = None) -> int:
+    """
+    Apaga as avaliações da paciente em lotes; retorna o total
+
+    Cada lote é um intervalo de _id: os ids seguintes ao último lote, até o
+    maior _id lido, apagados com delete_many sobre o mesmo intervalo. As
+    lápides do lote são gravadas antes da exclusão (dono de cada avaliação,
+    ou `user_id` para documentos antigos sem o campo), para que os clientes
+    do /api/sync também removam as avaliações. Se a tarefa cair no meio, a
+    retomada regrava as lápides do lote, o que é inofensivo.
+    """
+    total = 0
+    ultimo = None
+    while True:
+        filtro = {"paciente_id": paciente_id}
+        if ultimo is not None:
+            filtro["_id"] = {"$gt": ultimo}
+        lote = await db.avaliacoes.find(
+            filtro, {"_id": 1, "user_id": 1}
+        ).sort("_id", 1).limit(tamanho_lote).to_list(tamanho_lote)
+        if not lote:
+            return total
+        por_usuario: Dict[str, List[str]] = defaultdict(list)
+        for doc in lote:
+            dono = doc.get("user_id") or user_id
+            if dono:
+                por_usuario[dono].append(str(doc["_id"]))
+        for dono, ids in por_usuario.items():
+            await registrar_exclusao(db, dono, "avaliacoes", ids)
+        intervalo = {"$lte": lote[-1]["_id"]}
+        if ultimo is not None:
+            intervalo["$gt"] = ultimo
+        result = await db.avaliacoes.delete_many({"paciente_id": paciente_id, "_id": intervalo})
+        total += result.deleted_count
+        ultimo = lote[-1]["_id"]
+        if len(lote) < tamanho_lote:
+            return total
+        await asyncio.sleep(pausa)
+
+
+async def descartar_orfas(db, user_id: str, paciente_ids: Iterable[str]) -> Set[str]:
+    """
+    Chamar depois de gravar avaliações: apaga as que foram gravadas para
+    pacientes excluídas nesse meio tempo e retorna os ids dessas pacientes
+
+    A posse vem de um cache que uma leitura concorrente à exclusão pode ter
+    repovoado, e a cascata pode já ter terminado. Conferindo no banco depois
+    da gravação não sobra órfã: se a paciente ainda existe aqui, a exclusão
+    (e a cascata, que vem depois dela) é posterior às nossas avaliações.
+    """
+    ids = {paciente_id for paciente_id in paciente_ids if ObjectId.is_valid(paciente_id)}
+    if not ids:
+        return set()
+    existentes = await db.pacientes.find(
+        {"_id": {"$in": [ObjectId(paciente_id) for paciente_id in ids]}}, {"_id": 1}
+    ).to_list(len(ids))
+    excluidas = ids - {str(doc["_id"]) for doc in existentes}
+    for paciente_id in excluidas:
+        await excluir_avaliacoes(db, paciente_id, settings.CASCADE_DELETE_BATCH_SIZE, 0, user_id)
+        await remover_pesos(db, paciente_id)
+        await invalidar_posse(paciente_id)
+    return excluidas
+
+
+class ExclusaoCascata:
+    """Consome exclusoes_em_andamento, uma paciente por vez"""
+
+    def __init__(self, tamanho_lote: int = 500, pausa: float = 0.05, intervalo: float = 30.0):
+        self.tamanho_lote = tamanho_lote
+        self.pausa = pausa
+        self.intervalo = intervalo
+        self.database = None
+        self._evento: Optional[asyncio.Event] = None
+        self._tarefa: Optional[asyncio.Task] = None
+        self.avaliacoes_excluidas = 0
+
+    def start(self, database) -> None:
+        self.database = database
+        self._evento = asyncio.Event()
+        self._tarefa = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._tarefa:
+            self._tarefa.cancel()
+            self._tarefa = None
+
+    async def agendar(self, db, paciente_id: str, user_id: str) -> None:
+        """Registra a paciente (durável) e acorda a tarefa"""
+        await db[COLECAO_PENDENTES].update_one(
+            {"_id": paciente_id},
+            {"$setOnInsert": {"user_id": user_id, "criado_em": datetime.utcnow()}},
+            upsert=True,
+        )
+        if self._evento is not None:
+            self._evento.set()
+
+    async def processar_pendentes(self) -> None:
+        async for pendente in self.database[COLECAO_PENDENTES].find({}).sort("criado_em", 1):
+            paciente_id = pendente["_id"]
+            excluidas = await excluir_avaliacoes(
+                self.database, paciente_id, self.tamanho_lote, self.pausa, pendente.get("user_id")
+            )
+            await remover_pesos(self.database, paciente_id)
+            await self.database[COLECAO_PENDENTES].delete_one({"_id": paciente_id})
+            self.avaliacoes_excluidas += excluidas
+            logger.info("Paciente %s: %d avaliações excluídas em cascata", paciente_id, excluidas)
+
+    async def _loop(self) -> None:
+        while True:
+            self._evento.clear()
+            try:
+                await self.processar_pendentes()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Falha na exclusão em cascata; nova tentativa em %ss", self.intervalo)
+            try:
+                await asyncio.wait_for(self._evento.wait(), timeout=self.intervalo)
+            except asyncio.TimeoutError:
+                pass
+
+
+exclusao_cascata = ExclusaoCascata(
+    tamanho_lote=settings.CASCADE_DELETE_BATCH_SIZE,
+    pausa=settings.CASCADE_DELETE_PAUSE_MS / 1000,
+)
@@ -0,0 +1,271 @@
+"""
+Serviço de importação em massa de pacientes (CSV ou NDJSON)
+
+O upload é lido como stream: as linhas são validadas incrementalmente contra
+PacienteCreate e gravadas em lotes, de modo que a memória usada não depende
+do tamanho do arquivo.
+"""
+import codecs
+import csv
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from app.services.busca_service import normalizar_nome
+
+from app.models.schemas import PacienteCreate
+from app.services.schema_service import versao_atual
+from app.services.alteracoes_service import carimbar, confirmar_alteracao
+
+TAMANHO_LOTE = 1000
+DUPLICATE_KEY = 11000
+MAX_ERROS_DETALHADOS = 1000
+
+FORMATO_CSV = "csv"
+FORMATO_NDJSON = "ndjson"
+
+CONTENT_TYPES = {
+    "text/csv": FORMATO_CSV,
+    "application/csv": FORMATO_CSV,
+    "application/x-ndjson": FORMATO_NDJSON,
+    "application/ndjson": FORMATO_NDJSON,
+    "application/jsonl": FORMATO_NDJSON,
+}
+
+
+def preparar_documento_paciente(paciente: PacienteCreate, user_id: str) -> Dict[str, Any]:
+    """Monta o documento MongoDB de uma paciente validada"""
+    paciente_dict = paciente.model_dump()
+    paciente_dict["user_id"] = user_id
+    paciente_dict["nome_normalizado"] = normalizar_nome(paciente.nome)
+    paciente_dict["created_at"] = datetime.utcnow()
+    paciente_dict["updated_at"] = None
+    paciente_dict["schema_version"] = versao_atual("pacientes")
+    paciente_dict["versao"] = 1
+
+    # MongoDB não serializa datetime.date nativamente
+    for campo in ("data_nascimento", "dum", "dpp"):
+        if paciente_dict.get(campo):
+            paciente_dict[campo] = paciente_dict[campo].isoformat()
+    return paciente_dict
+
+
+class RelatorioImportacao:
+    """Acumula o resultado da importação (erros detalhados são limitados)"""
+
+    def __init__(self):
+        self.total = 0
+        self.inseridos = 0
+        self.duplicados = 0
+        self.invalidos = 0
+        self.erros: List[Dict[str, Any]] = []
+        self.erros_truncados = False
+
+    def erro(self, linha: int, mensagem: str, nome: Optional[str] = None):
+        if len(self.erros) >= MAX_ERROS_DETALHADOS:
+            self.erros_truncados = True
+            return
+        self.erros.append({"linha": linha, "nome": nome, "erro": mensagem})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "inseridos": self.inseridos,
+            "duplicados": self.duplicados,
+            "invalidos": self.invalidos,
+            "erros": self.erros,
+            "erros_truncados": self.erros_truncados,
+        }
+
+
+async def _linhas(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decodifica o stream em linhas de texto sem carregar o arquivo inteiro"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pendente = ""
+    async for chunk in stream:
+        pendente += decoder.decode(chunk)
+        if "\n" not in pendente:
+            continue
+        *linhas, pendente = pendente.split("\n")
+        for linha in linhas:
+            yield linha.rstrip("\r")
+    pendente += decoder.decode(b"", final=True)
+    if pendente.strip():
+        yield pendente.rstrip("\r")
+
+
+async def _registros_csv(linhas: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Any]]:
+    cabecalho: Optional[List[str]] = None
+    buffer = ""
+    numero = 0
+    async for linha in linhas:
+        # Campos entre aspas podem conter quebras de linha
+        buffer = f"{buffer}\n{linha}" if buffer else linha
+        if buffer.count('"') % 2:
+            continue
+        registro, buffer = buffer, ""
+        if not registro.strip():
+            continue
+        valores = next(csv.reader([registro]))
+        if cabecalho is None:
+            cabecalho = [c.strip() for c in valores]
+            continue
+        numero += 1
+        if len(valores) != len(cabecalho):
+            yield numero, ValueError(
+                f"Esperadas {len(cabecalho)} colunas, encontradas {len(valores)}"
+            )
+            continue
+        # Células vazias equivalem a campos não informados
+        yield numero, {
+            campo: valor.strip()
+            for campo, valor in zip(cabecalho, valores)
+            if valor.strip() != ""
+        }
+    if buffer:
+        yield numero + 1, ValueError("Aspas não fechadas no final do arquivo")
+
+
+async def _registros_ndjson(linhas: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Any]]:
+    numero = 0
+    async for linha in linhas:
+        if not linha.strip():
+            continue
+        numero += 1
+        try:
+            registro = json.loads(linha)
+        except json.JSONDecodeError as e:
+            yield numero, ValueError(f"JSON inválido: {e.msg}")
+            continue
+        if not isinstance(registro, dict):
+            yield numero, ValueError("Cada linha deve ser um objeto JSON")
+            continue
+        yield numero, registro
+
+
+def _formatar_erro_validacao(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+    )
+
+
+async def _gravar_lote(
+    db,
+    lote: List[Tuple[int, Dict[str, Any]]],
+    user_id: str,
+    relatorio: RelatorioImportacao,
+    dry_run: bool
+) -> None:
+    # Uma única consulta $in por lote (coberta pelo índice único de nomes)
+    # para detectar nomes já cadastrados
+    existentes = set()
+    if db is not None:
+        cursor = db.pacientes.find(
+            {
+                "user_id": user_id,
+                "nome_normalizado": {"$in": [doc["nome_normalizado"] for _, doc in lote], "$exists": True}
+            },
+            {"nome_normalizado": 1, "_id": 0}
+        )
+        existentes = {doc["nome_normalizado"] async for doc in cursor}
+
+    novos: List[Tuple[int, Dict[str, Any]]] = []
+    for linha, doc in lote:
+        if doc["nome_normalizado"] in existentes:
+            relatorio.duplicados += 1
+            relatorio.erro(linha, "Já existe uma paciente com este nome", doc["nome"])
+        else:
+            novos.append((linha, doc))
+
+    if not novos:
+        return
+    if dry_run or db is None:
+        relatorio.inseridos += len(novos)
+        return
+
+    await carimbar(db, user_id, [doc for _, doc in novos])
+    try:
+        result = await db.pacientes.insert_many([doc for _, doc in novos], ordered=False)
+        relatorio.inseridos += len(result.inserted_ids)
+    except BulkWriteError as e:
+        relatorio.inseridos += e.details.get("nInserted", 0)
+        for write_error in e.details.get("writeErrors", []):
+            linha, doc = novos[write_error["index"]]
+            if write_error.get("code") == DUPLICATE_KEY:
+                # Cadastrada por outra requisição depois da consulta acima
+                relatorio.duplicados += 1
+                relatorio.erro(linha, "Já existe uma paciente com este nome", doc["nome"])
+                continue
+            relatorio.invalidos += 1
+            relatorio.erro(linha, write_error.get("errmsg", "Erro de escrita"), doc["nome"])
+    finally:
+        # Inserções parciais também mudam a lista
+        await confirmar_alteracao(db, user_id)
+
+
+async def importar_pacientes(
+    stream: AsyncIterator[bytes],
+    formato: str,
+    db,
+    user_id: str,
+    dry_run: bool = False,
+    tamanho_lote: int = TAMANHO_LOTE
+) -> RelatorioImportacao:
+    """
+    Importa pacientes de um stream CSV/NDJSON.
+
+    Linhas inválidas ou duplicadas (no próprio arquivo ou já cadastradas)
+    entram no relatório de erros; as demais são gravadas com insert_many
+    não ordenado em lotes de `tamanho_lote`.
+
+    Nomes repetidos só são lembrados dentro do lote, para a memória não
+    crescer com o arquivo: uma repetição em lote posterior é pega pela
+    consulta $in (a primeira já foi gravada) ou pelo índice único. Em
+    dry_run, repetições entre lotes diferentes não são detectadas.
+    """
+    relatorio = RelatorioImportacao()
+    vistos = set()  # nomes do lote atual
+    lote: List[Tuple[int, Dict[str, Any]]] = []
+
+    parser = _registros_csv if formato == FORMATO_CSV else _registros_ndjson
+    async for linha, registro in parser(_linhas(stream)):
+        relatorio.total += 1
+        if isinstance(registro, Exception):
+            relatorio.invalidos += 1
+            relatorio.erro(linha, str(registro))
+            continue
+
+        nome = registro.get("nome")
+        if formato == FORMATO_CSV and "dados_adicionais" in registro:
+            try:
+                registro["dados_adicionais"] = json.loads(registro["dados_adicionais"])
+            except json.JSONDecodeError:
+                pass  # a validação reporta o tipo incorreto
+
+        try:
+            paciente = PacienteCreate.model_validate(registro)
+        except ValidationError as e:
+            relatorio.invalidos += 1
+            relatorio.erro(linha, _formatar_erro_validacao(e), nome)
+            continue
+
+        documento = preparar_documento_paciente(paciente, user_id)
+        if documento["nome_normalizado"] in vistos:
+            relatorio.duplicados += 1
+            relatorio.erro(linha, "Nome repetido no arquivo de importação", paciente.nome)
+            continue
+        vistos.add(documento["nome_normalizado"])
+
+        lote.append((linha, documento))
+        if len(lote) >= tamanho_lote:
+            await _gravar_lote(db, lote, user_id, relatorio, dry_run)
+            lote = []
+            vistos.clear()
+
+    if lote:
+        await _gravar_lote(db, lote, user_id, relatorio, dry_run)
+
+    return relatorio
@@ -0,0 +1,268 @@
+"""
+Asynchronous PDF generation jobs.
+
+Jobs are rendered in a small worker pool so long reports never hold the
+request open. The pool is a process pool by default (PDF_EXECUTOR): the
+render is pure-Python CPU work, and in threads it would hold the GIL and
+slow every other request on the event loop. Job state lives in a pluggable store: an in-memory one for
+tests/single-process runs and a MongoDB one for production.
+"""
+import asyncio
+import contextvars
+import logging
+import multiprocessing
+import os
+import secrets
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from app.config import settings
+from app.tracing import span
+
+logger = logging.getLogger(__name__)
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class PDFJobStore(ABC):
+    """Interface for job state persistence"""
+
+    async def start(self) -> None:
+        pass
+
+    @abstractmethod
+    async def create(self, job: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    async def get(self, job_id: str, with_pdf: bool = False) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def update(self, job_id: str, fields: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, job_id: str) -> None:
+        ...
+
+    @abstractmethod
+    async def purge_expired(self, now: datetime) -> int:
+        ...
+
+
+class InMemoryPDFJobStore(PDFJobStore):
+    """Process-local store (tests and single worker deployments)"""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+
+    async def create(self, job):
+        self._jobs[job["_id"]] = dict(job)
+
+    async def get(self, job_id, with_pdf=False):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        job = dict(job)
+        if not with_pdf:
+            job.pop("pdf", None)
+        return job
+
+    async def update(self, job_id, fields):
+        if job_id in self._jobs:
+            self._jobs[job_id].update(fields)
+
+    async def delete(self, job_id):
+        self._jobs.pop(job_id, None)
+
+    async def purge_expired(self, now):
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.get("expires_at") and job["expires_at"] <= now
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+        return len(expired)
+
+
+class MongoPDFJobStore(PDFJobStore):
+    """MongoDB store - the TTL index removes expired artifacts server-side"""
+
+    def __init__(self, database):
+        self.collection = database.pdf_jobs
+
+    async def start(self):
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def create(self, job):
+        await self.collection.insert_one(job)
+
+    async def get(self, job_id, with_pdf=False):
+        projection = None if with_pdf else {"pdf": 0}
+        return await self.collection.find_one({"_id": job_id}, projection)
+
+    async def update(self, job_id, fields):
+        await self.collection.update_one({"_id": job_id}, {"$set": fields})
+
+    async def delete(self, job_id):
+        await self.collection.delete_one({"_id": job_id})
+
+    async def purge_expired(self, now):
+        # The TTL monitor only runs every ~60s; this keeps expiry deterministic
+        result = await self.collection.delete_many({"expires_at": {"$lte": now}})
+        return result.deleted_count
+
+
+def _render_pdf(payload: Dict[str, Any]) -> bytes:
+    from app.services.pdf_service import PDFService
+    return PDFService().generate_pdf(payload).getvalue()
+
+
+def _init_pdf_process() -> None:
+    # Lower CPU priority: on a busy core the event loop process runs first
+    if settings.PDF_WORKER_NICE:
+        os.nice(settings.PDF_WORKER_NICE)
+
+
+def pool_ping() -> None:
+    """Round trip through the pool (health check)"""
+
+
+def build_executor() -> Executor:
+    """Worker pool selected in PDF_EXECUTOR"""
+    if settings.PDF_EXECUTOR == "process":
+        # forkserver: children come from a clean process (not forked from a
+        # loop with live threads) with reportlab already imported
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["app.services.pdf_service"])
+        return ProcessPoolExecutor(
+            max_workers=settings.PDF_WORKERS,
+            mp_context=context,
+            initializer=_init_pdf_process,
+        )
+    return ThreadPoolExecutor(max_workers=settings.PDF_WORKERS, thread_name_prefix="pdf-worker")
+
+
+class PDFJobQueue:
+    """Submits PDF renders to a worker pool and tracks them in a job store"""
+
+    def __init__(self):
+        self.store: Optional[PDFJobStore] = None
+        self.executor: Optional[Executor] = None
+        self.ttl = timedelta(seconds=settings.PDF_JOB_TTL_SECONDS)
+        self._tasks: set = set()
+        self._cleanup_task: Optional[asyncio.Task] = None
+
+    @property
+    def depth(self) -> int:
+        """Jobs submitted but not finished yet"""
+        return len(self._tasks)
+
+    async def start(self, store: PDFJobStore) -> None:
+        self.store = store
+        await store.start()
+        self.executor = build_executor()
+        self._cleanup_task = asyncio.create_task(self._cleanup_loop())
+
+    async def stop(self) -> None:
+        if self._cleanup_task:
+            self._cleanup_task.cancel()
+            self._cleanup_task = None
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.executor:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    async def submit(self, payload: Dict[str, Any], filename: str) -> Dict[str, Any]:
+        now = datetime.utcnow()
+        job = {
+            "_id": secrets.token_urlsafe(16),
+            "status": JOB_PENDING,
+            "filename": filename,
+            "created_at": now,
+            "started_at": None,
+            "finished_at": None,
+            "expires_at": now + self.ttl,
+            "size": None,
+            "error": None,
+        }
+        await self.store.create(job)
+        # Fresh context: the job outlives the request and must not inherit its Mongo deadline
+        task = asyncio.create_task(self._run(job["_id"], payload), context=contextvars.Context())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def render(self, payload: Dict[str, Any]) -> bytes:
+        """
+        Render inline on the worker pool, keeping the event loop free.
+
+        The span is opened here because the pool does not see the request's
+        trace (a process pool child has none); it covers the wait for a free
+        worker as well as the render.
+        """
+        loop = asyncio.get_running_loop()
+        with span("pdf.render", executor=settings.PDF_EXECUTOR):
+            return await loop.run_in_executor(self.executor, _render_pdf, payload)
+
+    async def get(self, job_id: str, with_pdf: bool = False) -> Optional[Dict[str, Any]]:
+        return await self.store.get(job_id, with_pdf=with_pdf)
+
+    async def consume(self, job_id: str) -> None:
+        """Remove a job once its artifact has been fully downloaded"""
+        await self.store.delete(job_id)
+
+    async def _run(self, job_id: str, payload: Dict[str, Any]) -> None:
+        loop = asyncio.get_running_loop()
+        await self.store.update(job_id, {"status": JOB_RUNNING, "started_at": datetime.utcnow()})
+        try:
+            pdf = await loop.run_in_executor(self.executor, _render_pdf, payload)
+        except Exception as e:
+            logger.exception("PDF job %s failed", job_id)
+            finished = datetime.utcnow()
+            await self.store.update(job_id, {
+                "status": JOB_FAILED,
+                "error": str(e),
+                "finished_at": finished,
+                "expires_at": finished + self.ttl,
+            })
+            return
+        finished = datetime.utcnow()
+        await self.store.update(job_id, {
+            "status": JOB_DONE,
+            "pdf": pdf,
+            "size": len(pdf),
+            "finished_at": finished,
+            "expires_at": finished + self.ttl,
+        })
+
+    async def _cleanup_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.PDF_JOB_CLEANUP_INTERVAL_SECONDS)
+            try:
+                removed = await self.store.purge_expired(datetime.utcnow())
+                if removed:
+                    logger.info("Purged %d expired PDF jobs", removed)
+            except Exception:
+                logger.exception("PDF job cleanup failed")
+
+
+pdf_job_queue = PDFJobQueue()
+
+
+def build_job_store(database) -> PDFJobStore:
+    """Select the job store configured in PDF_JOB_STORE"""
+    if settings.PDF_JOB_STORE == "mongo":
+        return MongoPDFJobStore(database)
+    return InMemoryPDFJobStore()
+
+
+def get_pdf_job_queue() -> PDFJobQueue:
+    return pdf_job_queue
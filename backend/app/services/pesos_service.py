@@ -0,0 +1,81 @@
+"""
+Série de pesos por paciente (bucket pattern)
+
+Além do documento completo em avaliacoes, cada pesagem é gravada em um
+documento compacto da coleção pesos, um por paciente (um novo bucket é
+aberto a cada TAMANHO_BUCKET medidas):
+
+    {paciente_id, user_id, n, medidas: [{a, d, s, p, g}, ...]}
+
+a = id da avaliação, d = data, s = semana gestacional, p = peso (kg),
+g = ganho em relação ao peso pré-gestacional (kg). O gráfico de ganho de peso
+lê só esse documento, sem carregar checklist e relatório das avaliações.
+scripts/backfill_pesos.py preenche as avaliações gravadas antes da coleção.
+"""
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+COLECAO = "pesos"
+TAMANHO_BUCKET = 500
+
+
+def medida(avaliacao: Dict[str, Any]) -> Dict[str, Any]:
+    """Entrada compacta de uma avaliação (documento já com _id)"""
+    calculos = avaliacao.get("calculos") or {}
+    ganho = calculos.get("ganho_peso_atual")
+    if ganho is None and avaliacao.get("peso_pre_gestacional") is not None:
+        ganho = round(avaliacao["peso_atual"] - avaliacao["peso_pre_gestacional"], 1)
+    return {
+        "a": str(avaliacao["_id"]),
+        "d": avaliacao["data_avaliacao"],
+        "s": avaliacao["semana_gestacional"],
+        "p": avaliacao["peso_atual"],
+        "g": ganho,
+    }
+
+
+def _operacao_bucket(user_id: str, paciente_id: str, medidas: List[Dict[str, Any]]) -> UpdateOne:
+    # Acrescenta no bucket aberto da paciente ou cria um novo (upsert)
+    return UpdateOne(
+        {"paciente_id": paciente_id, "user_id": user_id, "n": {"$lt": TAMANHO_BUCKET}},
+        {"$push": {"medidas": {"$each": medidas}}, "$inc": {"n": len(medidas)}},
+        upsert=True,
+    )
+
+
+async def registrar_medidas(db, user_id: str, avaliacoes: List[Dict[str, Any]]) -> None:
+    """Grava as pesagens das avaliações inseridas (qualquer número de pacientes)"""
+    por_paciente: Dict[str, List[Dict[str, Any]]] = {}
+    for avaliacao in avaliacoes:
+        por_paciente.setdefault(avaliacao["paciente_id"], []).append(medida(avaliacao))
+    operacoes = [
+        _operacao_bucket(user_id, paciente_id, medidas)
+        for paciente_id, medidas in por_paciente.items()
+    ]
+    if operacoes:
+        await db[COLECAO].bulk_write(operacoes, ordered=False)
+
+
+async def remover_medida(db, paciente_id: str, avaliacao_id: str) -> None:
+    await db[COLECAO].update_one(
+        {"paciente_id": paciente_id, "medidas.a": avaliacao_id},
+        {"$pull": {"medidas": {"a": avaliacao_id}}, "$inc": {"n": -1}},
+    )
+
+
+async def remover_paciente(db, paciente_id: str) -> None:
+    await db[COLECAO].delete_many({"paciente_id": paciente_id})
+
+
+async def ler_medidas(db, user_id: str, paciente_id: str) -> Optional[List[Dict[str, Any]]]:
+    """Pesagens em ordem cronológica; None quando a paciente não tem bucket"""
+    buckets = await db[COLECAO].find(
+        {"paciente_id": paciente_id, "user_id": user_id},
+        {"_id": 0, "medidas": 1},
+    ).to_list(None)
+    if not buckets:
+        return None
+    medidas = [m for bucket in buckets for m in bucket.get("medidas", [])]
+    medidas.sort(key=lambda m: m["d"])
+    return medidas
@@ -0,0 +1,59 @@
+"""
+Cache de posse das pacientes
+
+As rotas de avaliações consultam pacientes só para provar que a paciente
+pertence ao usuário (e, na criação, para ler peso pré-gestacional e altura).
+Esses três campos ficam num cache pequeno com TTL, preenchido pelas leituras
+e invalidado quando a paciente é alterada ou excluída (com CACHE_BACKEND=redis
+a invalidação chega a todos os workers).
+
+Uma leitura que começou antes da exclusão pode repovoar o cache depois da
+invalidação. Por isso as escritas não confiam só nele: depois de gravar
+avaliações, exclusao_service.descartar_orfas confere no banco se a paciente
+ainda existe.
+"""
+from typing import Any, Dict, Optional
+
+from bson import ObjectId
+
+from app.cache import build_cache
+from app.config import settings
+
+CAMPOS = {"user_id": 1, "peso_pre_gestacional": 1, "altura": 1}
+
+cache_posse = build_cache(
+    "posse",
+    maxsize=settings.OWNERSHIP_CACHE_MAX_ENTRIES,
+    default_ttl=settings.OWNERSHIP_CACHE_TTL_SECONDS,
+)
+
+
+def _chave(paciente_id: str) -> str:
+    return f"posse:{paciente_id}"
+
+
+async def dados_posse(db, paciente_id: str) -> Optional[Dict[str, Any]]:
+    """{user_id, peso_pre_gestacional, altura} da paciente; None se não existe"""
+    if not ObjectId.is_valid(paciente_id or ""):
+        return None
+    dados = await cache_posse.get(_chave(paciente_id))
+    if dados is not None:
+        return dados
+    paciente = await db.pacientes.find_one({"_id": ObjectId(paciente_id)}, CAMPOS)
+    if paciente is None:
+        return None
+    dados = {campo: paciente.get(campo) for campo in CAMPOS}
+    await cache_posse.set(_chave(paciente_id), dados)
+    return dados
+
+
+async def paciente_do_usuario(db, paciente_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+    """Os dados de posse quando a paciente existe e pertence ao usuário"""
+    dados = await dados_posse(db, paciente_id)
+    if dados is None or dados["user_id"] != user_id:
+        return None
+    return dados
+
+
+async def invalidar_posse(paciente_id: str) -> None:
+    await cache_posse.delete(_chave(paciente_id))
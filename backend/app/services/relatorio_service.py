@@ -2,9 +2,12 @@
 Serviço de geração de feedback clínico e relatório
 ATUALIZADO: 08/12 - Textos completos conforme solicitação
 """
+import json
+from collections import OrderedDict
 from typing import Dict, Any, List
-from app.models.schemas import FeedbackItem
+from app.models.schemas import FeedbackItem, RelatorioResponse
 from app.services.calculos_service import determinar_trimestre
+from app.tracing import traced
 
 # Helper para normalizar respostas (Sim/Não/Não sei)
 def check(val, target):
@@ -14,6 +17,7 @@ def check(val, target):
         return val == (target == 'Sim')
     return str(val).lower() == str(target).lower()
 
+@traced("rules.relatorio")
 def gerar_relatorio_completo(
     respostas: Dict[str, Any],
     imc_classification: str,
@@ -375,3 +379,79 @@ def gerar_relatorio_completo(
         'recomendacoes': recomendacoes,
         'adequados': adequados
     }
+
+
+class CacheRelatorios:
+    """
+    Cache LRU de relatórios já serializados (dict), indexado pelas respostas,
+    classificação do IMC e semana gestacional. Usado na ingestão em lote,
+    onde as mesmas combinações de respostas se repetem muito.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._dados: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def faixa_semana(semana_gestacional: int) -> int:
+        """
+        gerar_relatorio_completo só distingue a semana pelos cortes > 11 e
+        < 14; semanas na mesma faixa geram o mesmo relatório.
+        Manter em sincronia com as regras acima.
+        """
+        if semana_gestacional <= 11:
+            return 0
+        if semana_gestacional < 14:
+            return 1
+        return 2
+
+    @classmethod
+    def chave(cls, respostas: Dict[str, Any], imc_classification: str, semana_gestacional: int) -> str:
+        return json.dumps(
+            [respostas, imc_classification, cls.faixa_semana(semana_gestacional)],
+            sort_keys=True,
+            default=str
+        )
+
+    def obter(
+        self,
+        respostas: Dict[str, Any],
+        imc_classification: str,
+        semana_gestacional: int
+    ) -> Dict[str, Any]:
+        chave = self.chave(respostas, imc_classification, semana_gestacional)
+        relatorio = self._dados.get(chave)
+        if relatorio is not None:
+            self.hits += 1
+            self._dados.move_to_end(chave)
+            return relatorio
+
+        self.misses += 1
+        relatorio = RelatorioResponse(
+            **gerar_relatorio_completo(respostas, imc_classification, semana_gestacional)
+        ).model_dump()
+        self._guardar(chave, relatorio)
+        return relatorio
+
+    def _guardar(self, chave: str, relatorio: Dict[str, Any]) -> None:
+        self._dados[chave] = relatorio
+        self._dados.move_to_end(chave)
+        if len(self._dados) > self.maxsize:
+            self._dados.popitem(last=False)
+
+    def exportar(self) -> List[list]:
+        """Entradas da menos para a mais usada (para o snapshot de caches)"""
+        return [[chave, relatorio] for chave, relatorio in self._dados.items()]
+
+    def importar(self, itens: List[list]) -> int:
+        for chave, relatorio in itens:
+            self._guardar(chave, relatorio)
+        return len(itens)
+
+    def __len__(self) -> int:
+        return len(self._dados)
+
+
+cache_relatorios = CacheRelatorios()
@@ -0,0 +1,264 @@
+"""
+Versionamento de schema dos documentos (upgrade preguiçoso na leitura)
+
+Cada documento carrega `schema_version`. Quando um documento antigo é lido,
+os helpers aplicam em memória as funções de upgrade registradas aqui e
+enfileiram a gravação do resultado, feita em lotes por uma tarefa em
+background. A migração offline (scripts/migrate_data.py) usa o mesmo
+registro e só precisa tratar os documentos que nunca são lidos.
+"""
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.services.busca_service import normalizar_nome
+
+logger = logging.getLogger(__name__)
+
+Upgrade = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+# colecao -> {versao_origem: funcao}; cada função recebe o documento na
+# versão de origem e devolve os campos alterados ($set) para a versão seguinte
+_UPGRADES: Dict[str, Dict[int, Upgrade]] = {}
+
+
+def registrar_upgrade(colecao: str, de_versao: int):
+    """Registra o upgrade de `de_versao` para `de_versao + 1`"""
+    def decorator(funcao: Upgrade) -> Upgrade:
+        _UPGRADES.setdefault(colecao, {})[de_versao] = funcao
+        return funcao
+    return decorator
+
+
+def versao_atual(colecao: str) -> int:
+    upgrades = _UPGRADES.get(colecao)
+    return max(upgrades) + 1 if upgrades else 0
+
+
+def versao_documento(documento: Dict[str, Any]) -> int:
+    return documento.get("schema_version") or 0
+
+
+def aplicar_upgrades(colecao: str, documento: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Leva o documento até a versão atual.
+    Retorna (documento atualizado, campos alterados). Sem alterações, o
+    documento original é devolvido e o dict de campos fica vazio.
+    """
+    versao = versao_documento(documento)
+    alvo = versao_atual(colecao)
+    if versao >= alvo:
+        return documento, {}
+
+    documento = dict(documento)
+    alteracoes: Dict[str, Any] = {}
+    while versao < alvo:
+        campos = _UPGRADES[colecao][versao](documento)
+        documento.update(campos)
+        alteracoes.update(campos)
+        versao += 1
+    documento["schema_version"] = alteracoes["schema_version"] = versao
+    return documento, alteracoes
+
+
+def filtro_desatualizados(colecao: str) -> Dict[str, Any]:
+    """Documentos abaixo da versão atual (inclui os que não têm o marcador)"""
+    return {"schema_version": {"$not": {"$gte": versao_atual(colecao)}}}
+
+
+# === Upgrades registrados ===
+
+CAMPOS_BOOL = [
+    'fruits_vegetables', 'dairy_products', 'whole_grains',
+    'meat_poultry_eggs', 'plant_proteins', 'fish_consumption',
+    'processed_foods', 'physical_activity', 'coffee_tea_consumption',
+    'substances_use'
+]
+
+TITULO_MAP = {
+    "dietary_pattern": "Padrão Alimentar",
+    "fruits_vegetables": "Frutas e Vegetais",
+    "dairy_products": "Laticínios",
+    "whole_grains": "Grãos Integrais",
+    "meat_poultry_eggs": "Carnes e Ovos",
+    "plant_proteins": "Proteínas Vegetais",
+    "fish_consumption": "Consumo de Peixe",
+    "processed_foods": "Alimentos Processados",
+    "folic_acid_supplement": "Ácido Fólico",
+    "iron_supplement": "Ferro",
+    "calcium_supplement": "Cálcio",
+    "sun_exposure": "Exposição Solar",
+    "anemia_test": "Exame de Anemia",
+    "physical_activity": "Atividade Física",
+    "coffee_tea_consumption": "Café e Chá",
+    "substances_use": "Substâncias"
+}
+
+
+@registrar_upgrade("pacientes", 0)
+def _paciente_v1(paciente: Dict[str, Any]) -> Dict[str, Any]:
+    """Adiciona peso_pre_gestacional (None) em cadastros antigos"""
+    if "peso_pre_gestacional" not in paciente:
+        return {"peso_pre_gestacional": None}
+    return {}
+
+
+@registrar_upgrade("pacientes", 1)
+def _paciente_v2(paciente: Dict[str, Any]) -> Dict[str, Any]:
+    """Adiciona nome_normalizado (busca e unicidade do nome por usuário)"""
+    return {"nome_normalizado": normalizar_nome(paciente.get("nome", ""))}
+
+
+@registrar_upgrade("avaliacoes", 0)
+def _avaliacao_v1(avaliacao: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    - Converte boolean para string ("Sim"/"Não") em respostas_checklist
+    - Atualiza estrutura de calculos
+    - Adiciona title nos itens de relatorio
+    """
+    updates = {}
+
+    respostas = avaliacao.get("respostas_checklist", {})
+    if respostas:
+        novas_respostas = dict(respostas)
+        for campo in CAMPOS_BOOL:
+            valor = respostas.get(campo)
+            if isinstance(valor, bool):
+                novas_respostas[campo] = "Sim" if valor else "Não"
+        updates["respostas_checklist"] = novas_respostas
+
+    calculos = avaliacao.get("calculos", {})
+    if calculos:
+        updates["calculos"] = {
+            "imc_pre_gestacional": calculos.get("imc_pre_gestacional", calculos.get("imc", 0)),
+            "imc_classification": calculos.get("imc_classification", "Não calculado"),
+            "peso_atual": calculos.get("peso_atual", avaliacao.get("peso_atual", 0)),
+            "ganho_peso_atual": calculos.get("ganho_peso_atual", calculos.get("weight_gain", 0)),
+            "trimestre": calculos.get("trimestre", "Não informado"),
+            "weight_gain_recommendation": calculos.get("weight_gain_recommendation", "")
+        }
+
+    relatorio = avaliacao.get("relatorio", {})
+    if relatorio:
+        novo_relatorio = {}
+        for categoria in ["alertas_criticos", "recomendacoes", "adequados"]:
+            novos_itens = []
+            for item in relatorio.get(categoria, []):
+                novo_item = dict(item)
+                if "title" not in novo_item:
+                    item_id = novo_item.get("item_id", "item")
+                    novo_item["title"] = TITULO_MAP.get(item_id, item_id.replace("_", " ").title())
+                novos_itens.append(novo_item)
+            novo_relatorio[categoria] = novos_itens
+        updates["relatorio"] = novo_relatorio
+
+    if "peso_pre_gestacional" not in avaliacao:
+        updates["peso_pre_gestacional"] = None
+
+    return updates
+
+
+# === Gravação assíncrona em lotes ===
+
+class GravacaoUpgrades:
+    """
+    Acumula os upgrades feitos na leitura e grava em lotes (bulk_write não
+    ordenado). O filtro inclui a versão lida, então uma escrita concorrente
+    que já atualizou o documento não é sobrescrita.
+    """
+
+    def __init__(self, tamanho_lote: int = 200, intervalo: float = 2.0):
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.database = None
+        self._pendentes: Dict[Tuple[str, Any], UpdateOne] = {}
+        self._evento: Optional[asyncio.Event] = None
+        self._tarefa: Optional[asyncio.Task] = None
+        self.lidos_desatualizados = 0
+        self.gravados = 0
+
+    @property
+    def pendentes(self) -> int:
+        """Upgrades aguardando gravação"""
+        return len(self._pendentes)
+
+    def start(self, database) -> None:
+        self.database = database
+        self._evento = asyncio.Event()
+        self._tarefa = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._tarefa:
+            self._tarefa.cancel()
+            self._tarefa = None
+        await self.flush()
+
+    def enfileirar(self, colecao: str, versao_lida: int, documento_id: Any, alteracoes: Dict[str, Any]) -> None:
+        self.lidos_desatualizados += 1
+        if self._tarefa is None:
+            return
+        filtro_versao = {"$in": [None, 0]} if versao_lida == 0 else versao_lida
+        self._pendentes[(colecao, documento_id)] = UpdateOne(
+            {"_id": documento_id, "schema_version": filtro_versao},
+            {"$set": alteracoes}
+        )
+        if len(self._pendentes) >= self.tamanho_lote:
+            self._evento.set()
+
+    async def flush(self) -> None:
+        if not self._pendentes or self.database is None:
+            return
+        pendentes, self._pendentes = self._pendentes, {}
+        por_colecao: Dict[str, list] = {}
+        for (colecao, _), operacao in pendentes.items():
+            por_colecao.setdefault(colecao, []).append(operacao)
+        for colecao, operacoes in por_colecao.items():
+            try:
+                result = await self.database[colecao].bulk_write(operacoes, ordered=False)
+                self.gravados += result.modified_count
+            except BulkWriteError as e:
+                self.gravados += e.details.get("nModified", 0)
+                duplicados = [erro for erro in e.details.get("writeErrors", []) if erro.get("code") == 11000]
+                if duplicados:
+                    # Nomes iguais sem acentos/maiúsculas de antes do índice único
+                    logger.warning(
+                        "%d upgrades de %s violam um índice único; execute scripts/migrate_data.py "
+                        "para renomear os conflitos", len(duplicados), colecao
+                    )
+                if len(duplicados) < len(e.details.get("writeErrors", [])):
+                    logger.error("Falha ao gravar upgrades de schema em %s: %s", colecao, e.details.get("writeErrors"))
+            except Exception:
+                logger.exception("Falha ao gravar upgrades de schema em %s", colecao)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._evento.wait(), timeout=self.intervalo)
+            except asyncio.TimeoutError:
+                pass
+            self._evento.clear()
+            await self.flush()
+
+
+gravacao_upgrades = GravacaoUpgrades()
+
+
+def atualizar_na_leitura(colecao: str, documento: Dict[str, Any]) -> Dict[str, Any]:
+    """Aplica os upgrades pendentes e agenda a gravação do resultado"""
+    versao_lida = versao_documento(documento)
+    documento, alteracoes = aplicar_upgrades(colecao, documento)
+    if alteracoes and "_id" in documento:
+        gravacao_upgrades.enfileirar(colecao, versao_lida, documento["_id"], alteracoes)
+    return documento
+
+
+async def contar_por_versao(db, colecao: str) -> Dict[str, int]:
+    """Quantidade de documentos em cada versão de schema"""
+    pipeline = [
+        {"$group": {"_id": {"$ifNull": ["$schema_version", 0]}, "total": {"$sum": 1}}},
+        {"$sort": {"_id": 1}},
+    ]
+    return {str(grupo["_id"]): grupo["total"] async for grupo in db[colecao].aggregate(pipeline)}
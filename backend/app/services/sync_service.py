@@ -0,0 +1,103 @@
+"""
+Serviço de sincronização incremental (/api/sync)
+
+Pacientes, avaliações e exclusões de um usuário carregam o `seq` reservado
+em alteracoes_service no momento da escrita. Uma sincronização lê as três
+coleções pelo índice (user_id, seq) a partir do token do cliente e mescla
+os resultados em ordem de seq; o token seguinte é o seq do último item
+entregue.
+
+Escritas muito recentes (menos de SYNC_SETTLE_SECONDS) ficam para a
+próxima sincronização: assim uma escrita que reservou um seq menor, mas
+ainda não terminou, não é pulada por um token maior. O `alterado_em` é
+carimbado depois da reserva, em workers diferentes, e não cresce junto
+com o seq; por isso a consulta é só por seq e a entrega para no primeiro
+documento recente, sem entregar nenhum seq maior que ele.
+"""
+import heapq
+import time
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from app.config import settings
+from app.services.alteracoes_service import COLECAO_EXCLUSOES
+
+COLECOES = ("pacientes", "avaliacoes", COLECAO_EXCLUSOES)
+
+
+class TokenExpirado(Exception):
+    """O token é mais antigo que a retenção das exclusões"""
+
+
+def gerar_token(seq: int) -> str:
+    return f"{seq}.{int(time.time())}"
+
+
+def ler_token(token: Optional[str]) -> int:
+    """Seq contido no token; None/vazio = sincronização completa"""
+    if not token:
+        return 0
+    seq, _, emitido_em = token.partition(".")
+    seq = int(seq)
+    if seq < 0:
+        raise ValueError("seq negativo")
+    if emitido_em and settings.SYNC_TOMBSTONE_TTL_DAYS > 0:
+        if time.time() - int(emitido_em) > settings.SYNC_TOMBSTONE_TTL_DAYS * 86400:
+            raise TokenExpirado()
+    return seq
+
+
+async def _mesclar(cursores: Dict[str, Any]) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """Mescla cursores já ordenados por seq"""
+    heap = []
+    for ordem, (colecao, cursor) in enumerate(cursores.items()):
+        async for doc in cursor:
+            heap.append((doc["seq"], ordem, colecao, doc, cursor))
+            break
+    heapq.heapify(heap)
+    while heap:
+        _, ordem, colecao, doc, cursor = heapq.heappop(heap)
+        yield colecao, doc
+        async for proximo in cursor:
+            heapq.heappush(heap, (proximo["seq"], ordem, colecao, proximo, cursor))
+            break
+
+
+async def alteracoes_desde(
+    db,
+    user_id: str,
+    desde: int,
+    limite: Optional[int] = None
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """(colecao, documento) alterados depois de `desde`, em ordem de seq"""
+    corte = datetime.utcnow() - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+    filtro = {"user_id": user_id, "seq": {"$gt": desde}}
+    cursores = {}
+    for colecao in COLECOES:
+        cursor = db[colecao].find(filtro).sort("seq", 1)
+        if limite is not None:
+            # Um a mais para saber se existe próxima página
+            cursor = cursor.limit(limite + 1)
+        cursores[colecao] = cursor
+    async for colecao, doc in _mesclar(cursores):
+        alterado_em = doc.get("alterado_em")
+        if alterado_em is not None and alterado_em > corte:
+            # Seqs menores ainda podem estar sendo gravados: o token não passa daqui
+            break
+        yield colecao, doc
+
+
+async def pagina_desde(db, user_id: str, desde: int, limite: int) -> Dict[str, Any]:
+    """Uma página de até `limite` alterações e o token da próxima"""
+    pagina = {colecao: [] for colecao in COLECOES}
+    ultimo_seq = desde
+    entregues = 0
+    tem_mais = False
+    async for colecao, doc in alteracoes_desde(db, user_id, desde, limite):
+        if entregues == limite:
+            tem_mais = True
+            break
+        pagina[colecao].append(doc)
+        ultimo_seq = doc["seq"]
+        entregues += 1
+    return {"itens": pagina, "token": gerar_token(ultimo_seq), "has_more": tem_mais}
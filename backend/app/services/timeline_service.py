@@ -0,0 +1,133 @@
+"""
+Serviço da linha do tempo da paciente
+
+Uma agregação em pacientes traz o documento da paciente e, via $lookup, as
+avaliações dela já projetadas (sem checklist nem relatório) em ordem
+cronológica. A partir disso é montada a trajetória de ganho de peso com a
+faixa FIGO esperada em cada semana, reduzida a no máximo
+TIMELINE_MAX_PONTOS pontos quando o histórico é longo.
+
+O resultado fica no cache do usuário e é descartado na próxima escrita dele
+(ver alteracoes_service).
+"""
+from typing import Any, Callable, Dict, List, Optional
+
+from bson import ObjectId
+
+from app.cache import cache, user_namespace, versioned_key
+from app.config import settings
+from app.services.calculos_service import (
+    calcular_faixa_ganho_esperado,
+    calcular_imc,
+    classificar_imc
+)
+
+
+def pipeline_timeline(paciente_id: str, user_id: str) -> List[Dict[str, Any]]:
+    return [
+        {"$match": {"_id": ObjectId(paciente_id), "user_id": user_id}},
+        {"$lookup": {
+            "from": "avaliacoes",
+            "let": {"pid": {"$toString": "$_id"}},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$paciente_id", "$$pid"]}}},
+                {"$sort": {"data_avaliacao": 1}},
+                {"$project": {
+                    "_id": 0,
+                    "id": {"$toString": "$_id"},
+                    "data_avaliacao": 1,
+                    "semana_gestacional": 1,
+                    "peso_atual": 1,
+                    "ganho_peso_atual": {"$ifNull": [
+                        "$calculos.ganho_peso_atual",
+                        {"$round": [{"$subtract": ["$peso_atual", "$peso_pre_gestacional"]}, 1]},
+                    ]},
+                    "imc_classification": "$calculos.imc_classification",
+                    "trimestre": "$calculos.trimestre",
+                    "alertas_criticos": {"$size": {"$ifNull": ["$relatorio.alertas_criticos", []]}},
+                }},
+            ],
+            "as": "avaliacoes",
+        }},
+    ]
+
+
+def classificacao_gestacao(paciente: Dict[str, Any], avaliacoes: List[Dict[str, Any]]) -> Optional[str]:
+    """Classificação do IMC pré-gestacional que define a faixa FIGO"""
+    peso_pre = paciente.get("peso_pre_gestacional")
+    altura = paciente.get("altura")
+    if peso_pre and altura:
+        return classificar_imc(calcular_imc(peso_pre, altura))
+    for avaliacao in reversed(avaliacoes):
+        if avaliacao.get("imc_classification"):
+            return avaliacao["imc_classification"]
+    return None
+
+
+def reduzir_pontos(pontos: List[Dict[str, Any]], maximo: int) -> List[Dict[str, Any]]:
+    """
+    Reduz a série a no máximo `maximo` pontos
+
+    Primeiro fica só a avaliação mais recente de cada semana; se ainda
+    sobrar, os pontos são escolhidos em intervalos regulares mantendo o
+    primeiro e o último
+    """
+    por_semana: Dict[int, Dict[str, Any]] = {}
+    for ponto in pontos:
+        por_semana[ponto["semana"]] = ponto
+    pontos = sorted(por_semana.values(), key=lambda ponto: ponto["semana"])
+    if len(pontos) <= maximo:
+        return pontos
+    if maximo < 2:
+        return pontos[-maximo:]
+    passo = (len(pontos) - 1) / (maximo - 1)
+    return [pontos[round(i * passo)] for i in range(maximo)]
+
+
+def montar_trajetoria(avaliacoes: List[Dict[str, Any]], classificacao: Optional[str]) -> List[Dict[str, Any]]:
+    pontos = []
+    for avaliacao in avaliacoes:
+        semana = avaliacao.get("semana_gestacional")
+        ganho = avaliacao.get("ganho_peso_atual")
+        if semana is None or ganho is None:
+            continue
+        esperado_min, esperado_max = calcular_faixa_ganho_esperado(classificacao, semana)
+        pontos.append({
+            "semana": semana,
+            "data_avaliacao": avaliacao.get("data_avaliacao"),
+            "ganho": ganho,
+            "esperado_min": esperado_min,
+            "esperado_max": esperado_max,
+        })
+    return pontos
+
+
+async def carregar_timeline(
+    db,
+    paciente_id: str,
+    user_id: str,
+    converter_paciente: Callable[[Dict[str, Any]], Dict[str, Any]]
+) -> Optional[Dict[str, Any]]:
+    """Paciente, avaliações projetadas e trajetória; None se não encontrada"""
+    chave = await versioned_key(user_namespace(user_id), f"timeline:{paciente_id}")
+    dados = await cache.get(chave)
+    if dados is not None:
+        return dados
+
+    resultado = await db.pacientes.aggregate(pipeline_timeline(paciente_id, user_id)).to_list(1)
+    if not resultado:
+        return None
+    paciente = resultado[0]
+    avaliacoes = paciente.pop("avaliacoes", [])
+    classificacao = classificacao_gestacao(paciente, avaliacoes)
+    pontos = montar_trajetoria(avaliacoes, classificacao)
+    trajetoria = reduzir_pontos(pontos, settings.TIMELINE_MAX_PONTOS)
+    dados = {
+        "paciente": converter_paciente(paciente),
+        "classificacao_imc": classificacao,
+        "avaliacoes": avaliacoes,
+        "trajetoria": trajetoria,
+        "amostrada": len(trajetoria) < len(pontos),
+    }
+    await cache.set(chave, dados, ttl=settings.TIMELINE_CACHE_TTL_SECONDS)
+    return dados
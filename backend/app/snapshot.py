@@ -0,0 +1,187 @@
+"""
+Warm-cache snapshot.
+
+The pure, process-local caches (compiled reports in
+``relatorio_service.cache_relatorios`` and FIGO recommendation texts in
+``calculos_service.obter_recomendacao_ganho_peso_cache``) are written to a
+local file on graceful shutdown and every CACHE_SNAPSHOT_INTERVAL_SECONDS,
+and loaded back in the lifespan so a fresh instance starts warm.
+
+File layout::
+
+    MAGIC
+    header (one JSON line): format, code/rules versions, section offsets
+    body: one JSON document per section
+
+The file is memory-mapped on load and each section is parsed straight from
+its slice. The header carries a hash of the rule tables and of the source
+of the modules that produce the cached values; on any mismatch (new deploy
+changed the rules or the code) the snapshot is discarded and deleted.
+Writes go to a temporary file and are renamed into place, so with several
+workers the last one to write wins and readers never see a partial file.
+
+Per-user entries of ``app.cache`` are not included: they depend on data
+that may change while the instance is down.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import mmap
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"NUTRI-CACHE-SNAPSHOT\n"
+SNAPSHOT_FORMAT = 1
+
+
+def _warmable() -> Dict[str, Any]:
+    from app.services.calculos_service import obter_recomendacao_ganho_peso_cache
+    from app.services.relatorio_service import cache_relatorios
+    return {
+        "relatorios": cache_relatorios,
+        "recomendacoes_figo": obter_recomendacao_ganho_peso_cache,
+    }
+
+
+def rules_version() -> str:
+    from app.services import calculos_service
+    catalog = {
+        "limites": calculos_service.LIMITES_CATEGORIA,
+        "marcos": calculos_service.MARCOS_FAIXA_GANHO,
+        "mensagens": calculos_service.MENSAGENS_FIGO,
+    }
+    return hashlib.sha256(json.dumps(catalog, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def code_version() -> str:
+    """Hash of the modules whose output is cached (rules code, report schema)"""
+    from app.models import schemas
+    from app.services import calculos_service, relatorio_service
+    digest = hashlib.sha256()
+    for module in (calculos_service, relatorio_service, schemas):
+        with open(module.__file__, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def _versions() -> Dict[str, Any]:
+    return {"format": SNAPSHOT_FORMAT, "code": code_version(), "rules": rules_version()}
+
+
+def collect() -> Dict[str, list]:
+    """Export the caches (call on the event loop: the caches are not thread-safe)"""
+    return {name: instance.exportar() for name, instance in _warmable().items()}
+
+
+def write_snapshot(path: str, sections: Dict[str, list]) -> int:
+    """Write the exported sections atomically; returns the file size"""
+    bodies = {name: json.dumps(items, separators=(",", ":")).encode() for name, items in sections.items()}
+    offsets, position = {}, 0
+    for name, body in bodies.items():
+        offsets[name] = [position, len(body)]
+        position += len(body)
+    header = dict(_versions(), created_at=datetime.utcnow().isoformat(), sections=offsets)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(MAGIC)
+        f.write(json.dumps(header).encode() + b"\n")
+        for body in bodies.values():
+            f.write(body)
+    os.replace(temporary, path)
+    return os.path.getsize(path)
+
+
+def _discard(path: str, reason: str) -> Dict[str, int]:
+    logger.info("Discarding cache snapshot %s: %s", path, reason)
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+    return {}
+
+
+def load_snapshot(path: str) -> Dict[str, int]:
+    """Load a compatible snapshot into the caches; returns entries per section"""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return {}
+    with f:
+        if os.fstat(f.fileno()).st_size <= len(MAGIC):
+            return _discard(path, "empty")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:len(MAGIC)] != MAGIC:
+                return _discard(path, "not a snapshot")
+            end = data.find(b"\n", len(MAGIC))
+            try:
+                header = json.loads(data[len(MAGIC):end])
+            except ValueError:
+                return _discard(path, "corrupt header")
+            expected = _versions()
+            stale = [key for key, value in expected.items() if header.get(key) != value]
+            if stale:
+                return _discard(path, f"{', '.join(stale)} version changed")
+            body = end + 1
+            loaded = {}
+            caches = _warmable()
+            try:
+                for name, (offset, length) in header["sections"].items():
+                    if name not in caches:
+                        continue
+                    start = body + offset
+                    items = json.loads(data[start:start + length])
+                    loaded[name] = caches[name].importar(items)
+            except (KeyError, TypeError, ValueError):
+                return _discard(path, "corrupt body")
+    logger.info("Cache snapshot loaded from %s: %s", path, loaded)
+    return loaded
+
+
+class SnapshotSaver:
+    """Saves the snapshot periodically and once more on stop"""
+
+    def __init__(self):
+        self.path = ""
+        self.saved_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, path: str) -> None:
+        self.path = path
+        if settings.CACHE_SNAPSHOT_INTERVAL_SECONDS > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self.path:
+            await self.save()
+
+    async def save(self) -> None:
+        sections = collect()
+        if not any(sections.values()):
+            return
+        try:
+            size = await asyncio.to_thread(write_snapshot, self.path, sections)
+        except OSError:
+            logger.exception("Could not write cache snapshot %s", self.path)
+            return
+        self.saved_at = time.monotonic()
+        logger.info("Cache snapshot saved to %s (%d bytes)", self.path, size)
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.CACHE_SNAPSHOT_INTERVAL_SECONDS)
+            await self.save()
+
+
+snapshot_saver = SnapshotSaver()
@@ -0,0 +1,290 @@
+"""
+Lightweight request tracing.
+
+Each HTTP request gets a Trace stored in a contextvar. Code paths of
+interest open spans (``with span("pdf.render")`` or ``@traced(...)``);
+MongoDB commands are recorded through a pymongo CommandListener, which runs
+in Motor's executor threads with a copy of the request context.
+
+At the end of the request the spans are summarised per category in a
+``Server-Timing`` header, written to the log as one structured line with
+the correlation id, and optionally appended as OTLP-compatible JSON to a
+local file (TRACE_EXPORT_PATH).
+"""
+import asyncio
+import functools
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from pymongo import monitoring
+
+logger = logging.getLogger("app.tracing")
+
+REQUEST_ID_HEADER = "x-request-id"
+
+
+class Span:
+    __slots__ = ("name", "category", "span_id", "parent_id", "start", "end", "attributes", "error")
+
+    def __init__(self, name: str, category: str, parent_id: Optional[str], start: float):
+        self.name = name
+        self.category = category
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start = start
+        self.end = start
+        self.attributes: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end - self.start) * 1000
+
+
+class Trace:
+    def __init__(self, correlation_id: str):
+        self.correlation_id = correlation_id
+        self.trace_id = secrets.token_hex(16)
+        self.root_span_id = secrets.token_hex(8)
+        # perf_counter for durations, wall clock to anchor the OTLP timestamps
+        self.start = time.perf_counter()
+        self.start_wall_ns = time.time_ns()
+        self.spans: List[Span] = []
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Total duration and span count per category"""
+        result: Dict[str, Dict[str, float]] = {}
+        for s in list(self.spans):
+            entry = result.setdefault(s.category, {"dur": 0.0, "count": 0})
+            entry["dur"] += s.duration_ms
+            entry["count"] += 1
+        return result
+
+    def server_timing(self) -> str:
+        parts = [
+            f'{category};dur={entry["dur"]:.1f};desc="{int(entry["count"])} spans"'
+            for category, entry in self.summary().items()
+        ]
+        parts.append(f"app;dur={(time.perf_counter() - self.start) * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span_id: ContextVar[Optional[str]] = ContextVar("current_span_id", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def correlation_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.correlation_id if trace else None
+
+
+@contextmanager
+def span(name: str, category: Optional[str] = None, **attributes):
+    """Record a span in the current trace (no-op outside a request)"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    s = Span(name, category or name.split(".")[0], _current_span_id.get() or trace.root_span_id, time.perf_counter())
+    s.attributes.update(attributes)
+    token = _current_span_id.set(s.span_id)
+    try:
+        yield s
+    except Exception as e:
+        s.error = type(e).__name__
+        raise
+    finally:
+        _current_span_id.reset(token)
+        s.end = time.perf_counter()
+        trace.spans.append(s)
+
+
+def traced(name: str, category: Optional[str] = None):
+    """Decorator version of span() for sync and async functions"""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _current_trace.get() is None:
+                    return await func(*args, **kwargs)
+                with span(name, category):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return func(*args, **kwargs)
+            with span(name, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class MongoCommandTracer(monitoring.CommandListener):
+    """Turns pymongo command events into 'db' spans of the current trace"""
+
+    def started(self, event):
+        pass
+
+    def _record(self, event, error: Optional[str] = None):
+        trace = _current_trace.get()
+        if trace is None:
+            return
+        end = time.perf_counter()
+        s = Span(f"mongo.{event.command_name}", "db", _current_span_id.get() or trace.root_span_id, end - event.duration_micros / 1e6)
+        s.end = end
+        s.attributes["db.operation"] = event.command_name
+        s.error = error
+        trace.spans.append(s)
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        self._record(event, error=str(event.failure.get("codeName", "error")) if isinstance(event.failure, dict) else "error")
+
+
+# === Export ===
+
+class OTLPFileExporter:
+    """Appends one OTLP/JSON ExportTraceServiceRequest per line"""
+
+    def __init__(self, path: str, service_name: str = "nutri-backend"):
+        self.path = path
+        self.service_name = service_name
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _to_ns(self, trace: Trace, perf: float) -> str:
+        return str(trace.start_wall_ns + int((perf - trace.start) * 1e9))
+
+    def _attributes(self, attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+        result = []
+        for key, value in attributes.items():
+            if isinstance(value, bool):
+                result.append({"key": key, "value": {"boolValue": value}})
+            elif isinstance(value, int):
+                result.append({"key": key, "value": {"intValue": str(value)}})
+            elif isinstance(value, float):
+                result.append({"key": key, "value": {"doubleValue": value}})
+            else:
+                result.append({"key": key, "value": {"stringValue": str(value)}})
+        return result
+
+    def build(self, trace: Trace, name: str, end: float, attributes: Dict[str, Any]) -> Dict[str, Any]:
+        root = {
+            "traceId": trace.trace_id,
+            "spanId": trace.root_span_id,
+            "name": name,
+            "kind": 2,  # SERVER
+            "startTimeUnixNano": str(trace.start_wall_ns),
+            "endTimeUnixNano": self._to_ns(trace, end),
+            "attributes": self._attributes({"correlation_id": trace.correlation_id, **attributes}),
+        }
+        spans = [root]
+        for s in list(trace.spans):
+            item = {
+                "traceId": trace.trace_id,
+                "spanId": s.span_id,
+                "parentSpanId": s.parent_id,
+                "name": s.name,
+                "kind": 3 if s.category in ("db", "smtp") else 1,  # CLIENT / INTERNAL
+                "startTimeUnixNano": self._to_ns(trace, s.start),
+                "endTimeUnixNano": self._to_ns(trace, s.end),
+                "attributes": self._attributes(s.attributes),
+            }
+            if s.error:
+                item["status"] = {"code": 2, "message": s.error}
+            spans.append(item)
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": self._attributes({"service.name": self.service_name})},
+                "scopeSpans": [{"scope": {"name": "app.tracing"}, "spans": spans}],
+            }]
+        }
+
+    def write(self, payload: Dict[str, Any]) -> None:
+        line = json.dumps(payload, separators=(",", ":"))
+        with self._lock, open(self.path, "a") as f:
+            f.write(line + "\n")
+
+
+# === Middleware ===
+
+class TracingMiddleware:
+    """
+    Pure ASGI middleware: opens the trace, adds Server-Timing and
+    X-Request-ID to the response and emits the structured log/export.
+    """
+
+    def __init__(self, app, exporter: Optional[OTLPFileExporter] = None, exclude_paths=("/metrics",)):
+        self.app = app
+        self.exporter = exporter
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for key, value in scope.get("headers", []):
+            if key == REQUEST_ID_HEADER.encode():
+                request_id = value.decode("latin-1")[:128]
+                break
+        trace = Trace(request_id or secrets.token_hex(16))
+        token = _current_trace.set(trace)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                headers.append((REQUEST_ID_HEADER.encode(), trace.correlation_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_trace.reset(token)
+            end = time.perf_counter()
+            route = getattr(scope.get("route"), "path", None) or scope["path"]
+            self._log(trace, scope["method"], route, status_code, end)
+            if self.exporter:
+                payload = self.exporter.build(trace, f"{scope['method']} {route}", end, {
+                    "http.method": scope["method"],
+                    "http.route": route,
+                    "http.status_code": status_code,
+                })
+                asyncio.get_running_loop().run_in_executor(None, self.exporter.write, payload)
+
+    def _log(self, trace: Trace, method: str, route: str, status_code: int, end: float) -> None:
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        logger.info(json.dumps({
+            "event": "request",
+            "correlation_id": trace.correlation_id,
+            "trace_id": trace.trace_id,
+            "method": method,
+            "route": route,
+            "status": status_code,
+            "duration_ms": round((end - trace.start) * 1000, 2),
+            "spans": {k: {"dur_ms": round(v["dur"], 2), "count": int(v["count"])} for k, v in trace.summary().items()},
+        }, ensure_ascii=False))
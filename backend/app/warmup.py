@@ -0,0 +1,86 @@
+"""
+Startup warm-up.
+
+``preload()`` runs once in the gunicorn master (preload_app): it imports
+the rule tables, report generator and PDF stack and renders one throwaway
+PDF, so that module state (LIMITES_CATEGORIA, MENSAGENS_FIGO, reportlab
+fonts and style sheets) is built before fork and shared copy-on-write by
+the workers.
+
+``warm_up()`` runs in every worker's lifespan before it starts accepting
+requests: Mongo pool ping, index check and one PDF render on the PDF
+executor. Each step is bounded by WARMUP_STEP_TIMEOUT_SECONDS and a
+failing step is logged, not fatal; the per-step report is kept in
+``warmup_report``.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_PDF = {
+    "patient": {
+        "name": "Aquecimento",
+        "age": "30",
+        "height": 1.65,
+        "gestationalWeek": "20",
+        "trimester": "Segundo Trimestre",
+        "imc": 22.0,
+        "imcClassification": "Eutrofia",
+        "preGestationalWeight": 60.0,
+        "currentWeight": 64.0,
+        "weightGain": 4.0,
+        "evaluationDate": "01/01/2026",
+    },
+    "figo": {"status": "adequate", "statusMessage": "Ganho adequado", "expectedMin": 0.7, "expectedMax": 3.5},
+    "patientGuidelines": [
+        {"id": "fruits_vegetables", "title": "Frutas e Vegetais", "message": "-", "type": "recommendation", "audience": "both"},
+    ],
+    "professionalAlerts": [
+        {"id": "iron_supplement", "title": "Ferro", "message": "-", "type": "alert", "audience": "both"},
+    ],
+}
+
+warmup_report: Dict[str, Any] = {"done": False, "steps": {}}
+
+
+def render_sample_pdf() -> int:
+    from app.services.pdf_service import PDFService
+    return len(PDFService().generate_pdf(SAMPLE_PDF).getvalue())
+
+
+def preload() -> None:
+    """Build import-time state in the master process, before fork"""
+    from app.services import calculos_service, relatorio_service  # noqa: F401
+    started = time.perf_counter()
+    render_sample_pdf()
+    logger.info("Preload finished in %.0f ms", (time.perf_counter() - started) * 1000)
+
+
+async def _step(name: str, coro) -> None:
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(coro, timeout=settings.WARMUP_STEP_TIMEOUT_SECONDS)
+        result: Dict[str, Any] = {"ok": True}
+    except Exception as e:
+        result = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        logger.warning("Warm-up step %s failed: %s", name, result["error"])
+    result["ms"] = round((time.perf_counter() - started) * 1000, 1)
+    warmup_report["steps"][name] = result
+
+
+async def warm_up(db, indexes_task: Optional[asyncio.Task] = None, pdf_executor=None) -> Dict[str, Any]:
+    """Run the warm-up steps in order and return the report"""
+    await _step("mongo_ping", db.command("ping"))
+    if indexes_task is not None:
+        # shield: a slow index build keeps running in background after the timeout
+        await _step("indexes", asyncio.shield(indexes_task))
+    loop = asyncio.get_running_loop()
+    await _step("pdf_render", loop.run_in_executor(pdf_executor, render_sample_pdf))
+    warmup_report["done"] = True
+    logger.info("Warm-up finished: %s", warmup_report["steps"])
+    return warmup_report
@@ -0,0 +1,107 @@
+"""
+Configuração do gunicorn para produção
+
+    cd backend
+    gunicorn -c gunicorn.conf.py app.main:app
+
+- Workers uvicorn: quantidade definida pelos núcleos e pela memória
+  disponíveis (limites do cgroup quando existirem), ou WEB_CONCURRENCY.
+  Com PDF_EXECUTOR=process cada worker tem ainda PDF_WORKERS processos de
+  PDF e um forkserver, contados no orçamento de memória
+- Com mais de um worker, CACHE_BACKEND=redis e PDF_JOB_STORE=mongo são
+  obrigatórios: com algum backend em memória o cálculo automático usa um
+  worker só (com aviso no log), e um WEB_CONCURRENCY maior que 1 é recusado
+- preload_app: o app é importado uma vez no master; tabelas de regras,
+  estilos e fontes do reportlab são montados antes do fork (app.warmup) e
+  compartilhados copy-on-write. Os processos de PDF saem do forkserver de
+  cada worker, um processo limpo: importam o reportlab de novo e não
+  compartilham essas páginas
+- Cada worker executa o aquecimento (ping no Mongo, índices, PDF
+  descartável) no lifespan antes de aceitar requisições
+"""
+import gc
+import os
+
+from app.config import check_workers, in_memory_backends, settings
+
+
+def _cpus() -> int:
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    # Cota de CPU do container (cgroup v2: "max 100000" ou "200000 100000")
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def _memory_mb() -> int:
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+            if value != "max" and int(value) < 1 << 60:
+                return int(value) // (1024 * 1024)
+        except (OSError, ValueError):
+            continue
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def worker_memory_mb() -> int:
+    """Memória reservada por worker, incluindo o pool de PDF em processos"""
+    memory = settings.WORKER_MEMORY_MB
+    if settings.PDF_EXECUTOR == "process":
+        memory += (settings.PDF_WORKERS + 1) * settings.PDF_PROCESS_MEMORY_MB
+    return memory
+
+
+def worker_count() -> int:
+    if settings.WEB_CONCURRENCY > 0:
+        return settings.WEB_CONCURRENCY
+    if in_memory_backends():
+        # Estado em memória não é compartilhado entre workers
+        return 1
+    by_cpu = 2 * _cpus() + 1
+    memory = _memory_mb()
+    by_memory = memory // worker_memory_mb() if memory else by_cpu
+    return max(1, min(by_cpu, by_memory))
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = worker_count()
+# Cache e jobs de PDF em memória ficariam divergentes entre os workers
+check_workers(workers)
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# Inclui o aquecimento do worker (cada etapa limitada por WARMUP_STEP_TIMEOUT_SECONDS)
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+accesslog = "-"
+
+
+def when_ready(server):
+    # Roda no master depois do import do app e antes de criar os workers
+    from app.warmup import preload
+    preload()
+    # Objetos do preload saem do GC: coletas nos workers não tocam essas
+    # páginas, que continuam compartilhadas
+    gc.freeze()
+    server.log.info("Workers: %s (cpus=%s, memória=%s MB, %s MB por worker)",
+                    workers, _cpus(), _memory_mb(), worker_memory_mb())
+    if not settings.WEB_CONCURRENCY and in_memory_backends():
+        server.log.warning("Um worker só por causa de %s; use CACHE_BACKEND=redis e "
+                           "PDF_JOB_STORE=mongo para escalar", ", ".join(in_memory_backends()))
@@ -1,13 +1,17 @@
 """
-Script para executar o servidor FastAPI
+Script para executar o servidor FastAPI em desenvolvimento
+
+Em produção use o gunicorn (vários workers, preload e aquecimento):
+    gunicorn -c gunicorn.conf.py app.main:app
 """
 import uvicorn
 
+from app.config import settings
+
 if __name__ == "__main__":
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True
+        reload=settings.ENVIRONMENT == "development"
     )
-
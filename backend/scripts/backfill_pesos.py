@@ -0,0 +1,128 @@
+"""
+Backfill da série de pesos - MongoDB
+====================================
+
+Preenche a coleção pesos (um bucket compacto por paciente) com as avaliações
+gravadas antes dela. Para cada paciente, só as avaliações que ainda não
+estão em nenhum bucket são acrescentadas, então o script é idempotente e
+pode rodar com a API no ar.
+
+Para executar localmente:
+    cd backend
+    python -m scripts.backfill_pesos [--lote 500] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from typing import Any, Dict, List
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+from app.services.pesos_service import COLECAO, TAMANHO_BUCKET, medida
+
+load_dotenv()
+
+MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
+DB_NAME = os.getenv("MONGODB_DB_NAME", "nutri_gestantes")
+
+PROJECAO = {
+    "paciente_id": 1,
+    "user_id": 1,
+    "data_avaliacao": 1,
+    "semana_gestacional": 1,
+    "peso_atual": 1,
+    "peso_pre_gestacional": 1,
+    "calculos.ganho_peso_atual": 1,
+}
+
+
+async def dono_da_paciente(db, paciente_id: str, donos: Dict[str, Any]):
+    if paciente_id not in donos:
+        paciente = None
+        if ObjectId.is_valid(paciente_id or ""):
+            paciente = await db.pacientes.find_one({"_id": ObjectId(paciente_id)}, {"user_id": 1})
+        donos[paciente_id] = paciente.get("user_id") if paciente else None
+    return donos[paciente_id]
+
+
+async def ja_registradas(db, paciente_id: str) -> set:
+    cursor = db[COLECAO].find({"paciente_id": paciente_id}, {"_id": 0, "medidas.a": 1})
+    return {m["a"] async for bucket in cursor for m in bucket.get("medidas", [])}
+
+
+async def gravar_paciente(db, paciente_id: str, user_id: str, avaliacoes: List[Dict[str, Any]], dry_run: bool) -> int:
+    existentes = await ja_registradas(db, paciente_id)
+    medidas = [medida(a) for a in avaliacoes if str(a["_id"]) not in existentes]
+    if not medidas or dry_run:
+        return len(medidas)
+    # Buckets completos de uma vez; o último fica aberto para as próximas avaliações
+    operacoes = []
+    for inicio in range(0, len(medidas), TAMANHO_BUCKET):
+        bloco = medidas[inicio:inicio + TAMANHO_BUCKET]
+        operacoes.append(UpdateOne(
+            {"paciente_id": paciente_id, "user_id": user_id, "n": {"$lte": TAMANHO_BUCKET - len(bloco)}},
+            {"$push": {"medidas": {"$each": bloco}}, "$inc": {"n": len(bloco)}},
+            upsert=True,
+        ))
+    await db[COLECAO].bulk_write(operacoes, ordered=True)
+    return len(medidas)
+
+
+async def run_backfill(tamanho_lote: int = 500, dry_run: bool = False):
+    print("=" * 50)
+    print("⚖️  BACKFILL DA SÉRIE DE PESOS" + (" (DRY-RUN)" if dry_run else ""))
+    print("=" * 50)
+
+    client = AsyncIOMotorClient(MONGODB_URL)
+    db = client[DB_NAME]
+    inicio = time.perf_counter()
+    try:
+        await client.admin.command('ping')
+        print("✅ Conectado ao MongoDB")
+
+        donos: Dict[str, Any] = {}
+        totais = {"pacientes": 0, "medidas": 0, "orfas": 0}
+
+        async def processar(paciente_id, avaliacoes):
+            user_id = await dono_da_paciente(db, paciente_id, donos)
+            if not user_id:
+                totais["orfas"] += len(avaliacoes)
+                return
+            totais["medidas"] += await gravar_paciente(db, paciente_id, user_id, avaliacoes, dry_run)
+            totais["pacientes"] += 1
+
+        atual, avaliacoes = None, []
+        # Ordenado por paciente: cada paciente é processada uma única vez
+        cursor = db.avaliacoes.find({}, PROJECAO).sort([("paciente_id", 1), ("data_avaliacao", 1)])
+        async for avaliacao in cursor.batch_size(tamanho_lote):
+            if avaliacao.get("paciente_id") != atual:
+                if avaliacoes:
+                    await processar(atual, avaliacoes)
+                atual, avaliacoes = avaliacao.get("paciente_id"), []
+            avaliacoes.append(avaliacao)
+        if avaliacoes:
+            await processar(atual, avaliacoes)
+
+        print(f"👩 Pacientes processadas: {totais['pacientes']}")
+        print(f"⚖️  Pesagens gravadas: {totais['medidas']}")
+        if totais["orfas"]:
+            print(f"⚠️  Avaliações órfãs ignoradas: {totais['orfas']}")
+        print(f"\n✅ Concluído em {time.perf_counter() - inicio:.1f}s")
+    except Exception as e:
+        print(f"\n❌ ERRO NO BACKFILL: {e}")
+        raise
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill da série de pesos por paciente")
+    parser.add_argument("--lote", type=int, default=500, help="Tamanho do lote de leitura do cursor")
+    parser.add_argument("--dry-run", action="store_true", help="Conta as pesagens sem gravar")
+    args = parser.parse_args()
+    asyncio.run(run_backfill(tamanho_lote=args.lote, dry_run=args.dry_run))
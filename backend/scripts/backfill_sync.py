@@ -0,0 +1,131 @@
+"""
+Backfill dos campos de sincronização - MongoDB
+==============================================
+
+Prepara documentos gravados antes do /api/sync:
+
+1. Avaliações sem `user_id` recebem o dono da paciente
+2. Pacientes e avaliações sem `seq` recebem números de sequência reservados
+   no contador do usuário (alteracoes_usuario), com `alterado_em` atual
+
+Depois disso uma sincronização completa (sem since) passa a incluir esses
+documentos. O script é idempotente: só toca documentos sem os campos.
+
+Para executar localmente:
+    cd backend
+    python -m scripts.backfill_sync [--lote 1000] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from typing import Dict
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+from app.services.alteracoes_service import marca, registrar_alteracao
+
+load_dotenv()
+
+MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
+DB_NAME = os.getenv("MONGODB_DB_NAME", "nutri_gestantes")
+
+
+async def preencher_user_id(db, tamanho_lote: int, dry_run: bool) -> int:
+    """Copia o user_id da paciente para as avaliações antigas"""
+    total = 0
+    lote = []
+    donos: Dict[str, str] = {}
+    cursor = db.avaliacoes.find({"user_id": {"$exists": False}}, {"paciente_id": 1})
+    async for avaliacao in cursor:
+        paciente_id = avaliacao.get("paciente_id")
+        if paciente_id not in donos and ObjectId.is_valid(paciente_id or ""):
+            paciente = await db.pacientes.find_one({"_id": ObjectId(paciente_id)}, {"user_id": 1})
+            donos[paciente_id] = paciente.get("user_id") if paciente else None
+        user_id = donos.get(paciente_id)
+        if not user_id:
+            continue  # órfã: tratada pela limpeza de órfãs, não pela sincronização
+        lote.append(UpdateOne({"_id": avaliacao["_id"]}, {"$set": {"user_id": user_id}}))
+        if len(lote) >= tamanho_lote:
+            total += await _gravar(db.avaliacoes, lote, dry_run)
+            lote = []
+    total += await _gravar(db.avaliacoes, lote, dry_run)
+    return total
+
+
+async def preencher_seq(db, colecao: str, tamanho_lote: int, dry_run: bool) -> int:
+    """Reserva seqs no contador de cada usuário para documentos sem seq"""
+    total = 0
+    user_ids = await db[colecao].distinct("user_id", {"seq": {"$exists": False}})
+    for user_id in user_ids:
+        if not user_id:
+            continue
+        cursor = db[colecao].find({"user_id": user_id, "seq": {"$exists": False}}, {"_id": 1}).sort("_id", 1)
+        ids = []
+        async for doc in cursor:
+            ids.append(doc["_id"])
+            if len(ids) >= tamanho_lote:
+                total += await _numerar(db, colecao, user_id, ids, dry_run)
+                ids = []
+        total += await _numerar(db, colecao, user_id, ids, dry_run)
+    return total
+
+
+async def _numerar(db, colecao: str, user_id: str, ids, dry_run: bool) -> int:
+    if not ids:
+        return 0
+    if dry_run:
+        return len(ids)
+    ultimo = await registrar_alteracao(db, user_id, len(ids))
+    operacoes = [
+        UpdateOne({"_id": _id, "seq": {"$exists": False}}, {"$set": marca(seq)})
+        for seq, _id in enumerate(ids, start=ultimo - len(ids) + 1)
+    ]
+    return await _gravar(db[colecao], operacoes, dry_run)
+
+
+async def _gravar(collection, operacoes, dry_run: bool) -> int:
+    if not operacoes:
+        return 0
+    if dry_run:
+        return len(operacoes)
+    result = await collection.bulk_write(operacoes, ordered=False)
+    return result.modified_count
+
+
+async def run_backfill(tamanho_lote: int = 1000, dry_run: bool = False):
+    print("=" * 50)
+    print("🔄 BACKFILL DA SINCRONIZAÇÃO" + (" (DRY-RUN)" if dry_run else ""))
+    print("=" * 50)
+
+    client = AsyncIOMotorClient(MONGODB_URL)
+    db = client[DB_NAME]
+    inicio = time.perf_counter()
+    try:
+        await client.admin.command('ping')
+        print("✅ Conectado ao MongoDB")
+
+        n = await preencher_user_id(db, tamanho_lote, dry_run)
+        print(f"👤 Avaliações com user_id preenchido: {n}")
+        for colecao in ("pacientes", "avaliacoes"):
+            n = await preencher_seq(db, colecao, tamanho_lote, dry_run)
+            print(f"🔢 {colecao} numeradas: {n}")
+
+        print(f"\n✅ Concluído em {time.perf_counter() - inicio:.1f}s")
+    except Exception as e:
+        print(f"\n❌ ERRO NO BACKFILL: {e}")
+        raise
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill dos campos de sincronização")
+    parser.add_argument("--lote", type=int, default=1000, help="Documentos por bulk_write")
+    parser.add_argument("--dry-run", action="store_true", help="Conta os documentos sem gravar")
+    args = parser.parse_args()
+    asyncio.run(run_backfill(tamanho_lote=args.lote, dry_run=args.dry_run))
@@ -0,0 +1,113 @@
+"""
+Benchmark da ingestão de avaliações em lote
+===========================================
+
+Mede linhas/segundo do caminho de preparação do lote (validação, cálculos
+vetorizados, relatórios via cache compartilhado e montagem dos documentos)
+para 10k e 100k avaliações, comparando com o caminho individual usado por
+criar_avaliacao. As respostas são sorteadas de um conjunto de perfis
+(--perfis), como acontece em históricos reais; com --perfis 0 cada
+avaliação tem respostas aleatórias (pior caso para o cache).
+
+Para executar:
+    cd backend
+    python -m scripts.benchmark_avaliacoes_lote
+"""
+
+import argparse
+import random
+import time
+
+from bson import ObjectId
+
+from app.models.schemas import AvaliacaoLoteItem, CalculosResponse, RelatorioResponse, RespostasChecklist
+from app.services.avaliacao_lote_service import TAMANHO_INSERCAO, preparar_lote
+from app.services.calculos_service import (
+    calcular_ganho_peso,
+    calcular_imc,
+    classificar_imc,
+    determinar_trimestre,
+    obter_recomendacao_ganho_peso,
+)
+from app.services.relatorio_service import cache_relatorios, gerar_relatorio_completo
+
+OPCOES = ["Sim", "Não", "Não sei"]
+CAMPOS_SIM_NAO = [
+    "fruits_vegetables", "dairy_products", "whole_grains", "meat_poultry_eggs",
+    "folic_acid_supplement", "iron_supplement", "physical_activity", "substances_use",
+]
+
+
+def _gerar(linhas: int, n_pacientes: int, n_perfis: int, seed: int = 42):
+    rnd = random.Random(seed)
+    perfis = [{campo: rnd.choice(OPCOES) for campo in CAMPOS_SIM_NAO} for _ in range(n_perfis)]
+
+    def respostas():
+        if perfis:
+            return dict(rnd.choice(perfis))
+        return {campo: rnd.choice(OPCOES) for campo in CAMPOS_SIM_NAO}
+
+    pacientes = {
+        str(ObjectId()): {"peso_pre_gestacional": rnd.randint(45, 110), "altura": rnd.choice([1.52, 1.60, 1.65, 1.72])}
+        for _ in range(n_pacientes)
+    }
+    ids = list(pacientes)
+    itens = [
+        AvaliacaoLoteItem(
+            paciente_id=rnd.choice(ids),
+            semana_gestacional=rnd.randint(4, 40),
+            peso_atual=round(rnd.uniform(45, 120), 1),
+            respostas=respostas(),
+        )
+        for _ in range(linhas)
+    ]
+    return itens, pacientes
+
+
+def _individual(itens, pacientes):
+    """Caminho equivalente ao de criar_avaliacao, item a item"""
+    for item in itens:
+        paciente = pacientes[item.paciente_id]
+        peso_pre, altura = paciente["peso_pre_gestacional"], paciente["altura"]
+        imc = calcular_imc(peso_pre, altura)
+        classe = classificar_imc(imc)
+        ganho = calcular_ganho_peso(item.peso_atual, peso_pre)
+        CalculosResponse(
+            imc_pre_gestacional=imc,
+            imc_classification=classe,
+            peso_atual=item.peso_atual,
+            ganho_peso_atual=ganho,
+            trimestre=determinar_trimestre(item.semana_gestacional),
+            weight_gain_recommendation=obter_recomendacao_ganho_peso(imc, item.semana_gestacional, ganho),
+        ).model_dump()
+        RelatorioResponse(**gerar_relatorio_completo(item.respostas, classe, item.semana_gestacional)).model_dump()
+        RespostasChecklist(**item.respostas).model_dump()
+
+
+def _medir(nome, funcao, linhas):
+    inicio = time.perf_counter()
+    funcao()
+    duracao = time.perf_counter() - inicio
+    print(f"   {nome:<12} {duracao:7.2f}s | {linhas / duracao:>10,.0f} linhas/s")
+
+
+def main(tamanhos, n_pacientes, n_perfis):
+    for linhas in tamanhos:
+        itens, pacientes = _gerar(linhas, n_pacientes, n_perfis)
+        print(f"📊 {linhas:,} avaliações ({n_pacientes} pacientes, {n_perfis or 'sem'} perfis de resposta)")
+        _medir("individual", lambda: _individual(itens, pacientes), linhas)
+        hits = cache_relatorios.hits
+        _medir("lote", lambda: preparar_lote(itens, pacientes), linhas)
+        taxa = (cache_relatorios.hits - hits) / linhas
+        print(f"   cache de relatórios: {taxa:.0%} de acertos")
+        # Idas ao banco: individual = 4 por avaliação; lote = 1 $in + insert_many em blocos + 1 bulk_write
+        print(f"   idas ao banco: individual {4 * linhas:,} | lote {2 + -(-linhas // TAMANHO_INSERCAO):,}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--pacientes", type=int, default=500)
+    parser.add_argument("--perfis", type=int, default=200)
+    args = parser.parse_args()
+    main(args.tamanhos, args.pacientes, args.perfis)
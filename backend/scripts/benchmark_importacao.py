@@ -0,0 +1,112 @@
+"""
+Benchmark da importação em massa de pacientes
+=============================================
+
+Gera um arquivo sintético (CSV ou NDJSON), envia para o serviço de
+importação como stream em blocos de 64 KB e mede linhas/segundo e pico de
+memória alocada (com --memoria; o tracemalloc deixa a execução mais lenta).
+
+Sem MONGODB_URL o benchmark mede apenas parsing + validação (dry-run).
+Com MONGODB_URL as linhas são gravadas em uma base temporária que é
+removida ao final.
+
+Para executar:
+    cd backend
+    python -m scripts.benchmark_importacao --linhas 100000 --formato csv
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import time
+import tracemalloc
+
+from app.services.importacao_service import (
+    FORMATO_CSV,
+    FORMATO_NDJSON,
+    importar_pacientes,
+)
+
+CAMPOS = ["nome", "email", "data_nascimento", "altura", "peso_pre_gestacional", "dum"]
+TAMANHO_BLOCO = 64 * 1024
+
+
+def _linha(i: int) -> dict:
+    return {
+        "nome": f"Paciente Benchmark {i:07d}",
+        "email": f"paciente{i}@example.com",
+        "data_nascimento": "1994-05-17",
+        "altura": f"{1.50 + (i % 30) / 100:.2f}",
+        "peso_pre_gestacional": f"{55 + (i % 40)}",
+        "dum": "2026-03-01",
+    }
+
+
+async def _stream(linhas: int, formato: str):
+    """Produz o arquivo em blocos, sem materializá-lo inteiro na memória"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CAMPOS)
+    if formato == FORMATO_CSV:
+        writer.writeheader()
+    for i in range(linhas):
+        if formato == FORMATO_CSV:
+            writer.writerow(_linha(i))
+        else:
+            buffer.write(json.dumps(_linha(i)) + "\n")
+        if buffer.tell() >= TAMANHO_BLOCO:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def main(linhas: int, formato: str, tamanho_lote: int, memoria: bool):
+    client = None
+    db = None
+    mongodb_url = os.getenv("MONGODB_URL")
+    if mongodb_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(mongodb_url)
+        db = client["nutri_benchmark_importacao"]
+
+    if memoria:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    try:
+        relatorio = await importar_pacientes(
+            _stream(linhas, formato),
+            formato,
+            db,
+            user_id="benchmark",
+            dry_run=db is None,
+            tamanho_lote=tamanho_lote,
+        )
+        duracao = time.perf_counter() - inicio
+        pico = tracemalloc.get_traced_memory()[1] if memoria else None
+    finally:
+        if memoria:
+            tracemalloc.stop()
+        if client:
+            await client.drop_database("nutri_benchmark_importacao")
+            client.close()
+
+    modo = "com gravação" if db is not None else "dry-run"
+    print(f"📦 {linhas} linhas {formato} ({modo}, lote={tamanho_lote})")
+    print(f"   Inseridos: {relatorio.inseridos} | Inválidos: {relatorio.invalidos} | Duplicados: {relatorio.duplicados}")
+    print(f"   Tempo: {duracao:.2f}s | {linhas / duracao:,.0f} linhas/s")
+    if pico is not None:
+        print(f"   Pico de memória alocada: {pico / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=100_000)
+    parser.add_argument("--formato", choices=[FORMATO_CSV, FORMATO_NDJSON], default=FORMATO_CSV)
+    parser.add_argument("--lote", type=int, default=1000)
+    parser.add_argument("--memoria", action="store_true", help="Mede o pico de memória com tracemalloc")
+    args = parser.parse_args()
+    asyncio.run(main(args.linhas, args.formato, args.lote, args.memoria))
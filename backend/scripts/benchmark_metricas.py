@@ -0,0 +1,70 @@
+"""
+Benchmark do custo do MetricsMiddleware
+=======================================
+
+Chama uma aplicação ASGI mínima N vezes com e sem o middleware de métricas
+e reporta o custo adicional por requisição. Sai com código 1 se o custo
+passar do limite (padrão: 50 µs).
+
+Para executar:
+    cd backend
+    python -m scripts.benchmark_metricas [--requisicoes 200000] [--limite-us 50]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+from app.metrics import MetricsMiddleware
+
+
+class _Rota:
+    path = "/api/pacientes/{paciente_id}"
+
+
+async def _app(scope, receive, send):
+    scope["route"] = _Rota  # como o roteador do FastAPI faz
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b'{"ok":true}'})
+
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def _send(message):
+    pass
+
+
+async def _medir(app, requisicoes: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(requisicoes):
+        scope = {"type": "http", "method": "GET", "path": "/api/pacientes/123"}
+        await app(scope, _receive, _send)
+    return (time.perf_counter() - inicio) / requisicoes
+
+
+async def main(requisicoes: int, limite_us: float) -> int:
+    middleware = MetricsMiddleware(_app)
+    # Aquecimento
+    await _medir(_app, 1000)
+    await _medir(middleware, 1000)
+
+    base = min([await _medir(_app, requisicoes) for _ in range(3)])
+    com_metricas = min([await _medir(middleware, requisicoes) for _ in range(3)])
+    custo_us = (com_metricas - base) * 1e6
+
+    print(f"📈 {requisicoes:,} requisições")
+    print(f"   sem middleware: {base * 1e6:6.2f} µs/req")
+    print(f"   com middleware: {com_metricas * 1e6:6.2f} µs/req")
+    print(f"   custo adicional: {custo_us:6.2f} µs/req (limite {limite_us} µs)")
+    return 0 if custo_us <= limite_us else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requisicoes", type=int, default=200_000)
+    parser.add_argument("--limite-us", type=float, default=50.0)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.requisicoes, args.limite_us)))
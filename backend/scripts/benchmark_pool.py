@@ -0,0 +1,160 @@
+"""
+Benchmark do pool de conexões do Motor
+======================================
+
+Mede a vazão (operações/s) e a latência de leituras concorrentes para cada
+tamanho de pool em --pools, com --concorrencia tarefas fazendo a mesma
+consulta da lista de pacientes (find por user_id, ordenado por created_at).
+Para cada tamanho reporta:
+
+1. Operações/s, p50 e p99
+2. Espera média por conexão (checkout) e conexões abertas, vindas dos
+   eventos de pool do pymongo (o mesmo monitor do /metrics)
+
+e sugere o menor pool que alcança 90% da melhor vazão.
+
+Sem --url usa o Mongo falso de scripts/injetar_latencia.py com --latencia-ms
+por comando (simula a ida e volta na rede). O Motor executa cada operação
+num thread do próprio executor (MOTOR_MAX_WORKERS, padrão 5 por núcleo):
+este script o dimensiona para o maior pool testado, para que o pool seja o
+limite medido.
+
+Sai com código 1 se alguma operação falhar.
+
+Para executar:
+    cd backend
+    python -m scripts.benchmark_pool [--pools 1,2,4,8,16] [--concorrencia 32] [--duracao 5]
+    python -m scripts.benchmark_pool --url mongodb://localhost:27017 [--compressores zstd]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from typing import Dict, List
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--url", default="", help="MongoDB real; vazio = Mongo falso em processo")
+parser.add_argument("--banco", default="nutri_benchmark")
+parser.add_argument("--pools", default="1,2,4,8,16")
+parser.add_argument("--concorrencia", type=int, default=32)
+parser.add_argument("--duracao", type=float, default=5.0)
+parser.add_argument("--latencia-ms", type=float, default=2.0, help="latência por comando do Mongo falso")
+parser.add_argument("--compressores", default="", help='ex.: "zstd,snappy"')
+args = parser.parse_args()
+
+pools = [int(p) for p in args.pools.split(",")]
+# Lido pelo Motor no import
+os.environ.setdefault("MOTOR_MAX_WORKERS", str(max(pools)))
+os.environ.setdefault("MONGODB_URL", args.url or "mongodb://localhost:27017")
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+from pymongo import DESCENDING  # noqa: E402
+
+from app.database import MongoPoolMonitor  # noqa: E402
+from scripts.injetar_latencia import MongoFalso  # noqa: E402
+
+USUARIO = "benchmark"
+
+
+def percentil(valores: List[float], p: float) -> float:
+    if not valores:
+        return float("nan")
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def iniciar_mongo_falso() -> str:
+    """Mongo falso num event loop próprio, fora do loop medido"""
+    mongo = MongoFalso()
+    mongo.latencia = args.latencia_ms / 1000
+    pronto = threading.Event()
+    porta = []
+
+    def executar():
+        loop = asyncio.new_event_loop()
+        porta.append(loop.run_until_complete(mongo.iniciar()))
+        pronto.set()
+        loop.run_forever()
+
+    threading.Thread(target=executar, daemon=True).start()
+    pronto.wait()
+    return f"mongodb://127.0.0.1:{porta[0]}/?directConnection=true"
+
+
+async def medir(url: str, tamanho: int) -> Dict[str, float]:
+    monitor = MongoPoolMonitor()
+    opcoes = {"compressors": args.compressores} if args.compressores else {}
+    cliente = AsyncIOMotorClient(url, maxPoolSize=tamanho, event_listeners=[monitor], **opcoes)
+    colecao = cliente[args.banco].pacientes
+    latencias: List[float] = []
+    erros = 0
+    antes: Dict[str, tuple] = {}
+
+    async def consultar():
+        cursor = colecao.find({"user_id": USUARIO}).sort("created_at", DESCENDING).limit(20)
+        return await cursor.to_list(length=20)
+
+    async def trabalhador(fim: float):
+        nonlocal erros
+        while time.perf_counter() < fim:
+            inicio = time.perf_counter()
+            try:
+                await consultar()
+            except Exception as e:
+                erros += 1
+                print(f"   ⚠️  {type(e).__name__}: {e}")
+                await asyncio.sleep(0.1)
+                continue
+            latencias.append((time.perf_counter() - inicio) * 1000)
+
+    try:
+        # Aquecimento: abre as conexões antes de medir
+        await asyncio.gather(*(trabalhador(time.perf_counter() + 0.5) for _ in range(args.concorrencia)))
+        latencias.clear()
+        antes = {endereco: (p.checkouts, p.checkout_wait_seconds) for endereco, p in monitor.pools.items()}
+        await asyncio.gather(*(trabalhador(time.perf_counter() + args.duracao) for _ in range(args.concorrencia)))
+    finally:
+        checkouts = sum(p.checkouts - antes.get(e, (0, 0.0))[0] for e, p in monitor.pools.items())
+        espera = sum(p.checkout_wait_seconds - antes.get(e, (0, 0.0))[1] for e, p in monitor.pools.items())
+        abertas = sum(p.open for p in monitor.pools.values())
+        cliente.close()
+    return {
+        "ops": len(latencias) / args.duracao,
+        "p50": percentil(latencias, 50),
+        "p99": percentil(latencias, 99),
+        "espera_ms": espera / checkouts * 1000 if checkouts else 0.0,
+        "abertas": abertas,
+        "erros": erros,
+    }
+
+
+async def main() -> int:
+    print("=" * 50)
+    print("🔌 BENCHMARK DO POOL DE CONEXÕES (Motor)")
+    print("=" * 50)
+    url = args.url or iniciar_mongo_falso()
+    origem = args.url or f"Mongo falso, {args.latencia_ms:.1f} ms por comando"
+    print(f"   {origem} | {args.concorrencia} tarefas | {args.duracao:.0f}s por pool | "
+          f"MOTOR_MAX_WORKERS={os.environ['MOTOR_MAX_WORKERS']}")
+
+    resultados = {}
+    print(f"\n{'pool':>6} {'ops/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'espera ms':>10} {'abertas':>8}")
+    for tamanho in pools:
+        r = resultados[tamanho] = await medir(url, tamanho)
+        print(f"{tamanho:>6} {r['ops']:>9.0f} {r['p50']:>8.1f} {r['p99']:>8.1f} {r['espera_ms']:>10.1f} {r['abertas']:>8}")
+
+    melhor = max(r["ops"] for r in resultados.values())
+    sugerido = min(t for t, r in resultados.items() if r["ops"] >= 0.9 * melhor)
+    print(f"\n💡 Menor pool com 90% da melhor vazão ({melhor:.0f} ops/s): {sugerido} "
+          f"(MONGO_MAX_POOL_SIZE, por worker)")
+
+    erros = sum(r["erros"] for r in resultados.values())
+    print("✅ Sem erros" if not erros else f"❌ {erros} operações falharam")
+    return 0 if not erros else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
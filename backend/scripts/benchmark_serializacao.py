@@ -0,0 +1,159 @@
+"""
+Benchmark da serialização de listas e detalhes
+==============================================
+
+Compara, por página, o caminho padrão do FastAPI (validação contra o
+response_model + serialização) com o caminho rápido de app.fast_json
+(projeção dos documentos confiáveis + orjson/pydantic-core) e, se o pacote
+msgpack estiver instalado, com a resposta MessagePack.
+
+Os documentos são montados no mesmo formato gravado por criar_avaliacao,
+com relatórios reais gerados a partir de respostas aleatórias.
+
+Para executar:
+    cd backend
+    python -m scripts.benchmark_serializacao [--paginas 20 100] [--repeticoes 200]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app import fast_json
+from app.fast_json import TrustedSerializer
+from app.models.schemas import AvaliacaoResponse, PacienteResponse, RelatorioResponse, RespostasChecklist
+from app.services.calculos_service import (
+    calcular_ganho_peso,
+    calcular_imc,
+    classificar_imc,
+    determinar_trimestre,
+    obter_recomendacao_ganho_peso,
+)
+from app.services.relatorio_service import gerar_relatorio_completo
+
+OPCOES = ["Sim", "Não", "Não sei"]
+CAMPOS_SIM_NAO = [
+    "fruits_vegetables", "dairy_products", "whole_grains", "meat_poultry_eggs",
+    "folic_acid_supplement", "iron_supplement", "physical_activity", "substances_use",
+]
+
+
+def _pacientes(n: int, rnd: random.Random) -> List[dict]:
+    agora = datetime.utcnow()
+    return [
+        {
+            "id": str(ObjectId()),
+            "user_id": str(ObjectId()),
+            "nome": f"Paciente {i}",
+            "email": f"paciente{i}@exemplo.com",
+            "data_nascimento": "1992-05-10",
+            "idade": rnd.randint(18, 42),
+            "altura": rnd.choice([1.52, 1.60, 1.65, 1.72]),
+            "contato": "(11) 99999-0000",
+            "peso_pre_gestacional": rnd.randint(45, 110),
+            "dum": "2024-01-15",
+            "created_at": agora - timedelta(days=i),
+            "schema_version": 1,
+            "total_avaliacoes": rnd.randint(0, 12),
+        }
+        for i in range(n)
+    ]
+
+
+def _avaliacoes(n: int, rnd: random.Random) -> List[dict]:
+    docs = []
+    for i in range(n):
+        peso_pre, altura = rnd.randint(45, 110), rnd.choice([1.52, 1.60, 1.65, 1.72])
+        semana, peso_atual = rnd.randint(4, 40), round(rnd.uniform(45, 120), 1)
+        respostas = {campo: rnd.choice(OPCOES) for campo in CAMPOS_SIM_NAO}
+        imc = calcular_imc(peso_pre, altura)
+        classe = classificar_imc(imc)
+        ganho = calcular_ganho_peso(peso_atual, peso_pre)
+        docs.append({
+            "id": str(ObjectId()),
+            "paciente_id": str(ObjectId()),
+            "semana_gestacional": semana,
+            "peso_atual": peso_atual,
+            "peso_pre_gestacional": peso_pre,
+            "respostas_checklist": RespostasChecklist(**respostas).model_dump(),
+            "observacoes": None,
+            "data_avaliacao": datetime.utcnow() - timedelta(days=i),
+            "calculos": {
+                "imc_pre_gestacional": imc,
+                "imc_classification": classe,
+                "peso_atual": peso_atual,
+                "ganho_peso_atual": ganho,
+                "trimestre": determinar_trimestre(semana),
+                "weight_gain_recommendation": obter_recomendacao_ganho_peso(imc, semana, ganho),
+            },
+            "relatorio": RelatorioResponse(**gerar_relatorio_completo(respostas, classe, semana)).model_dump(),
+            "schema_version": 1,
+        })
+    return docs
+
+
+def _medir(func, repeticoes: int) -> float:
+    func()
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        func()
+    return (time.perf_counter() - inicio) / repeticoes * 1000
+
+
+def _comparar(nome: str, model, docs: List[dict], repeticoes: int, loop) -> None:
+    campo = create_model_field("response", List[model], mode="serialization")
+    serializer = TrustedSerializer(model, many=True)
+
+    def padrao():
+        conteudo = loop.run_until_complete(
+            serialize_response(field=campo, response_content=docs, is_coroutine=True)
+        )
+        return JSONResponse(conteudo).body
+
+    def rapido():
+        return serializer.dump_json(docs)
+
+    # O caminho rápido tem que produzir o mesmo JSON que o padrão
+    assert json.loads(padrao()) == json.loads(rapido()), f"{nome}: saídas diferentes"
+
+    t_padrao = _medir(padrao, repeticoes)
+    t_rapido = _medir(rapido, repeticoes)
+    tamanho = len(rapido())
+    print(f"\n📄 {nome}: página com {len(docs)} itens ({tamanho / 1024:.1f} KiB)")
+    codificador = "orjson" if fast_json.orjson is not None else "pydantic-core"
+    print(f"   {'FastAPI (validação + json)':<28} {t_padrao:8.3f} ms")
+    print(f"   {f'rápido ({codificador})':<28} {t_rapido:8.3f} ms  ({t_padrao / t_rapido:.1f}x)")
+    if fast_json.msgpack is not None:
+        t_msgpack = _medir(lambda: serializer.dump_msgpack(docs), repeticoes)
+        tamanho_msgpack = len(serializer.dump_msgpack(docs))
+        print(f"   {'msgpack':<28} {t_msgpack:8.3f} ms  ({tamanho_msgpack / 1024:.1f} KiB)")
+    else:
+        print("   msgpack: pacote não instalado (pip install msgpack)")
+
+
+def main(paginas: List[int], repeticoes: int) -> None:
+    rnd = random.Random(42)
+    loop = asyncio.new_event_loop()
+    try:
+        for tamanho in paginas:
+            _comparar("listar_pacientes", PacienteResponse, _pacientes(tamanho, rnd), repeticoes, loop)
+            _comparar("listar_avaliacoes_paciente", AvaliacaoResponse, _avaliacoes(tamanho, rnd), repeticoes, loop)
+    finally:
+        loop.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paginas", type=int, nargs="+", default=[20, 100])
+    parser.add_argument("--repeticoes", type=int, default=200)
+    args = parser.parse_args()
+    main(args.paginas, args.repeticoes)
@@ -0,0 +1,92 @@
+"""
+Orçamento de tempo de import do app
+===================================
+
+Importa `app.main` em processos novos com `python -X importtime` e reporta:
+
+1. Mediana do tempo de `import app.main` (cumulativo, em ms)
+2. Os módulos com maior tempo próprio e o total por pacote
+3. Módulos pesados que devem ficar para o primeiro uso (reportlab, jose,
+   passlib, smtplib, redis) e que apareceram no import
+
+Sai com código 1 se a mediana passar do orçamento ou se algum módulo
+pesado for importado no startup, para uso no CI.
+
+Para executar:
+    cd backend
+    python -m scripts.benchmark_startup [--execucoes 5] [--limite-ms 600] [--top 15]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# Carregados sob demanda: PDF, JWT, hash de senha, e-mail e cache Redis
+ADIADOS = ("reportlab", "jose", "passlib", "smtplib", "redis")
+
+
+def medir() -> List[Tuple[str, int, int]]:
+    """(módulo, próprio µs, cumulativo µs) de um import em processo novo"""
+    env = dict(os.environ)
+    env.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+    resultado = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        capture_output=True, text=True, env=env,
+    )
+    if resultado.returncode != 0:
+        print(resultado.stderr[-2000:])
+        sys.exit(2)
+    linhas = []
+    for linha in resultado.stderr.splitlines():
+        if not linha.startswith("import time:") or "self [us]" in linha:
+            continue
+        proprio, cumulativo, modulo = linha[len("import time:"):].split("|")
+        linhas.append((modulo.strip(), int(proprio), int(cumulativo)))
+    return linhas
+
+
+def main(execucoes: int, limite_ms: float, top: int) -> int:
+    print("=" * 50)
+    print("⏱️  ORÇAMENTO DE IMPORT: app.main")
+    print("=" * 50)
+
+    medicoes = [medir() for _ in range(execucoes)]
+    totais = [dict((m, c) for m, _, c in linhas)["app.main"] / 1000 for linhas in medicoes]
+    mediana = statistics.median(totais)
+    # Detalhamento da execução mais próxima da mediana
+    referencia = medicoes[min(range(execucoes), key=lambda i: abs(totais[i] - mediana))]
+
+    print(f"\n📦 Maiores tempos próprios (de {len(referencia)} módulos)")
+    for modulo, proprio, cumulativo in sorted(referencia, key=lambda l: -l[1])[:top]:
+        print(f"   {proprio / 1000:7.1f} ms  (cumulativo {cumulativo / 1000:7.1f} ms)  {modulo}")
+
+    por_pacote: Dict[str, int] = defaultdict(int)
+    for modulo, proprio, _ in referencia:
+        por_pacote[modulo.split(".")[0]] += proprio
+    print("\n📚 Por pacote")
+    for pacote, proprio in sorted(por_pacote.items(), key=lambda p: -p[1])[:top]:
+        print(f"   {proprio / 1000:7.1f} ms  {pacote}")
+
+    importados = sorted({m.split(".")[0] for m, _, _ in referencia} & set(ADIADOS))
+    print(f"\n📊 import app.main: mediana {mediana:.0f} ms em {execucoes} execuções "
+          f"(mín {min(totais):.0f}, máx {max(totais):.0f}; orçamento {limite_ms:.0f} ms)")
+
+    ok = mediana <= limite_ms
+    if importados:
+        ok = False
+        print(f"❌ Importados no startup (deveriam ser sob demanda): {', '.join(importados)}")
+    print("✅ Dentro do orçamento" if ok else "❌ Fora do orçamento")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--execucoes", type=int, default=5)
+    parser.add_argument("--limite-ms", type=float, default=600.0)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+    sys.exit(main(args.execucoes, args.limite_ms, args.top))
@@ -0,0 +1,273 @@
+"""
+Injeção de latência: prazos e circuit breakers
+==============================================
+
+Sobe no próprio processo dois dublês de dependência e exercita a API real
+(app.main via ASGI, sem servidor HTTP) contra eles:
+
+- Mongo falso: servidor TCP que fala o protocolo de wire (OP_QUERY e
+  OP_MSG), responde ao handshake na hora e atrasa os demais comandos pelo
+  tempo configurado
+- SMTP falso: "tarpit" que aceita a conexão e nunca manda a saudação, ou
+  servidor mínimo que responde (sem STARTTLS)
+
+Verifica:
+
+1. Prazo: com o Mongo lento, GET /api/pacientes termina em 504 perto do
+   REQUEST_DEADLINE_SECONDS, não quando o Mongo responde
+2. Circuito: depois de CIRCUIT_FAILURE_THRESHOLD falhas as requisições
+   levam 503 com Retry-After imediatamente, sem chegar ao Mongo
+3. Recuperação: passado o CIRCUIT_RESET_SECONDS, com o Mongo de volta, a
+   requisição de teste (half-open) passa e o circuito fecha
+4. SMTP: o envio desiste em SMTP_TIMEOUT_SECONDS, o circuito abre e falha
+   rápido, e fecha de novo quando o servidor volta a responder
+
+Sai com código 1 se alguma verificação falhar.
+
+Para executar:
+    cd backend
+    MONGODB_URL=mongodb://localhost python -m scripts.injetar_latencia [--prazo 0.5] [--latencia 3]
+"""
+
+import argparse
+import asyncio
+import os
+import struct
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+
+import bson
+import httpx
+
+from app.auth import get_current_user
+from app.config import settings
+from app.models.user import UserResponse
+
+OP_REPLY = 1
+OP_QUERY = 2004
+OP_MSG = 2013
+HANDSHAKE = ("hello", "ismaster", "isMaster")
+
+
+class MongoFalso:
+    """Servidor standalone mínimo do protocolo de wire do MongoDB"""
+
+    def __init__(self):
+        self.latencia = 0.0
+        self.comandos = 0
+        self._servidor = None
+        self._conexoes = 0
+
+    async def iniciar(self) -> int:
+        self._servidor = await asyncio.start_server(self._atender, "127.0.0.1", 0)
+        return self._servidor.sockets[0].getsockname()[1]
+
+    async def parar(self) -> None:
+        self._servidor.close()
+
+    def _hello(self) -> Dict[str, Any]:
+        self._conexoes += 1
+        return {
+            "ismaster": True, "isWritablePrimary": True, "helloOk": True,
+            "maxWireVersion": 17, "minWireVersion": 0,
+            "maxBsonObjectSize": 16 * 1024 * 1024, "maxMessageSizeBytes": 48000000,
+            "maxWriteBatchSize": 100000, "localTime": datetime.utcnow(),
+            "logicalSessionTimeoutMinutes": 30, "connectionId": self._conexoes, "ok": 1.0,
+        }
+
+    async def _responder(self, comando: Dict[str, Any]) -> Dict[str, Any]:
+        nome = next(iter(comando))
+        if nome in HANDSHAKE:
+            return self._hello()
+        self.comandos += 1
+        if self.latencia:
+            await asyncio.sleep(self.latencia)
+        if nome in ("find", "aggregate"):
+            return {"cursor": {"id": bson.Int64(0), "ns": f"{comando.get('$db')}.{comando[nome]}", "firstBatch": []}, "ok": 1.0}
+        return {"ok": 1.0}
+
+    async def _atender(self, leitor: asyncio.StreamReader, escritor: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                cabecalho = await leitor.readexactly(16)
+                tamanho, request_id, _, opcode = struct.unpack("<iiii", cabecalho)
+                corpo = await leitor.readexactly(tamanho - 16)
+                if opcode == OP_QUERY:
+                    # flags, nome da coleção (cstring), skip, limit, documento
+                    fim_nome = corpo.index(b"\0", 4)
+                    comando = bson.decode(corpo[fim_nome + 9:])
+                    resposta = bson.encode(await self._responder(comando))
+                    carga = struct.pack("<iqii", 0, 0, 0, 1) + resposta
+                    opcode_resposta = OP_REPLY
+                elif opcode == OP_MSG:
+                    # flags e a seção do tipo 0 (o comando); seções do tipo 1 são ignoradas
+                    comando = bson.decode(corpo[5:5 + struct.unpack("<i", corpo[5:9])[0]])
+                    carga = struct.pack("<I", 0) + b"\0" + bson.encode(await self._responder(comando))
+                    opcode_resposta = OP_MSG
+                else:
+                    break
+                escritor.write(struct.pack("<iiii", 16 + len(carga), 0, request_id, opcode_resposta) + carga)
+                await escritor.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            escritor.close()
+
+
+class SMTPFalso:
+    """Tarpit (nunca responde) ou servidor mínimo, conforme `responder`"""
+
+    def __init__(self):
+        self.responder = False
+        self.conexoes = 0
+        self._servidor = None
+
+    async def iniciar(self) -> int:
+        self._servidor = await asyncio.start_server(self._atender, "127.0.0.1", 0)
+        return self._servidor.sockets[0].getsockname()[1]
+
+    async def parar(self) -> None:
+        self._servidor.close()
+
+    async def _atender(self, leitor: asyncio.StreamReader, escritor: asyncio.StreamWriter) -> None:
+        self.conexoes += 1
+        try:
+            if not self.responder:
+                await leitor.read()  # segura a conexão até o cliente desistir
+                return
+            escritor.write(b"220 smtp-falso\r\n")
+            while linha := await leitor.readline():
+                verbo = linha.split(b" ", 1)[0].strip().upper()
+                escritor.write(b"221 tchau\r\n" if verbo == b"QUIT" else b"250 smtp-falso\r\n")
+                await escritor.drain()
+                if verbo == b"QUIT":
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            escritor.close()
+
+
+def verificar(resultados: List[bool], ok: bool, mensagem: str) -> None:
+    resultados.append(ok)
+    print(f"   {'✅' if ok else '❌'} {mensagem}")
+
+
+async def requisicao(cliente: httpx.AsyncClient):
+    inicio = time.perf_counter()
+    resposta = await cliente.get("/api/pacientes")
+    return resposta, time.perf_counter() - inicio
+
+
+async def testar_mongo(args, mongo: MongoFalso, resultados: List[bool]) -> None:
+    from app.database import close_db, init_db
+    from app.main import app
+    from app.resilience import CLOSED, OPEN, mongo_breaker
+
+    app.dependency_overrides[get_current_user] = lambda: UserResponse(_id="6ad601c5c83cceed72c4d2df", email="carga@example.com")
+    await init_db()
+    transporte = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transporte, base_url="http://teste") as cliente:
+            print("\n🐢 1. Prazo por requisição")
+            resposta, duracao = await requisicao(cliente)
+            verificar(resultados, resposta.status_code == 200, f"Mongo rápido: {resposta.status_code} em {duracao * 1000:.0f} ms")
+            mongo.latencia = args.latencia
+            resposta, duracao = await requisicao(cliente)
+            verificar(resultados, resposta.status_code == 504 and duracao < args.prazo + 1.0,
+                      f"Mongo com {args.latencia:.1f}s de latência: {resposta.status_code} em {duracao * 1000:.0f} ms "
+                      f"(prazo {args.prazo * 1000:.0f} ms)")
+
+            print("\n⚡ 2. Circuito aberto")
+            for _ in range(args.falhas):
+                if mongo_breaker.state == OPEN:
+                    break
+                await requisicao(cliente)
+            verificar(resultados, mongo_breaker.state == OPEN, f"circuito {mongo_breaker.state} após falhas seguidas")
+            comandos = mongo.comandos
+            resposta, duracao = await requisicao(cliente)
+            verificar(resultados, resposta.status_code == 503 and "retry-after" in resposta.headers and duracao < 0.05,
+                      f"falha rápida: {resposta.status_code} em {duracao * 1000:.1f} ms, "
+                      f"Retry-After {resposta.headers.get('retry-after')}")
+            verificar(resultados, mongo.comandos == comandos, "nenhum comando chegou ao Mongo")
+
+            print("\n🔁 3. Half-open e recuperação")
+            mongo.latencia = 0.0
+            await asyncio.sleep(args.reset + 0.1)
+            resposta, duracao = await requisicao(cliente)
+            verificar(resultados, resposta.status_code == 200 and mongo_breaker.state == CLOSED,
+                      f"requisição de teste: {resposta.status_code}, circuito {mongo_breaker.state}")
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
+        await close_db()
+
+
+async def testar_smtp(args, smtp: SMTPFalso, resultados: List[bool]) -> None:
+    from app.email_service import send_email_with_pdf
+    from app.resilience import CLOSED, OPEN, smtp_breaker
+
+    def enviar():
+        inicio = time.perf_counter()
+        enviado = send_email_with_pdf("destino@example.com", "Relatório", "<p>-</p>", b"%PDF-1.4")
+        return enviado, time.perf_counter() - inicio
+
+    print("\n✉️  4. SMTP")
+    enviado, duracao = await asyncio.to_thread(enviar)
+    verificar(resultados, not enviado and duracao < settings.SMTP_TIMEOUT_SECONDS + 0.5,
+              f"tarpit: desistiu em {duracao * 1000:.0f} ms (timeout {settings.SMTP_TIMEOUT_SECONDS * 1000:.0f} ms)")
+    for _ in range(args.falhas):
+        if smtp_breaker.state == OPEN:
+            break
+        await asyncio.to_thread(enviar)
+    conexoes = smtp.conexoes
+    enviado, duracao = await asyncio.to_thread(enviar)
+    verificar(resultados, smtp_breaker.state == OPEN and duracao < 0.05 and smtp.conexoes == conexoes,
+              f"circuito {smtp_breaker.state}: falha em {duracao * 1000:.1f} ms sem conectar")
+    smtp.responder = True
+    await asyncio.sleep(args.reset + 0.1)
+    await asyncio.to_thread(enviar)  # sem STARTTLS o envio falha, mas o servidor respondeu
+    verificar(resultados, smtp_breaker.state == CLOSED, f"servidor de volta: circuito {smtp_breaker.state}")
+
+
+async def main(args) -> int:
+    print("=" * 50)
+    print("💉 INJEÇÃO DE LATÊNCIA: PRAZOS E CIRCUITOS")
+    print("=" * 50)
+    mongo, smtp = MongoFalso(), SMTPFalso()
+    porta_mongo = await mongo.iniciar()
+    porta_smtp = await smtp.iniciar()
+
+    settings.MONGODB_URL = f"mongodb://127.0.0.1:{porta_mongo}/?directConnection=true"
+    settings.REQUEST_DEADLINE_SECONDS = args.prazo
+    settings.SMTP_HOST, settings.SMTP_PORT = "127.0.0.1", porta_smtp
+    settings.SMTP_USER = settings.SMTP_PASSWORD = settings.SMTP_FROM_EMAIL = "teste@example.com"
+    settings.SMTP_TIMEOUT_SECONDS = args.prazo
+    from app.resilience import mongo_breaker, smtp_breaker
+    for breaker in (mongo_breaker, smtp_breaker):
+        breaker.failure_threshold = args.falhas
+        breaker.reset_timeout = args.reset
+
+    resultados: List[bool] = []
+    try:
+        await testar_mongo(args, mongo, resultados)
+        await testar_smtp(args, smtp, resultados)
+    finally:
+        await mongo.parar()
+        await smtp.parar()
+
+    ok = all(resultados)
+    print(f"\n{'✅' if ok else '❌'} {sum(resultados)}/{len(resultados)} verificações")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prazo", type=float, default=0.5, help="prazo por requisição e timeout SMTP (s)")
+    parser.add_argument("--latencia", type=float, default=3.0, help="latência injetada no Mongo (s)")
+    parser.add_argument("--falhas", type=int, default=3, help="falhas para abrir o circuito")
+    parser.add_argument("--reset", type=float, default=1.0, help="tempo do circuito aberto (s)")
+    sys.exit(asyncio.run(main(parser.parse_args())))
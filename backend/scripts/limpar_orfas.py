@@ -0,0 +1,151 @@
+"""
+Limpeza de avaliações órfãs - MongoDB
+=====================================
+
+Remove as avaliações (e os buckets de pesos) cujas pacientes não existem
+mais: sobras de exclusões feitas antes da exclusão em cascata ou de uma
+cascata interrompida. A exclusão usa os mesmos lotes por faixa de _id da
+tarefa em background (app.services.exclusao_service).
+
+Ao final o script mostra o espaço recuperado em avaliacoes e pesos:
+- dados: bytes dos documentos removidos (collStats.size)
+- armazenamento: bytes liberados para reuso pelo WiredTiger
+  (freeStorageSize); com --compact o espaço é devolvido ao sistema
+  operacional (storageSize), ao custo de bloquear a coleção durante o compact
+
+Para executar localmente:
+    cd backend
+    python -m scripts.limpar_orfas [--lote 500] [--pausa-ms 50] [--dry-run] [--compact]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from typing import Dict, List
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.services.exclusao_service import excluir_avaliacoes
+from app.services.pesos_service import COLECAO as COLECAO_PESOS
+
+load_dotenv()
+
+MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
+DB_NAME = os.getenv("MONGODB_DB_NAME", "nutri_gestantes")
+
+COLECOES = ("avaliacoes", COLECAO_PESOS)
+LOTE_VERIFICACAO = 1000
+
+
+async def estatisticas(db, colecao: str) -> Dict[str, int]:
+    stats = await db.command("collStats", colecao)
+    return {
+        "documentos": stats.get("count", 0),
+        "dados": stats.get("size", 0),
+        "armazenamento": stats.get("storageSize", 0),
+        "livre": stats.get("freeStorageSize", 0),
+    }
+
+
+async def pacientes_orfas(db, colecao: str) -> List[str]:
+    """paciente_id referenciados em `colecao` sem documento em pacientes"""
+    orfas: List[str] = []
+
+    async def verificar(bloco: List[str]) -> None:
+        cursor = db.pacientes.find({"_id": {"$in": [ObjectId(p) for p in bloco]}}, {"_id": 1})
+        existentes = {str(doc["_id"]) async for doc in cursor}
+        orfas.extend(p for p in bloco if p not in existentes)
+
+    # $group em cursor: distinct() estoura o limite de 16 MB do resultado
+    # justamente nas coleções grandes
+    cursor = db[colecao].aggregate([{"$group": {"_id": "$paciente_id"}}], allowDiskUse=True)
+    bloco: List[str] = []
+    async for doc in cursor:
+        paciente_id = doc["_id"]
+        if paciente_id is None:
+            continue
+        if not ObjectId.is_valid(paciente_id):
+            orfas.append(paciente_id)
+            continue
+        bloco.append(paciente_id)
+        if len(bloco) == LOTE_VERIFICACAO:
+            await verificar(bloco)
+            bloco = []
+    if bloco:
+        await verificar(bloco)
+    return orfas
+
+
+def formatar_bytes(valor: int) -> str:
+    for unidade in ("B", "KB", "MB", "GB"):
+        if abs(valor) < 1024:
+            return f"{valor:.1f} {unidade}"
+        valor /= 1024
+    return f"{valor:.1f} TB"
+
+
+async def run_limpeza(tamanho_lote: int = 500, pausa_ms: int = 50, dry_run: bool = False, compact: bool = False):
+    print("=" * 50)
+    print("🧹 LIMPEZA DE AVALIAÇÕES ÓRFÃS" + (" (DRY-RUN)" if dry_run else ""))
+    print("=" * 50)
+
+    client = AsyncIOMotorClient(MONGODB_URL)
+    db = client[DB_NAME]
+    inicio = time.perf_counter()
+    try:
+        await client.admin.command('ping')
+        print("✅ Conectado ao MongoDB")
+
+        antes = {colecao: await estatisticas(db, colecao) for colecao in COLECOES}
+
+        orfas = await pacientes_orfas(db, "avaliacoes")
+        orfas_pesos = set(await pacientes_orfas(db, COLECAO_PESOS)) - set(orfas)
+        print(f"🔍 Pacientes inexistentes com avaliações: {len(orfas)}")
+        print(f"🔍 Pacientes inexistentes só com pesos: {len(orfas_pesos)}")
+
+        if dry_run:
+            total = await db.avaliacoes.count_documents({"paciente_id": {"$in": orfas}})
+            print(f"📄 Avaliações que seriam excluídas: {total}")
+            return
+
+        excluidas = 0
+        for paciente_id in orfas:
+            excluidas += await excluir_avaliacoes(db, paciente_id, tamanho_lote, pausa_ms / 1000)
+        resultado = await db[COLECAO_PESOS].delete_many({"paciente_id": {"$in": orfas + list(orfas_pesos)}})
+        print(f"🗑️  Avaliações excluídas: {excluidas}")
+        print(f"🗑️  Buckets de pesos excluídos: {resultado.deleted_count}")
+
+        if compact:
+            for colecao in COLECOES:
+                print(f"📦 compact {colecao}...")
+                await db.command("compact", colecao)
+
+        print("\n💾 Espaço recuperado:")
+        for colecao in COLECOES:
+            depois = await estatisticas(db, colecao)
+            print(
+                f"   {colecao}: "
+                f"dados {formatar_bytes(antes[colecao]['dados'] - depois['dados'])}, "
+                f"reutilizável {formatar_bytes(depois['livre'] - antes[colecao]['livre'])}, "
+                f"devolvido ao disco {formatar_bytes(antes[colecao]['armazenamento'] - depois['armazenamento'])}"
+            )
+
+        print(f"\n✅ Concluído em {time.perf_counter() - inicio:.1f}s")
+    except Exception as e:
+        print(f"\n❌ ERRO NA LIMPEZA: {e}")
+        raise
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove avaliações e pesos de pacientes inexistentes")
+    parser.add_argument("--lote", type=int, default=500, help="Avaliações por delete_many")
+    parser.add_argument("--pausa-ms", type=int, default=50, help="Pausa entre lotes")
+    parser.add_argument("--dry-run", action="store_true", help="Só conta as órfãs")
+    parser.add_argument("--compact", action="store_true", help="Executa compact ao final (bloqueia a coleção)")
+    args = parser.parse_args()
+    asyncio.run(run_limpeza(args.lote, args.pausa_ms, args.dry_run, args.compact))
@@ -7,21 +7,48 @@ Este script migra os dados antigos para o novo formato de schema.
 Alterações:
 1. Pacientes: Adiciona campo peso_pre_gestacional se não existir
 2. Avaliações: Atualiza estrutura de calculos, relatorio e respostas_checklist
+3. Pacientes: Adiciona nome_normalizado (índice único de nome por usuário).
+   Antes, nomes do mesmo usuário que só diferem em acentos/maiúsculas são
+   renomeados com um sufixo " (2)" e listados (--dry-run só lista)
+
+As transformações vêm do registro de upgrades de app.services.schema_service,
+o mesmo aplicado na leitura pela API; documentos já na versão atual de
+`schema_version` são ignorados, então este script só trata a cauda longa de
+documentos que nunca foram lidos. Cada coleção é processada em lotes
+(bulk_write não ordenado), com o intervalo de `_id` dividido entre workers
+concorrentes. O progresso de cada
+intervalo é salvo em um arquivo de checkpoint, permitindo retomar a migração
+após uma falha; o checkpoint não passa de um documento que falhou, então a
+retomada tenta de novo os que deram erro.
 
 Para executar localmente:
     cd backend
-    python -m scripts.migrate_data
+    python -m scripts.migrate_data [--workers 4] [--lote 500] [--dry-run]
+
+Para retomar do zero (ignorando o checkpoint):
+    python -m scripts.migrate_data --reset
 
 Para executar em produção (Render):
     Configurar MONGODB_URL no ambiente e executar o script
 """
 
+import argparse
 import asyncio
+import json
 import os
+import time
 from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, UpdateOne
 from dotenv import load_dotenv
 
+from app.services.alteracoes_service import confirmar_alteracao, marca, registrar_alteracao
+from app.services.busca_service import normalizar_nome
+from app.services.schema_service import aplicar_upgrades, filtro_desatualizados, versao_atual
+
 # Carrega variáveis de ambiente
 load_dotenv()
 
@@ -29,32 +56,262 @@ load_dotenv()
 MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
 DB_NAME = os.getenv("MONGODB_DB_NAME", "nutri_gestantes")
 
+CHECKPOINT_PADRAO = ".migrate_checkpoint.json"
+
+
+# === Checkpoint ===
+
+def carregar_checkpoint(caminho: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho) as f:
+        return json.load(f)
+
+
+def salvar_checkpoint(caminho: str, estado: Dict[str, Any]) -> None:
+    # Escrita atômica: um crash no meio não corrompe o checkpoint
+    temporario = f"{caminho}.tmp"
+    with open(temporario, "w") as f:
+        json.dump(estado, f, indent=2)
+    os.replace(temporario, caminho)
+
+
+def dividir_intervalo(inicio: ObjectId, fim: ObjectId, partes: int) -> List[Dict[str, Optional[str]]]:
+    """
+    Divide [inicio, fim] em `partes` intervalos contíguos de _id.
+    `ultimo` guarda o último _id processado em cada intervalo.
+    """
+    a, b = int(str(inicio), 16), int(str(fim), 16)
+    tamanho = b - a + 1
+    partes = max(1, min(partes, tamanho))
+    passo = tamanho // partes
+    intervalos = []
+    for i in range(partes):
+        intervalos.append({
+            "inicio": format(a + i * passo, "024x"),
+            # O último intervalo fica aberto: cobre também o que for inserido durante a migração
+            "fim": format(a + (i + 1) * passo, "024x") if i < partes - 1 else None,
+            "ultimo": None,
+        })
+    return intervalos
+
+
+class Progresso:
+    def __init__(self):
+        self.lidos = 0
+        self.migrados = 0
+        self.erros = 0
+        self.inicio = time.perf_counter()
+
+    def taxa(self) -> float:
+        return self.lidos / max(time.perf_counter() - self.inicio, 1e-9)
+
+
+async def _migrar_intervalo(
+    db,
+    colecao: str,
+    intervalo: Dict[str, Optional[str]],
+    estado: Dict[str, Any],
+    caminho_checkpoint: str,
+    progresso: Progresso,
+    tamanho_lote: int,
+    dry_run: bool,
+    lock: asyncio.Lock
+):
+    filtro_id: Dict[str, Any] = {"$gte": ObjectId(intervalo["inicio"])}
+    if intervalo["ultimo"]:
+        filtro_id = {"$gt": ObjectId(intervalo["ultimo"])}
+    if intervalo["fim"]:
+        filtro_id["$lt"] = ObjectId(intervalo["fim"])
+
+    cursor = (
+        db[colecao]
+        .find({**filtro_desatualizados(colecao), "_id": filtro_id})
+        .sort("_id", ASCENDING)
+        .batch_size(tamanho_lote)
+    )
+
+    operacoes: List[UpdateOne] = []
+    ultimo_id = None
+    # O checkpoint só avança até antes do primeiro documento que falhou no
+    # intervalo: a próxima execução volta a partir dele, e os que foram
+    # gravados depois já não passam no filtro de desatualizados
+    falhou = False
+
+    async def gravar():
+        nonlocal operacoes, falhou
+        if operacoes and not dry_run:
+            try:
+                result = await db[colecao].bulk_write(operacoes, ordered=False)
+                progresso.migrados += result.modified_count
+            except Exception as e:
+                print(f"   ❌ Erro no lote terminado em {ultimo_id}: {e}")
+                progresso.erros += len(operacoes)
+                falhou = True
+        elif dry_run:
+            progresso.migrados += len(operacoes)
+        operacoes = []
+        if falhou or dry_run:
+            return
+        intervalo["ultimo"] = str(ultimo_id)
+        async with lock:
+            salvar_checkpoint(caminho_checkpoint, estado)
+
+    async for documento in cursor:
+        progresso.lidos += 1
+        ultimo_id = documento["_id"]
+        try:
+            _, alteracoes = aplicar_upgrades(colecao, documento)
+        except Exception as e:
+            print(f"   ❌ Erro ao migrar {colecao} {ultimo_id}: {e}")
+            progresso.erros += 1
+            falhou = True
+            continue
+        operacoes.append(UpdateOne({"_id": ultimo_id}, {"$set": alteracoes}))
+        if len(operacoes) >= tamanho_lote:
+            await gravar()
+
+    if ultimo_id is not None:
+        await gravar()
+
+
+async def _relatar(progresso: Progresso, total: int):
+    while True:
+        await asyncio.sleep(5)
+        print(f"   ⏳ {progresso.lidos}/{total} lidos | {progresso.taxa():.0f} docs/s")
+
+
+async def migrar_colecao(
+    db,
+    colecao: str,
+    workers: int = 4,
+    tamanho_lote: int = 500,
+    dry_run: bool = False,
+    caminho_checkpoint: str = CHECKPOINT_PADRAO,
+    reset: bool = False
+):
+    """
+    Leva os documentos pendentes da coleção até a versão atual de schema,
+    em lotes, com `workers` tarefas concorrentes, cada uma responsável por
+    um intervalo de _id
+    """
+    versao = versao_atual(colecao)
+    filtro = filtro_desatualizados(colecao)
+
+    total = await db[colecao].count_documents({})
+    pendentes = await db[colecao].count_documents(filtro)
+    print(f"   Total: {total} | Pendentes (< v{versao}): {pendentes}")
+    if pendentes == 0:
+        print("   ✅ Nenhuma migração necessária")
+        return
+
+    caminho = f"{caminho_checkpoint}.{colecao}"
+    estado = None if reset or dry_run else carregar_checkpoint(caminho)
+    if estado and estado.get("schema_version") == versao:
+        print(f"   ↩️  Retomando do checkpoint {caminho}")
+    else:
+        primeiro = await db[colecao].find_one(filtro, {"_id": 1}, sort=[("_id", ASCENDING)])
+        ultimo = await db[colecao].find_one(filtro, {"_id": 1}, sort=[("_id", -1)])
+        estado = {
+            "schema_version": versao,
+            "iniciado_em": datetime.now().isoformat(),
+            "intervalos": dividir_intervalo(primeiro["_id"], ultimo["_id"], workers),
+        }
+
+    progresso = Progresso()
+    lock = asyncio.Lock()
+    relator = asyncio.create_task(_relatar(progresso, pendentes))
+    try:
+        await asyncio.gather(*[
+            _migrar_intervalo(db, colecao, intervalo, estado, caminho, progresso, tamanho_lote, dry_run, lock)
+            for intervalo in estado["intervalos"]
+        ])
+    finally:
+        relator.cancel()
+
+    acao = "Seriam migrados" if dry_run else "Migrados"
+    print(f"   ✅ {acao}: {progresso.migrados} | Erros: {progresso.erros} | {progresso.taxa():.0f} docs/s")
+
+    if not dry_run and progresso.erros == 0 and os.path.exists(caminho):
+        os.remove(caminho)
+    elif not dry_run and progresso.erros:
+        print("   ↩️  Checkpoint mantido antes do primeiro erro de cada intervalo: "
+              "a próxima execução tenta de novo os documentos que falharam")
+
+
+def _nome_livre(nome: str, ocupados: set) -> str:
+    n = 2
+    while normalizar_nome(f"{nome} ({n})") in ocupados:
+        n += 1
+    return f"{nome} ({n})"
+
+
+async def resolver_nomes_conflitantes(db, dry_run: bool = False) -> int:
+    """
+    Renomeia pacientes cujo nome só difere de outro do mesmo usuário em
+    acentos, maiúsculas ou espaços ("Maria José" e "maria jose")
+
+    A checagem antiga comparava o nome exato, mas o índice único agora é
+    sobre nome_normalizado: sem isto, o segundo documento daria
+    DuplicateKeyError para sempre na migração e na gravação preguiçosa.
+    Fica o nome do documento que já tem nome_normalizado ou, entre os
+    pendentes, o mais antigo; os demais ganham um sufixo " (2)", " (3)"...
+    Retorna quantos conflitos foram encontrados.
+    """
+    pendentes = await db.pacientes.distinct("user_id", {"nome_normalizado": {"$exists": False}})
+    conflitos = 0
+    for user_id in pendentes:
+        documentos = await db.pacientes.find(
+            {"user_id": user_id}, {"nome": 1, "nome_normalizado": 1}
+        ).sort("_id", ASCENDING).to_list(length=None)
+        ocupados = {doc["nome_normalizado"] for doc in documentos if "nome_normalizado" in doc}
+        # Primeiro quem fica com o nome, depois os sufixos (sem tomar o nome
+        # de outro pendente, como um "Maria José (2)" já existente)
+        conflitantes = []
+        for doc in documentos:
+            if "nome_normalizado" in doc:
+                continue
+            normalizado = normalizar_nome(doc.get("nome", ""))
+            if normalizado in ocupados:
+                conflitantes.append(doc)
+            else:
+                ocupados.add(normalizado)
+        renomear = []
+        for doc in conflitantes:
+            novo = _nome_livre(doc.get("nome", ""), ocupados)
+            ocupados.add(normalizar_nome(novo))
+            renomear.append((doc, novo))
+
+        for doc, novo in renomear:
+            conflitos += 1
+            acao = "Seria renomeada" if dry_run else "Renomeada"
+            print(f"   ⚠️  {acao}: usuário {user_id} | {doc['_id']} | {doc.get('nome')!r} -> {novo!r}")
+            if dry_run:
+                continue
+            # Mudança visível: passa pelo /api/sync e invalida ETags e cache
+            seq = await registrar_alteracao(db, user_id)
+            await db.pacientes.update_one(
+                {"_id": doc["_id"], "nome": doc.get("nome")},
+                {"$set": {"nome": novo, "updated_at": datetime.utcnow(), **marca(seq)}, "$inc": {"versao": 1}}
+            )
+        if renomear and not dry_run:
+            await confirmar_alteracao(db, user_id)
+
+    if conflitos:
+        print(f"   ⚠️  {conflitos} nomes conflitantes (iguais sem acentos/maiúsculas)")
+    return conflitos
 
-async def migrate_pacientes(db):
+
+async def migrate_pacientes(db, **opcoes):
     """
     Migra os pacientes antigos adicionando peso_pre_gestacional se não existir
     """
     print("\n📋 Migrando pacientes...")
-    
-    # Encontra pacientes sem peso_pre_gestacional
-    pacientes_sem_peso = await db.pacientes.count_documents({
-        "peso_pre_gestacional": {"$exists": False}
-    })
-    
-    print(f"   Encontrados {pacientes_sem_peso} pacientes sem peso_pre_gestacional")
-    
-    if pacientes_sem_peso > 0:
-        # Atualiza todos para ter o campo (como None por enquanto)
-        result = await db.pacientes.update_many(
-            {"peso_pre_gestacional": {"$exists": False}},
-            {"$set": {"peso_pre_gestacional": None}}
-        )
-        print(f"   ✅ Atualizados {result.modified_count} pacientes")
-    else:
-        print("   ✅ Nenhuma migração necessária")
+    await resolver_nomes_conflitantes(db, dry_run=opcoes.get("dry_run", False))
+    await migrar_colecao(db, "pacientes", **opcoes)
 
 
-async def migrate_avaliacoes(db):
+async def migrate_avaliacoes(db, **opcoes):
     """
     Migra as avaliações antigas para o novo formato:
     - Converte boolean para string em respostas_checklist
@@ -62,145 +319,50 @@ async def migrate_avaliacoes(db):
     - Adiciona title nos itens de relatorio
     """
     print("\n📊 Migrando avaliações...")
-    
-    # Busca todas as avaliações
-    total_avaliacoes = await db.avaliacoes.count_documents({})
-    print(f"   Total de avaliações: {total_avaliacoes}")
-    
-    migradas = 0
-    erros = 0
-    
-    cursor = db.avaliacoes.find({})
-    async for avaliacao in cursor:
-        try:
-            updates = {}
-            avaliacao_id = avaliacao["_id"]
-            
-            # 1. Migrar respostas_checklist (boolean -> string)
-            respostas = avaliacao.get("respostas_checklist", {})
-            if respostas:
-                novos_respostas = {}
-                campos_bool = [
-                    'fruits_vegetables', 'dairy_products', 'whole_grains',
-                    'meat_poultry_eggs', 'plant_proteins', 'fish_consumption',
-                    'processed_foods', 'physical_activity', 'coffee_tea_consumption',
-                    'substances_use'
-                ]
-                
-                for campo in campos_bool:
-                    valor = respostas.get(campo)
-                    if isinstance(valor, bool):
-                        novos_respostas[campo] = "Sim" if valor else "Não"
-                    elif valor is not None:
-                        novos_respostas[campo] = valor
-                
-                # Mantém os outros campos
-                for key, val in respostas.items():
-                    if key not in campos_bool:
-                        novos_respostas[key] = val
-                    elif key not in novos_respostas:
-                        novos_respostas[key] = val
-                
-                updates["respostas_checklist"] = novos_respostas
-            
-            # 2. Migrar calculos (formato antigo -> novo)
-            calculos = avaliacao.get("calculos", {})
-            if calculos:
-                novos_calculos = {
-                    "imc_pre_gestacional": calculos.get("imc_pre_gestacional", calculos.get("imc", 0)),
-                    "imc_classification": calculos.get("imc_classification", "Não calculado"),
-                    "peso_atual": calculos.get("peso_atual", avaliacao.get("peso_atual", 0)),
-                    "ganho_peso_atual": calculos.get("ganho_peso_atual", calculos.get("weight_gain", 0)),
-                    "trimestre": calculos.get("trimestre", "Não informado"),
-                    "weight_gain_recommendation": calculos.get("weight_gain_recommendation", "")
-                }
-                updates["calculos"] = novos_calculos
-            
-            # 3. Migrar relatorio (adicionar title se não existir)
-            relatorio = avaliacao.get("relatorio", {})
-            if relatorio:
-                novo_relatorio = {}
-                
-                for categoria in ["alertas_criticos", "recomendacoes", "adequados"]:
-                    itens = relatorio.get(categoria, [])
-                    novos_itens = []
-                    
-                    for item in itens:
-                        novo_item = dict(item)
-                        if "title" not in novo_item:
-                            # Gera um título baseado no item_id
-                            item_id = novo_item.get("item_id", "item")
-                            titulo_map = {
-                                "dietary_pattern": "Padrão Alimentar",
-                                "fruits_vegetables": "Frutas e Vegetais",
-                                "dairy_products": "Laticínios",
-                                "whole_grains": "Grãos Integrais",
-                                "meat_poultry_eggs": "Carnes e Ovos",
-                                "plant_proteins": "Proteínas Vegetais",
-                                "fish_consumption": "Consumo de Peixe",
-                                "processed_foods": "Alimentos Processados",
-                                "folic_acid_supplement": "Ácido Fólico",
-                                "iron_supplement": "Ferro",
-                                "calcium_supplement": "Cálcio",
-                                "sun_exposure": "Exposição Solar",
-                                "anemia_test": "Exame de Anemia",
-                                "physical_activity": "Atividade Física",
-                                "coffee_tea_consumption": "Café e Chá",
-                                "substances_use": "Substâncias"
-                            }
-                            novo_item["title"] = titulo_map.get(item_id, item_id.replace("_", " ").title())
-                        novos_itens.append(novo_item)
-                    
-                    novo_relatorio[categoria] = novos_itens
-                
-                updates["relatorio"] = novo_relatorio
-            
-            # 4. Garantir que peso_pre_gestacional existe
-            if "peso_pre_gestacional" not in avaliacao:
-                updates["peso_pre_gestacional"] = None
-            
-            # Aplica as atualizações
-            if updates:
-                await db.avaliacoes.update_one(
-                    {"_id": avaliacao_id},
-                    {"$set": updates}
-                )
-                migradas += 1
-                
-        except Exception as e:
-            print(f"   ❌ Erro ao migrar avaliação {avaliacao.get('_id')}: {e}")
-            erros += 1
-    
-    print(f"   ✅ Migradas: {migradas} | Erros: {erros}")
+    await migrar_colecao(db, "avaliacoes", **opcoes)
 
 
-async def run_migration():
+async def run_migration(
+    workers: int = 4,
+    tamanho_lote: int = 500,
+    dry_run: bool = False,
+    caminho_checkpoint: str = CHECKPOINT_PADRAO,
+    reset: bool = False
+):
     """
     Executa a migração completa
     """
     print("=" * 50)
-    print("🚀 INICIANDO MIGRAÇÃO DE DADOS")
+    print("🚀 INICIANDO MIGRAÇÃO DE DADOS" + (" (DRY-RUN)" if dry_run else ""))
     print("=" * 50)
     print(f"📅 Data: {datetime.now().isoformat()}")
     print(f"🗄️  Database: {DB_NAME}")
-    
+
     # Conecta ao MongoDB
-    client = AsyncIOMotorClient(MONGODB_URL)
+    client = AsyncIOMotorClient(MONGODB_URL, maxPoolSize=max(10, workers * 2))
     db = client[DB_NAME]
-    
+
+    opcoes = {
+        "workers": workers,
+        "tamanho_lote": tamanho_lote,
+        "dry_run": dry_run,
+        "caminho_checkpoint": caminho_checkpoint,
+        "reset": reset,
+    }
+
     try:
         # Testa conexão
         await client.admin.command('ping')
         print("✅ Conectado ao MongoDB")
-        
+
         # Executa migrações
-        await migrate_pacientes(db)
-        await migrate_avaliacoes(db)
-        
+        await migrate_pacientes(db, **opcoes)
+        await migrate_avaliacoes(db, **opcoes)
+
         print("\n" + "=" * 50)
         print("✅ MIGRAÇÃO CONCLUÍDA COM SUCESSO!")
         print("=" * 50)
-        
+
     except Exception as e:
         print(f"\n❌ ERRO NA MIGRAÇÃO: {e}")
         raise
@@ -210,4 +372,17 @@ async def run_migration():
 
 
 if __name__ == "__main__":
-    asyncio.run(run_migration())
+    parser = argparse.ArgumentParser(description="Migração de dados do MongoDB")
+    parser.add_argument("--workers", type=int, default=4, help="Tarefas concorrentes (intervalos de _id)")
+    parser.add_argument("--lote", type=int, default=500, help="Documentos por bulk_write")
+    parser.add_argument("--dry-run", action="store_true", help="Calcula as alterações sem gravar")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PADRAO, help="Prefixo do arquivo de checkpoint")
+    parser.add_argument("--reset", action="store_true", help="Ignora o checkpoint existente")
+    args = parser.parse_args()
+    asyncio.run(run_migration(
+        workers=args.workers,
+        tamanho_lote=args.lote,
+        dry_run=args.dry_run,
+        caminho_checkpoint=args.checkpoint,
+        reset=args.reset
+    ))
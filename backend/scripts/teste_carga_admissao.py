@@ -0,0 +1,160 @@
+"""
+Teste de carga da admissão por classe de rota
+=============================================
+
+Mede a latência de GET /api/pacientes em duas fases contra um servidor em
+execução:
+
+1. Base: só leitores (--leitores conexões em loop)
+2. Tempestade de PDFs: os mesmos leitores + --pdfs conexões em loop no
+   POST /api/pdf/generate (render inline)
+
+Reporta p50/p95/p99 das leituras em cada fase, os status dos PDFs (200,
+503 com Retry-After, 429) e sai com código 1 se o p99 das leituras durante
+a tempestade passar de --p99-ms.
+
+Requer httpx (pip install httpx). O usuário precisa existir; o token vem de
+--token ou de login com --email/--senha.
+
+Para executar:
+    cd backend
+    gunicorn -c gunicorn.conf.py app.main:app   # em outro terminal
+    python -m scripts.teste_carga_admissao --url http://localhost:8000 \\
+        --email teste@example.com --senha segredo [--duracao 20] [--p99-ms 250]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from collections import Counter
+from typing import Dict, List
+
+try:
+    import httpx
+except ImportError:
+    print("❌ httpx não instalado: pip install httpx")
+    sys.exit(1)
+
+PAYLOAD_PDF = {
+    "patient": {
+        "name": "Carga",
+        "age": "30",
+        "height": 1.65,
+        "gestationalWeek": "20",
+        "trimester": "Segundo Trimestre",
+        "imc": 22.0,
+        "imcClassification": "Eutrofia",
+        "preGestationalWeight": 60.0,
+        "currentWeight": 64.0,
+        "weightGain": 4.0,
+        "evaluationDate": "01/01/2026",
+    },
+    "figo": {"status": "adequate", "statusMessage": "Ganho adequado", "expectedMin": 0.7, "expectedMax": 3.5},
+    "patientGuidelines": [
+        {"id": "fruits_vegetables", "title": "Frutas e Vegetais", "message": "-", "type": "recommendation", "audience": "both"},
+    ],
+    "professionalAlerts": [
+        {"id": "iron_supplement", "title": "Ferro", "message": "-", "type": "alert", "audience": "both"},
+    ],
+}
+
+
+def percentil(valores: List[float], p: float) -> float:
+    if not valores:
+        return float("nan")
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+async def obter_token(cliente: "httpx.AsyncClient", args) -> str:
+    if args.token:
+        return args.token
+    resposta = await cliente.post("/api/auth/login", data={"username": args.email, "password": args.senha})
+    if resposta.status_code != 200:
+        print(f"❌ Login falhou ({resposta.status_code}): {resposta.text[:200]}")
+        sys.exit(1)
+    return resposta.json()["access_token"]
+
+
+async def leitor(cliente, headers, fim: float, latencias: List[float], status: Counter) -> None:
+    while time.perf_counter() < fim:
+        inicio = time.perf_counter()
+        try:
+            resposta = await cliente.get("/api/pacientes", params={"limit": 20}, headers=headers)
+        except httpx.HTTPError as e:
+            status[type(e).__name__] += 1
+            continue
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        status[resposta.status_code] += 1
+
+
+async def gerador_pdf(cliente, headers, fim: float, status: Counter) -> None:
+    while time.perf_counter() < fim:
+        try:
+            resposta = await cliente.post("/api/pdf/generate", json=PAYLOAD_PDF, headers=headers)
+        except httpx.HTTPError as e:
+            status[type(e).__name__] += 1
+            continue
+        status[resposta.status_code] += 1
+        if resposta.status_code in (429, 503):
+            # Cliente bem-comportado: respeita o Retry-After (limitado para manter a pressão)
+            await asyncio.sleep(min(1.0, float(resposta.headers.get("retry-after", 1))))
+
+
+async def fase(cliente, headers, nome: str, leitores: int, pdfs: int, duracao: float) -> Dict[str, float]:
+    fim = time.perf_counter() + duracao
+    latencias: List[float] = []
+    status_leitura: Counter = Counter()
+    status_pdf: Counter = Counter()
+    tarefas = [leitor(cliente, headers, fim, latencias, status_leitura) for _ in range(leitores)]
+    tarefas += [gerador_pdf(cliente, headers, fim, status_pdf) for _ in range(pdfs)]
+    await asyncio.gather(*tarefas)
+
+    resultado = {
+        "p50": percentil(latencias, 50),
+        "p95": percentil(latencias, 95),
+        "p99": percentil(latencias, 99),
+    }
+    print(f"\n📊 {nome}: {len(latencias)} leituras ({len(latencias) / duracao:.0f}/s)")
+    print(f"   p50 {resultado['p50']:.1f} ms | p95 {resultado['p95']:.1f} ms | p99 {resultado['p99']:.1f} ms"
+          f" | média {statistics.fmean(latencias) if latencias else float('nan'):.1f} ms")
+    print(f"   status leituras: {dict(status_leitura)}")
+    if pdfs:
+        print(f"   status PDFs: {dict(status_pdf)}")
+    return resultado
+
+
+async def main(args) -> int:
+    print("=" * 50)
+    print("🌩️  TESTE DE CARGA: ADMISSÃO POR CLASSE")
+    print("=" * 50)
+    limites = httpx.Limits(max_connections=args.leitores + args.pdfs + 2)
+    async with httpx.AsyncClient(base_url=args.url, timeout=60, limits=limites) as cliente:
+        headers = {"Authorization": f"Bearer {await obter_token(cliente, args)}"}
+        await fase(cliente, headers, "Aquecimento", args.leitores, 0, 2)
+        base = await fase(cliente, headers, "Base (só leituras)", args.leitores, 0, args.duracao)
+        tempestade = await fase(cliente, headers, "Tempestade de PDFs", args.leitores, args.pdfs, args.duracao)
+
+    print(f"\n🎯 p99 durante a tempestade: {tempestade['p99']:.1f} ms "
+          f"(base {base['p99']:.1f} ms, alvo {args.p99_ms:.0f} ms)")
+    ok = tempestade["p99"] <= args.p99_ms
+    print("✅ Dentro do alvo" if ok else "❌ Acima do alvo")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--token", default="")
+    parser.add_argument("--email", default="")
+    parser.add_argument("--senha", default="")
+    parser.add_argument("--leitores", type=int, default=10)
+    parser.add_argument("--pdfs", type=int, default=40)
+    parser.add_argument("--duracao", type=float, default=20.0)
+    parser.add_argument("--p99-ms", type=float, default=250.0)
+    args = parser.parse_args()
+    if not args.token and not args.email:
+        parser.error("informe --token ou --email/--senha")
+    sys.exit(asyncio.run(main(args)))
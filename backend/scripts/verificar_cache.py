@@ -0,0 +1,116 @@
+"""
+Verificação do cache compartilhado (Redis + pub/sub)
+====================================================
+
+Simula dois workers, cada um com seu RedisCache (e sua cópia local), ligados
+ao mesmo servidor, e confere:
+
+1. Um valor gravado no worker A é lido no worker B
+2. delete no worker A remove também a cópia local do worker B
+3. bump_version no worker A muda a versão vista pelo worker B, tornando
+   inalcançáveis as chaves da versão anterior
+4. O mesmo roteiro no MemoryCache (um único processo)
+
+Sem --redis-url usa fakeredis (pip install fakeredis); com --redis-url usa
+um servidor local, por exemplo `redis-server --port 6390`.
+
+Para executar localmente:
+    cd backend
+    python -m scripts.verificar_cache [--redis-url redis://localhost:6390/15]
+"""
+
+import argparse
+import asyncio
+import sys
+import uuid
+
+from app.cache import MemoryCache, RedisCache
+
+ESPERA_PUBSUB = 0.2
+
+
+def conferir(descricao: str, obtido, esperado) -> bool:
+    ok = obtido == esperado
+    print(f"   {'✅' if ok else '❌'} {descricao}: {obtido!r}" + ("" if ok else f" (esperado {esperado!r})"))
+    return ok
+
+
+def criar_clientes(redis_url: str):
+    if redis_url:
+        import redis.asyncio as aioredis
+        return aioredis.from_url(redis_url), aioredis.from_url(redis_url)
+    try:
+        import fakeredis
+    except ImportError:
+        print("❌ fakeredis não instalado: pip install fakeredis (ou use --redis-url)")
+        sys.exit(1)
+    servidor = fakeredis.FakeServer()
+    return fakeredis.FakeAsyncRedis(server=servidor), fakeredis.FakeAsyncRedis(server=servidor)
+
+
+async def verificar_redis(redis_url: str) -> bool:
+    print("🔴 RedisCache (dois workers)" + (f" em {redis_url}" if redis_url else " com fakeredis"))
+    prefixo = f"verificacao:{uuid.uuid4().hex[:8]}"
+    cliente_a, cliente_b = criar_clientes(redis_url)
+    a = RedisCache(client=cliente_a, prefix=prefixo, local_ttl=60)
+    b = RedisCache(client=cliente_b, prefix=prefixo, local_ttl=60)
+    await a.start()
+    await b.start()
+    await asyncio.sleep(ESPERA_PUBSUB)
+    resultados = []
+    try:
+        await a.set("posse:1", {"user_id": "u1"})
+        resultados.append(conferir("B lê o valor gravado por A", await b.get("posse:1"), {"user_id": "u1"}))
+
+        await a.delete("posse:1")
+        await asyncio.sleep(ESPERA_PUBSUB)
+        resultados.append(conferir("cópia local de B após delete em A", await b.local.get("posse:1"), None))
+        resultados.append(conferir("B após delete em A", await b.get("posse:1"), None))
+
+        chave_v0 = f"u:1:v{await b.get_version('u:1')}:bootstrap"
+        await b.set(chave_v0, {"total": 1})
+        await a.bump_version("u:1")
+        await asyncio.sleep(ESPERA_PUBSUB)
+        resultados.append(conferir("versão vista por B após bump em A", await b.get_version("u:1"), 1))
+        chave_v1 = f"u:1:v{await b.get_version('u:1')}:bootstrap"
+        resultados.append(conferir("B na chave da nova versão", await b.get(chave_v1), None))
+    finally:
+        await a.stop()
+        await b.stop()
+    return all(resultados)
+
+
+async def verificar_memoria() -> bool:
+    print("🧠 MemoryCache")
+    cache = MemoryCache(maxsize=2, default_ttl=60)
+    resultados = []
+    await cache.set("a", 1)
+    await cache.set("b", 2)
+    await cache.get("a")
+    await cache.set("c", 3)
+    resultados.append(conferir("LRU descarta a menos usada", await cache.get("b"), None))
+    resultados.append(conferir("mantém a mais usada", await cache.get("a"), 1))
+    await cache.delete("a")
+    resultados.append(conferir("delete", await cache.get("a"), None))
+    resultados.append(conferir("bump_version", await cache.bump_version("u:1"), 1))
+    await cache.set("ttl", 1, ttl=0.01)
+    await asyncio.sleep(0.02)
+    resultados.append(conferir("TTL expirado", await cache.get("ttl"), None))
+    return all(resultados)
+
+
+async def main(redis_url: str):
+    print("=" * 50)
+    print("🧪 VERIFICAÇÃO DO CACHE")
+    print("=" * 50)
+    ok = await verificar_memoria()
+    ok = await verificar_redis(redis_url) and ok
+    print("\n✅ Tudo certo" if ok else "\n❌ Falhas encontradas")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verifica os backends de cache")
+    parser.add_argument("--redis-url", default="", help="Servidor Redis local (padrão: fakeredis)")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main(args.redis_url)) else 1)